@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from archive.services.archiver import archive_table, horizon_cutoff, pending_months
+from archive.services.tables import TABLES
+
+
+class Command(BaseCommand):
+    help = 'Moves transaction and audit rows older than the archive horizon into monthly compressed segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=getattr(settings, 'ARCHIVE_HORIZON_DAYS', 365),
+            help='Archive whole months that ended more than this many days ago',
+        )
+        parser.add_argument(
+            '--table',
+            action='append',
+            choices=list(TABLES),
+            help='Only archive this table (repeatable); default is every table',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per query while writing a segment',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows per month would be archived',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = horizon_cutoff(options['horizon_days'])
+        self.stdout.write(f'Archiving rows created before {cutoff.isoformat()}.')
+        for table in options['table'] or TABLES:
+            if options['dry_run']:
+                for month, rows in pending_months(table, cutoff).items():
+                    self.stdout.write(f'{table} {month:%Y-%m}: {rows} row(s)')
+                continue
+            for segment in archive_table(table, cutoff, options['batch_size']):
+                self.stdout.write(self.style.SUCCESS(
+                    f'{table} {segment.month:%Y-%m}: {segment.row_count} row(s) -> {segment.file_path}'
+                ))
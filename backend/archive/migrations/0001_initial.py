@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(choices=[('transactions', 'Inventory Transactions'), ('audit', 'Audit Log')], max_length=20)),
+                ('month', models.DateField(help_text='First day of the month the rows were created in')),
+                ('file_path', models.CharField(help_text='Relative to ARCHIVE_ROOT', max_length=255)),
+                ('row_count', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveBigIntegerField()),
+                ('checksum', models.CharField(help_text='SHA-256 checksum of the file', max_length=64)),
+                ('first_created_at', models.DateTimeField()),
+                ('last_created_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['table', '-month', '-id'],
+                'indexes': [models.Index(fields=['table', 'last_created_at'], name='archive_arc_table_d1bb5f_idx')],
+            },
+        ),
+    ]
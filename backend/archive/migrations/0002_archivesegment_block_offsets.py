@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivesegment',
+            name='block_offsets',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .services.fanout import fanout_rows, parse_bound
+
+
+class ArchiveFanoutMixin:
+    """
+    List rows from the hot table and, when start_date reaches archived
+    months, from the table's archive segments as well.
+
+    Views set `archive_table` (a key of archive.services.tables.TABLES) and
+    `archive_filter_params`: query params that filter archived rows the
+    same way get_queryset() filters hot rows. get_queryset() reads the
+    start_date/end_date bounds through get_date_bound(), which turns bad
+    values into a 400 before the archive is consulted.
+    """
+    archive_table = None
+    archive_filter_params = ()
+
+    def get_date_bound(self, name):
+        try:
+            return parse_bound(self.request.query_params.get(name))
+        except ValueError:
+            raise ValidationError({name: 'Use an ISO date or datetime, e.g. 2024-01-31 or 2024-01-31T12:00:00Z'})
+
+    def get_archive_filters(self):
+        params = self.request.query_params
+        return {name: params[name] for name in self.archive_filter_params if params.get(name)}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = fanout_rows(self.archive_table, queryset, request.query_params, self.get_archive_filters())
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        params = request.query_params
+        if params.get('pagination') == 'cursor' or 'cursor' in params:
+            return Response(
+                {'error': 'Cursor pagination does not cover archived rows; use page numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        page = self.paginate_queryset(rows)
+        rows = page if page is not None else rows[0:rows.count()]
+        # Hot rows come first and still need serializing; archived rows are stored serialized
+        hot = [row for row in rows if not isinstance(row, dict)]
+        data = self.get_serializer(hot, many=True).data + [row for row in rows if isinstance(row, dict)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class ArchiveSegment(models.Model):
+    """A compressed file holding one month of rows moved out of a hot table"""
+    TABLE_CHOICES = [
+        ('transactions', 'Inventory Transactions'),
+        ('audit', 'Audit Log'),
+    ]
+
+    table = models.CharField(max_length=20, choices=TABLE_CHOICES)
+    month = models.DateField(help_text='First day of the month the rows were created in')
+    file_path = models.CharField(max_length=255, help_text='Relative to ARCHIVE_ROOT')
+    row_count = models.PositiveIntegerField()
+    size_bytes = models.PositiveBigIntegerField()
+    checksum = models.CharField(max_length=64, help_text='SHA-256 checksum of the file')
+    # Byte offset of each gzip member (a block of rows), oldest first, so the
+    # newest rows can be read without decompressing the whole file
+    block_offsets = models.JSONField(default=list, blank=True)
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'last_created_at']),
+        ]
+        ordering = ['table', '-month', '-id']
+
+    def __str__(self):
+        return self.file_path
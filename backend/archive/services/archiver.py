@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from archive.models import ArchiveSegment
+from inventory.models import LedgerCheckpoint
+from .tables import TABLES, record
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 500
+BLOCK_ROWS = 1000  # rows per gzip member; bounds memory when reading newest first
+
+
+class ArchiveError(Exception):
+    """Raised for unknown tables or unreadable segments"""
+    pass
+
+
+def archive_root() -> Path:
+    return Path(getattr(settings, 'ARCHIVE_ROOT', settings.BASE_DIR / 'archive_segments'))
+
+
+def _month_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day.replace(day=1), time.min))
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def horizon_cutoff(horizon_days: Optional[int] = None, now: Optional[datetime] = None) -> datetime:
+    """Start of the month containing now - horizon: everything before it is archivable."""
+    if horizon_days is None:
+        horizon_days = getattr(settings, 'ARCHIVE_HORIZON_DAYS', 365)
+    moment = (now or timezone.now()) - timedelta(days=horizon_days)
+    return _month_start(timezone.localdate(moment))
+
+
+def pending_months(table: str, cutoff: datetime) -> Dict[date, int]:
+    """Rows per month created before `cutoff` that are still in the hot table."""
+    spec = _table(table)
+    months = (
+        spec.model.objects.filter(created_at__lt=cutoff)
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(rows=Count('id'))
+        .order_by('month')
+    )
+    return {timezone.localdate(row['month']): row['rows'] for row in months}
+
+
+def archive_table(table: str, cutoff: datetime, batch_size: int = 2000) -> List[ArchiveSegment]:
+    """
+    Move every row of `table` created before `cutoff` into monthly segments.
+
+    Each month is written to a gzip NDJSON file first, as a series of gzip
+    members of BLOCK_ROWS rows whose offsets are kept on the segment; a
+    plain gzip reader still sees one stream. The segment record,
+    the LedgerCheckpoint fold (transactions only) and the row deletes then
+    commit together, so every row is either still in the table or in a
+    committed segment, never both. The file of a failed commit is removed
+    (or overwritten by the next run).
+    """
+    segments = []
+    for month in pending_months(table, cutoff):
+        start = _month_start(month)
+        end = min(_month_start(_next_month(month)), cutoff)
+        segment = _archive_month(table, month, start, end, batch_size)
+        if segment is not None:
+            segments.append(segment)
+    return segments
+
+
+def archive_all(cutoff: Optional[datetime] = None, tables=None, batch_size: int = 2000) -> Dict[str, List[ArchiveSegment]]:
+    cutoff = cutoff or horizon_cutoff()
+    return {table: archive_table(table, cutoff, batch_size) for table in (tables or TABLES)}
+
+
+def _table(table: str):
+    try:
+        return TABLES[table]
+    except KeyError:
+        raise ArchiveError(f"Unknown archive table '{table}'; expected one of {', '.join(TABLES)}")
+
+
+def _archive_month(table: str, month: date, start: datetime, end: datetime, batch_size: int) -> Optional[ArchiveSegment]:
+    spec = _table(table)
+    part = ArchiveSegment.objects.filter(table=table, month=month).count() + 1
+    relative = Path(table) / f'{month:%Y-%m}-{part:02d}.ndjson.gz'
+    path = archive_root() / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    rows = spec.queryset().filter(created_at__gte=start, created_at__lt=end).order_by('created_at', 'id')
+    ids, first, last = [], None, None
+    offsets, block = [], []
+    flows: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0])  # item_id -> [inflow, outflow, count]
+
+    def write_block(fh):
+        offsets.append(fh.tell())
+        fh.write(gzip.compress(''.join(block).encode('utf-8')))
+        block.clear()
+
+    with open(path, 'wb') as fh:
+        for row in rows.iterator(chunk_size=batch_size):
+            block.append(json.dumps(record(spec, row), cls=DjangoJSONEncoder) + '\n')
+            if len(block) >= BLOCK_ROWS:
+                write_block(fh)
+            ids.append(row.pk)
+            first = first or row.created_at
+            last = row.created_at
+            if table == 'transactions':
+                flow = flows[row.item_id]
+                flow[0 if row.delta >= 0 else 1] += abs(row.delta)
+                flow[2] += 1
+        if block:
+            write_block(fh)
+    if not ids:
+        path.unlink(missing_ok=True)
+        return None
+
+    try:
+        with transaction.atomic():
+            segment = ArchiveSegment.objects.create(
+                table=table,
+                month=month,
+                file_path=str(relative),
+                row_count=len(ids),
+                size_bytes=path.stat().st_size,
+                checksum=_sha256(path),
+                block_offsets=offsets,
+                first_created_at=first,
+                last_created_at=last,
+            )
+            if flows:
+                _fold_checkpoints(flows, end)
+            for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                spec.model.objects.filter(pk__in=ids[offset:offset + DELETE_BATCH_SIZE]).delete()
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    logger.info('Archived %d %s rows for %s into %s', len(ids), table, month, relative)
+    return segment
+
+
+def _fold_checkpoints(flows: Dict[int, List[int]], through: datetime) -> None:
+    """Add archived inflow/outflow to each item's LedgerCheckpoint."""
+    existing = LedgerCheckpoint.objects.in_bulk(list(flows), field_name='item_id')
+    to_create, to_update = [], []
+    for item_id, (inflow, outflow, count) in flows.items():
+        checkpoint = existing.get(item_id) or LedgerCheckpoint(item_id=item_id, archived_through=through)
+        checkpoint.inflow += inflow
+        checkpoint.outflow += outflow
+        checkpoint.balance = checkpoint.inflow - checkpoint.outflow
+        checkpoint.transaction_count += count
+        checkpoint.archived_through = max(checkpoint.archived_through, through)
+        (to_update if checkpoint.pk else to_create).append(checkpoint)
+    if to_update:
+        LedgerCheckpoint.objects.bulk_update(
+            to_update, ['inflow', 'outflow', 'balance', 'transaction_count', 'archived_through'], batch_size=500
+        )
+    if to_create:
+        LedgerCheckpoint.objects.bulk_create(to_create, batch_size=500)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_segment(segment: ArchiveSegment) -> Iterator[dict]:
+    """Records of a segment in (created_at, id) order, streamed line by line."""
+    path = archive_root() / segment.file_path
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+    except OSError as exc:
+        raise ArchiveError(f'Cannot read archive segment {segment.file_path}: {exc}')
+
+
+def read_segment_newest_first(segment: ArchiveSegment) -> Iterator[dict]:
+    """
+    Records of a segment in reverse (created_at, id) order.
+
+    Blocks are decompressed one at a time from the last, so at most
+    BLOCK_ROWS records are held. Segments written before blocks were
+    recorded are one block.
+    """
+    path = archive_root() / segment.file_path
+    try:
+        with open(path, 'rb') as fh:
+            bounds = segment.block_offsets or [0]
+            ends = bounds[1:] + [None]
+            for offset, end in reversed(list(zip(bounds, ends))):
+                fh.seek(offset)
+                data = fh.read() if end is None else fh.read(end - offset)
+                lines = gzip.decompress(data).decode('utf-8').splitlines()
+                for line in reversed(lines):
+                    if line.strip():
+                        yield json.loads(line)
+    except OSError as exc:
+        raise ArchiveError(f'Cannot read archive segment {segment.file_path}: {exc}')
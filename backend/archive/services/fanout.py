@@ -0,0 +1,198 @@
+"""
+Transparent reads across the hot table and its archive segments.
+
+List endpoints serve hot rows as usual; when the requested start_date
+reaches back into archived months, `fanout_rows` returns a FanoutList
+that pages through the hot queryset first and then the matching archived
+records, newest first, in the same serialized shape.
+"""
+import hashlib
+import json
+from datetime import datetime, time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from archive.models import ArchiveSegment
+from .archiver import read_segment, read_segment_newest_first
+
+COUNT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def parse_bound(value: Optional[str]) -> Optional[datetime]:
+    """
+    ISO date or datetime query param as an aware datetime (dates mean
+    midnight), None when empty. Raises ValueError for anything else,
+    including well-formed but impossible dates such as 2024-02-30.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)  # both parsers raise ValueError for impossible dates
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Not an ISO date or datetime: {value!r}')
+        moment = datetime.combine(day, time.min)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+class ArchivedRows:
+    """Archived records of one table matching a date range and key filters."""
+
+    def __init__(self, table: str, *, start: Optional[datetime], end: Optional[datetime] = None,
+                 filters: Optional[Mapping[str, Any]] = None):
+        self.start = start
+        self.end = end
+        self.filters = {key: str(value) for key, value in (filters or {}).items()}
+        segments = ArchiveSegment.objects.filter(table=table)
+        if start is not None:
+            segments = segments.filter(last_created_at__gte=start)
+        if end is not None:
+            segments = segments.filter(first_created_at__lte=end)
+        self.segments = list(segments.order_by('-last_created_at', '-id'))
+        self._counts: Optional[List[int]] = None
+
+    def _matches(self, entry: Dict[str, Any]) -> bool:
+        for key, value in self.filters.items():
+            if str(entry['keys'].get(key)) != value:
+                return False
+        if self.start is None and self.end is None:
+            return True
+        created_at = parse_datetime(entry['created_at'])
+        return (self.start is None or created_at >= self.start) and (self.end is None or created_at <= self.end)
+
+    def _covers(self, segment: ArchiveSegment) -> bool:
+        """True when every row of the segment matches, so row_count can stand in for a scan."""
+        return (
+            not self.filters
+            and (self.start is None or segment.first_created_at >= self.start)
+            and (self.end is None or segment.last_created_at <= self.end)
+        )
+
+    def _newest_first(self, segment: ArchiveSegment) -> Iterator[Dict[str, Any]]:
+        for entry in read_segment_newest_first(segment):
+            if self._matches(entry):
+                yield entry['data']
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Serialized rows, newest first; one segment block is decompressed at a time."""
+        for segment in self.segments:
+            yield from self._newest_first(segment)
+
+    def oldest_first(self) -> Iterator[Dict[str, Any]]:
+        """Serialized rows in chronological order, streamed line by line, e.g. for exports."""
+        for segment in reversed(self.segments):
+            for entry in read_segment(segment):
+                if self._matches(entry):
+                    yield entry['data']
+
+    def _count_key(self, segment: ArchiveSegment) -> str:
+        # The checksum changes if a segment file is ever rewritten
+        query = json.dumps(
+            [str(self.start), str(self.end), sorted(self.filters.items())], separators=(',', ':'),
+        )
+        digest = hashlib.sha256(query.encode()).hexdigest()[:32]
+        return f'archive:count:{segment.pk}:{segment.checksum[:16]}:{digest}'
+
+    def _segment_count(self, segment: ArchiveSegment) -> int:
+        """Matching rows in one segment; scans are cached so later pages skip them."""
+        if self._covers(segment):
+            return segment.row_count
+        key = self._count_key(segment)
+        total = cache.get(key)
+        if total is None:
+            total = sum(1 for entry in read_segment(segment) if self._matches(entry))
+            cache.set(key, total, COUNT_CACHE_TIMEOUT)
+        return total
+
+    def segment_counts(self) -> List[int]:
+        if self._counts is None:
+            self._counts = [self._segment_count(segment) for segment in self.segments]
+        return self._counts
+
+    def count(self) -> int:
+        return sum(self.segment_counts())
+
+    def slice(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """
+        Rows [start, stop) in newest-first order. Segments wholly before
+        `start` are skipped by their counts, and reading ends at `stop`.
+        """
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        for segment, matched in zip(self.segments, self.segment_counts()):
+            if offset + matched <= start or not matched:
+                offset += matched
+                continue
+            if offset >= stop:
+                break
+            for position, row in enumerate(self._newest_first(segment), start=offset):
+                if position >= stop:
+                    break
+                if position >= start:
+                    rows.append(row)
+            offset += matched
+        return rows
+
+
+class FanoutList:
+    """
+    A hot queryset followed by archived rows, sliceable like a queryset.
+
+    Pagination only needs count() and slicing: slices inside the hot part
+    run as LIMIT/OFFSET queries, the rest streams only the archived
+    segments the page falls in.
+    Items are model instances (hot) or already-serialized dicts (archived).
+    """
+
+    def __init__(self, queryset: QuerySet, archived: ArchivedRows):
+        self.queryset = queryset
+        self.archived = archived
+        self._hot_count = None
+
+    def hot_count(self) -> int:
+        if self._hot_count is None:
+            self._hot_count = self.queryset.count()
+        return self._hot_count
+
+    def count(self) -> int:
+        return self.hot_count() + self.archived.count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, key) -> Sequence:
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('FanoutList only supports contiguous slices')
+        start, stop = key.start or 0, key.stop
+        hot = self.hot_count()
+        rows = list(self.queryset[start:min(stop, hot)]) if start < hot else []
+        if stop > hot:
+            rows += self.archived.slice(max(start - hot, 0), stop - hot)
+        return rows
+
+
+def archived_rows(table: str, query_params: Mapping[str, str],
+                  filters: Optional[Mapping[str, Any]] = None) -> Optional[ArchivedRows]:
+    """ArchivedRows for a request whose start_date reaches archived months, else None."""
+    start = parse_bound(query_params.get('start_date'))
+    if start is None:
+        return None
+    archived = ArchivedRows(table, start=start, end=parse_bound(query_params.get('end_date')), filters=filters)
+    return archived if archived.segments else None
+
+
+def fanout_rows(table: str, queryset: QuerySet, query_params: Mapping[str, str],
+                filters: Optional[Mapping[str, Any]] = None) -> Optional[FanoutList]:
+    """
+    FanoutList for a filtered list request whose start_date reaches archived
+    rows, or None when the hot table alone answers it.
+
+    `filters` are matched against each archived record's keys, mirroring
+    the filters already applied to `queryset`.
+    """
+    archived = archived_rows(table, query_params, filters)
+    return FanoutList(queryset, archived) if archived is not None else None
@@ -0,0 +1,64 @@
+"""
+Archivable tables and how their rows are written to segments.
+
+Each archived row is one JSON line:
+    {"created_at": iso, "id": pk, "keys": {...}, "data": {...}}
+
+`data` is the row exactly as the table's list endpoint serializes it, so
+archived rows can be served without touching related tables (which may
+since have lost the referenced objects). `keys` holds the raw values the
+list filters match on, named after their query params.
+"""
+from typing import Any, Callable, Dict, NamedTuple
+
+from django.db.models import QuerySet
+
+from audit.models import AuditLog
+from audit.serializers import AuditLogSerializer
+from inventory.models import InventoryTransaction
+from inventory.serializers import InventoryTransactionSerializer
+
+
+class ArchiveTable(NamedTuple):
+    model: type
+    queryset: Callable[[], QuerySet]
+    serializer: type
+    keys: Callable[[Any], Dict[str, Any]]
+
+
+def _transaction_keys(row) -> Dict[str, Any]:
+    return {'item': row.item_id, 'performed_by': row.performed_by_id}
+
+
+def _audit_keys(row) -> Dict[str, Any]:
+    return {
+        'actor': row.actor_id,
+        'action': row.action,
+        'content_type': f'{row.content_type.app_label}.{row.content_type.model}',
+        'object_id': row.object_id,
+    }
+
+
+TABLES: Dict[str, ArchiveTable] = {
+    'transactions': ArchiveTable(
+        model=InventoryTransaction,
+        queryset=lambda: InventoryTransaction.objects.select_related('item', 'performed_by'),
+        serializer=InventoryTransactionSerializer,
+        keys=_transaction_keys,
+    ),
+    'audit': ArchiveTable(
+        model=AuditLog,
+        queryset=lambda: AuditLog.objects.select_related('actor', 'content_type').prefetch_related('content_object'),
+        serializer=AuditLogSerializer,
+        keys=_audit_keys,
+    ),
+}
+
+
+def record(table: ArchiveTable, row) -> Dict[str, Any]:
+    return {
+        'created_at': row.created_at.isoformat(),
+        'id': row.pk,
+        'keys': table.keys(row),
+        'data': table.serializer(row).data,
+    }
@@ -0,0 +1,131 @@
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from audit.models import AuditLog
+from inventory.models import Category, InventoryTransaction, Item, ItemDailyRollup, LedgerCheckpoint
+from inventory.services.rollups import rebuild_rollups
+from users.models import Roles
+from .models import ArchiveSegment
+from .services import archiver, fanout
+from .services.archiver import archive_all, read_segment, read_segment_newest_first
+
+
+class ArchiveTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(ARCHIVE_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = get_user_model().objects.create_user(
+            username="archivist", password="testpass", role=Roles.ADMIN, is_staff=True,
+        )
+        self.client.force_authenticate(user=self.admin)
+        category = Category.objects.create(name="Archived")
+        self.item = Item.objects.create(name="Old stock", category=category, price=1, low_stock_threshold=0)
+
+        # Two old months and one recent adjustment
+        self.cutoff = timezone.make_aware(datetime(2024, 3, 1))
+        for delta, moment in ((10, datetime(2024, 1, 10)), (-3, datetime(2024, 1, 20)), (5, datetime(2024, 2, 5)), (2, None)):
+            tx = self.item.adjust_stock(delta, reason="manual", user=self.admin)
+            if moment is not None:
+                InventoryTransaction.objects.filter(pk=tx.pk).update(created_at=timezone.make_aware(moment))
+                AuditLog.log_action(actor=self.admin, action='UPDATE', instance=self.item, after_state={'delta': delta})
+                AuditLog.objects.filter(pk=AuditLog.objects.latest('id').pk).update(created_at=timezone.make_aware(moment))
+        rebuild_rollups()
+
+    def test_moves_old_months_into_segments_and_checkpoints_the_balance(self):
+        segments = archive_all(self.cutoff)
+        self.assertEqual([s.month.isoformat() for s in segments['transactions']], ['2024-01-01', '2024-02-01'])
+        self.assertEqual(len(segments['audit']), 2)
+        self.assertEqual(InventoryTransaction.objects.count(), 1)
+        self.assertFalse(AuditLog.objects.filter(created_at__lt=self.cutoff).exists())
+
+        january = segments['transactions'][0]
+        records = list(read_segment(january))
+        self.assertEqual([r['data']['delta'] for r in records], [10, -3])
+        self.assertEqual(records[0]['data']['item_name'], "Old stock")
+        self.assertEqual(january.row_count, 2)
+        self.assertEqual(len(january.checksum), 64)
+
+        checkpoint = LedgerCheckpoint.objects.get(item=self.item)
+        self.assertEqual((checkpoint.balance, checkpoint.inflow, checkpoint.outflow), (12, 15, 3))
+        self.assertEqual(checkpoint.archived_through, self.cutoff)
+
+        # Nothing left to archive; a full rollup rebuild keeps archived days and the balance
+        self.assertEqual(archive_all(self.cutoff), {'transactions': [], 'audit': []})
+        rebuild_rollups()
+        self.assertTrue(ItemDailyRollup.objects.filter(date__lt=self.cutoff.date()).exists())
+        latest = ItemDailyRollup.objects.filter(item=self.item).latest('date')
+        self.assertEqual(latest.closing_quantity, 14)
+        self.assertEqual(Item.objects.get(pk=self.item.pk).quantity, 14)
+
+    def test_list_and_export_fan_out_when_start_date_reaches_archives(self):
+        archive_all(self.cutoff)
+        url = reverse('transaction-list')
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.data['count'], 1)
+
+        resp = self.client.get(url, {'start_date': '2024-01-15T00:00:00Z', 'item': self.item.pk})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['count'], 3)
+        self.assertEqual([row['delta'] for row in resp.data['results']], [2, 5, -3])
+
+        resp = self.client.get(url, {'start_date': '2024-01-01T00:00:00Z', 'page_size': 2, 'page': 2})
+        self.assertEqual([row['delta'] for row in resp.data['results']], [-3, 10])
+
+        resp = self.client.get(url, {'start_date': '2024-01-01T00:00:00Z', 'pagination': 'cursor'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        for bound in ('2024-02-30', '2024-02-30T00:00:00Z'):
+            resp = self.client.get(url, {'start_date': bound})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, bound)
+
+        resp = self.client.get(reverse('transaction-export'), {'start_date': '2024-01-01T00:00:00Z', 'export_format': 'ndjson'})
+        records = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([r['delta'] for r in records], [10, -3, 5, 2])
+
+        resp = self.client.get(reverse('auditlog-list'), {
+            'start_date': '2024-01-01T00:00:00Z', 'end_date': '2024-01-31T00:00:00Z', 'content_type': 'inventory.item',
+        })
+        self.assertEqual(resp.data['count'], 2)
+        self.assertEqual(resp.data['results'][0]['content_object'], "Old stock")
+
+    def test_segments_stream_newest_first_by_block_and_pages_reuse_cached_counts(self):
+        with mock.patch.object(archiver, 'BLOCK_ROWS', 1):
+            january = archive_all(self.cutoff)['transactions'][0]
+        self.assertEqual(len(january.block_offsets), 2)
+        self.assertEqual([r['data']['delta'] for r in read_segment(january)], [10, -3])
+        self.assertEqual([r['data']['delta'] for r in read_segment_newest_first(january)], [-3, 10])
+
+        url = reverse('transaction-list')
+        params = {'start_date': '2024-01-01T00:00:00Z', 'item': self.item.pk, 'page_size': 2}
+        resp = self.client.get(url, params)
+        self.assertEqual(resp.data['count'], 4)
+        # Filtered counts are cached per segment, so later pages only read the blocks they return
+        with mock.patch.object(fanout, 'read_segment', side_effect=AssertionError('segment rescanned')):
+            resp = self.client.get(url, {**params, 'page': 2})
+        self.assertEqual(resp.data['count'], 4)
+        self.assertEqual([row['delta'] for row in resp.data['results']], [-3, 10])
+
+    def test_month_is_not_archived_twice_and_late_rows_get_a_new_part(self):
+        archive_all(self.cutoff)
+        tx = self.item.adjust_stock(1, reason="manual")
+        InventoryTransaction.objects.filter(pk=tx.pk).update(created_at=timezone.make_aware(datetime(2024, 2, 20)))
+        segments = archive_all(self.cutoff)['transactions']
+        self.assertEqual([s.file_path for s in segments], ['transactions/2024-02-02.ndjson.gz'])
+        self.assertEqual(ArchiveSegment.objects.filter(table='transactions', month='2024-02-01').count(), 2)
+        self.assertEqual(LedgerCheckpoint.objects.get(item=self.item).balance, 13)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -34,7 +35,8 @@ class AuditLog(models.Model):
     user_agent = models.TextField(blank=True)
     additional_context = models.JSONField(null=True, blank=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default (not auto_now_add) so batched writers can keep the event time
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
@@ -0,0 +1,363 @@
+"""
+Asynchronous, batched AuditLog writer.
+
+Request threads hand finished audit rows to `submit()`, which appends them
+to a per-process spool file and a bounded queue and returns immediately.
+A daemon flusher thread drains the queue into `bulk_create` batches once
+AUDIT_SINK_BATCH_SIZE rows are pending or AUDIT_SINK_FLUSH_INTERVAL
+seconds have passed. The spool is truncated whenever everything submitted
+has been written, so after a crash the rows still in it are replayed on
+the next start (at-least-once delivery). The flusher fsyncs the spool
+once per batch, so a power loss can cost at most one flush interval of
+rows; AUDIT_SINK_FSYNC_EACH_ENTRY fsyncs every row in `submit()` instead,
+at the price of a disk flush on the request thread. Spool files carry a key of the
+database they were written for, and a process only replays spools of its
+own database, so rows from a test run or another environment sharing the
+directory never leak in. Batches that fail with an OperationalError
+(e.g. "database is locked") are retried with exponential backoff, up to
+AUDIT_SINK_MAX_ATTEMPTS; rows that still fail, or that the database
+rejects outright, are moved to a dead-letter file next to the spool.
+
+When the queue is full, `submit()` waits briefly and then writes the row
+synchronously, so backpressure slows the caller instead of dropping audit
+data. `stats()` exposes queue depth and those fallbacks.
+"""
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: no cross-process spool recovery
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# AuditLog columns carried in a spooled entry
+ENTRY_FIELDS = (
+    'actor_id', 'action', 'content_type_id', 'object_id', 'before_state', 'after_state',
+    'ip_address', 'user_agent', 'additional_context', 'created_at',
+)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def database_key() -> str:
+    """Short stable id of the database AuditLog rows are written to."""
+    from audit.models import AuditLog
+    db = connections[router.db_for_write(AuditLog)].settings_dict
+    identity = '|'.join(str(db.get(name) or '') for name in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+    return hashlib.sha1(identity.encode()).hexdigest()[:12]
+
+
+class AuditSink:
+    def __init__(
+        self,
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        put_timeout: float = 0.05,
+        spool_dir: Optional[Path] = None,
+        fsync_each_entry: bool = False,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.1,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.fsync_each_entry = fsync_each_entry
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._unwritten = 0  # submitted to the spool but not yet in the database
+        self._spool = None
+        self._spool_dirty = False  # written since the last fsync
+        self._database_key = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = False
+        self._stop = threading.Event()
+        self._stats = {
+            'submitted': 0,
+            'written': 0,
+            'batches': 0,
+            'sync_fallbacks': 0,
+            'failed_batches': 0,
+            'retries': 0,
+            'replayed': 0,
+            'max_depth': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self, background: bool = True) -> None:
+        """Open the spool, replay leftovers and (unless background=False) start flushing."""
+        if self._started:
+            return
+        self._started = True
+        if self.spool_dir is not None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._database_key = database_key()
+            self._open_spool()
+            self.recover()
+        if background:
+            self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Flush everything and stop the flusher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 5)
+            self._thread = None
+        self.flush()
+
+    def _open_spool(self) -> None:
+        path = self.spool_dir / f'audit-spool-{self._database_key}-{os.getpid()}.jsonl'
+        self._spool = open(path, 'a+', encoding='utf-8')
+        if fcntl is not None:
+            # Held for the life of the process: marks this spool as owned
+            fcntl.flock(self._spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    # -- producer side -------------------------------------------------------
+
+    def submit(self, entry: Dict[str, Any]) -> None:
+        """Queue one AuditLog row (a dict of ENTRY_FIELDS) for batched insertion."""
+        if not self._started:
+            self.start()
+        entry.setdefault('created_at', timezone.now())
+        with self._lock:
+            if self._spool is not None:
+                self._spool.write(json.dumps(entry, default=str) + '\n')
+                self._spool.flush()
+                if self.fsync_each_entry:
+                    os.fsync(self._spool.fileno())  # flush() alone stops at the OS page cache
+                else:
+                    self._spool_dirty = True
+            self._unwritten += 1
+            self._stats['submitted'] += 1
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: write inline rather than drop the row
+            with self._lock:
+                self._stats['sync_fallbacks'] += 1
+            self._write([entry])
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['max_depth'] = max(self._stats['max_depth'], depth)
+
+    # -- consumer side -------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            self._sync_spool()
+            if batch:
+                self._write(batch)
+                close_old_connections()
+
+    def _sync_spool(self) -> None:
+        """fsync the spool once for every row submitted since the last call."""
+        with self._lock:
+            if self._spool is None or not self._spool_dirty:
+                return
+            self._spool_dirty = False
+            fd = self._spool.fileno()
+        os.fsync(fd)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """Synchronously write everything currently queued. Returns rows written."""
+        self._sync_spool()
+        written = 0
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        from audit.models import AuditLog
+        started = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                # A savepoint when called inside a request's transaction, so a retry can follow
+                with self._flush_lock, transaction.atomic(using=router.db_for_write(AuditLog)):
+                    AuditLog.objects.bulk_create(
+                        [AuditLog(**_row(entry)) for entry in batch], batch_size=self.batch_size
+                    )
+                break
+            except OperationalError:
+                # Transient (locked or busy database, dropped connection): back off and retry
+                if attempt >= self.max_attempts:
+                    logger.exception('Audit sink failed to write %d rows after %d attempts', len(batch), attempt)
+                    self._fail(batch)
+                    return
+                logger.warning('Audit sink write failed (attempt %d of %d), retrying', attempt, self.max_attempts)
+                with self._lock:
+                    self._stats['retries'] += 1
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                attempt += 1
+            except Exception:
+                logger.exception('Audit sink failed to write %d rows', len(batch))
+                self._fail(batch)
+                return
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            self._unwritten -= len(batch)
+            if self._unwritten <= 0 and self._spool is not None:
+                self._spool.truncate(0)
+
+    def _fail(self, batch: List[Dict[str, Any]]) -> None:
+        self._dead_letter(batch)
+        with self._lock:
+            self._stats['failed_batches'] += 1
+            self._unwritten -= len(batch)
+
+    def _dead_letter(self, batch: List[Dict[str, Any]]) -> None:
+        """Keep rows the database rejected so the spool can still be truncated."""
+        if self.spool_dir is None:
+            return
+        path = self.spool_dir / f'audit-deadletter-{self._database_key}-{os.getpid()}.jsonl'
+        with open(path, 'a', encoding='utf-8') as fh:
+            for entry in batch:
+                fh.write(json.dumps(entry, default=str) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    # -- recovery & metrics --------------------------------------------------
+
+    def recover(self) -> int:
+        """
+        Replay spool files left by crashed processes (and our own pid's old
+        file). Spools written for another database are left in place.
+        """
+        replayed = 0
+        own = self._spool.name if self._spool is not None else None
+        ours = set(glob.glob(str(self.spool_dir / f'audit-spool-{self._database_key}-*.jsonl')))
+        foreign = set(glob.glob(str(self.spool_dir / 'audit-spool-*.jsonl'))) - ours
+        if foreign:
+            logger.warning('Audit sink skipped %d spool file(s) written for another database', len(foreign))
+        for path in sorted(ours):
+            if path == own:
+                replayed += self._replay_own()
+                continue
+            if fcntl is None:
+                continue  # cannot tell whether another live process owns it
+            with open(path, 'r+', encoding='utf-8') as fh:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # a live process owns it
+                entries = [json.loads(line) for line in fh if line.strip()]
+                if entries:
+                    self._replay(entries)
+                    replayed += len(entries)
+            os.unlink(path)
+        with self._lock:
+            self._stats['replayed'] += replayed
+        return replayed
+
+    def _replay_own(self) -> int:
+        self._spool.seek(0)
+        entries = [json.loads(line) for line in self._spool if line.strip()]
+        if entries:
+            self._replay(entries)
+        self._spool.truncate(0)
+        return len(entries)
+
+    def _replay(self, entries: List[Dict[str, Any]]) -> None:
+        from audit.models import AuditLog
+        for start in range(0, len(entries), self.batch_size):
+            chunk = entries[start:start + self.batch_size]
+            AuditLog.objects.bulk_create([AuditLog(**_row(entry)) for entry in chunk])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._unwritten
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['queue_utilization'] = round(stats['queue_depth'] / self._queue.maxsize, 4) if self._queue.maxsize else 0.0
+        stats['running'] = self._thread is not None
+        if self._spool is not None:
+            stats['spool_bytes'] = os.fstat(self._spool.fileno()).st_size
+        return stats
+
+
+def _row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    row = {field: entry.get(field) for field in ENTRY_FIELDS}
+    row['user_agent'] = row['user_agent'] or ''
+    if isinstance(row['created_at'], str):
+        row['created_at'] = parse_datetime(row['created_at'])
+    row['created_at'] = row['created_at'] or timezone.now()
+    return row
+
+
+_sink: Optional[AuditSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> AuditSink:
+    """Process-wide sink configured from AUDIT_SINK_* settings."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = AuditSink(
+                    batch_size=_setting('AUDIT_SINK_BATCH_SIZE', 200),
+                    flush_interval=_setting('AUDIT_SINK_FLUSH_INTERVAL', 1.0),
+                    max_queue=_setting('AUDIT_SINK_MAX_QUEUE', 10000),
+                    put_timeout=_setting('AUDIT_SINK_PUT_TIMEOUT', 0.05),
+                    spool_dir=_setting('AUDIT_SINK_SPOOL_DIR', None),
+                    fsync_each_entry=_setting('AUDIT_SINK_FSYNC_EACH_ENTRY', False),
+                    max_attempts=_setting('AUDIT_SINK_MAX_ATTEMPTS', 5),
+                    retry_backoff=_setting('AUDIT_SINK_RETRY_BACKOFF', 0.1),
+                )
+    return _sink
+
+
+def async_enabled() -> bool:
+    return _setting('AUDIT_ASYNC', False)
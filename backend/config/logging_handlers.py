@@ -0,0 +1,57 @@
+"""
+Logging pieces for the structured request log.
+
+JsonFormatter renders a record as one JSON object per line; fields passed
+as `extra={'fields': {...}}` are merged into it. NonBlockingHandler formats
+on the calling thread, then hands the line to a bounded queue drained by a
+background QueueListener, so a slow disk or pipe never stalls a request.
+When the queue is full the line is dropped and counted rather than waited
+for.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class NonBlockingHandler(logging.handlers.QueueHandler):
+    def __init__(self, filename=None, stream=None, max_queue=10000):
+        super().__init__(queue.Queue(maxsize=max_queue))
+        target = logging.FileHandler(filename, encoding='utf-8') if filename else logging.StreamHandler(stream)
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        self.dropped = 0
+        self._stopped = False
+        atexit.register(self._stop_listener)
+
+    def _stop_listener(self) -> None:
+        # Flushes what is queued; safe to call from both close() and atexit
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        self._stop_listener()
+        super().close()
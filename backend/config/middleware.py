@@ -0,0 +1,207 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import profiling, routers
+
+request_logger = logging.getLogger('request_log')
+
+STICKY_COOKIE = 'db_last_write'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes across requests when reads go to a replica.
+
+    A request that wrote sets a short-lived cookie with the write time; the
+    next requests from that client read from the primary until
+    DATABASE_STICKY_SECONDS have passed. Unsafe methods always use the
+    primary, including for the reads that precede their writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if routers.replica_alias() is None:
+            return self.get_response(request)
+
+        try:
+            previous = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            previous = 0.0
+        with routers.write_window(previous):
+            if request.method in SAFE_METHODS:
+                response = self.get_response(request)
+            else:
+                with routers.use_primary():
+                    response = self.get_response(request)
+            wrote_at = routers.last_write()
+
+        if wrote_at > previous:
+            response.set_cookie(
+                STICKY_COOKIE,
+                f'{wrote_at:.3f}',
+                max_age=max(int(routers.sticky_seconds()), 1),
+                httponly=True,
+                samesite='Lax',
+                secure=not settings.DEBUG,
+            )
+        return response
+
+
+class RequestLogMiddleware:
+    """
+    One structured log line per request: route, status, duration, response
+    size and DB query count/time across every connection.
+
+    Lines go to the 'request_log' logger (JSON, non-blocking handler; see
+    LOGGING). REQUEST_LOG_SAMPLE_RATE keeps that fraction of ordinary
+    requests; server errors and requests slower than REQUEST_LOG_SLOW_MS
+    are always logged. Streaming responses are timed until the view returns.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_LOG_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        db = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if self._keep(response.status_code, duration_ms):
+            request_logger.info('request', extra={'fields': self._fields(request, response, duration_ms, db)})
+        return response
+
+    def _keep(self, status_code, duration_ms):
+        if status_code >= 500 or duration_ms >= getattr(settings, 'REQUEST_LOG_SLOW_MS', 1000):
+            return True
+        rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0)
+        return rate >= 1 or random.random() < rate
+
+    def _fields(self, request, response, duration_ms, db):
+        match = request.resolver_match
+        user = getattr(request, 'user', None)
+        return {
+            'method': request.method,
+            'route': match.route if match else None,
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'db_queries': db.count,
+            'db_ms': round(db.elapsed * 1000, 2),
+            'bytes': None if response.streaming else len(response.content),
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+        }
+
+
+class _QueryTimer:
+    """connection.execute_wrapper that counts queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.elapsed += time.perf_counter() - started
+
+
+class ProfilingMiddleware:
+    """
+    Feed per-route latency, SQL, serializer and size samples into the
+    in-process ProfileStore (config.profiling), exposed at /api/metrics/.
+
+    `?_profile=1` runs the request under cProfile and replaces the response
+    with the profile summary, for staff callers only. This middleware runs
+    before the view authenticates, so the caller is identified up front
+    from the bearer token or the session cookie; anyone else gets the
+    normal, unprofiled response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        if self.enabled:
+            profiling.install_serializer_timer()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        db = _QueryTimer()
+        clock = profiling.start_serializer_clock()
+        started = time.perf_counter()
+        summary = None
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(db))
+                if request.GET.get('_profile') == '1' and _is_staff_caller(request):
+                    response, summary = profiling.profile_call(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            serializer_seconds = profiling.stop_serializer_clock(clock)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = f'{request.method} {match.view_name or match.route}' if match else f'{request.method} unmatched'
+        profiling.get_store().record(
+            route,
+            duration=duration,
+            queries=db.count,
+            sql=db.elapsed,
+            serializer=serializer_seconds,
+            bytes=0 if response.streaming else len(response.content),
+        )
+
+        if summary is not None:
+            header = (
+                f'{request.method} {request.get_full_path()} -> {response.status_code}\n'
+                f'{duration * 1000:.2f} ms total, {db.count} queries ({db.elapsed * 1000:.2f} ms), '
+                f'serializer {serializer_seconds * 1000:.2f} ms\n\n'
+            )
+            return HttpResponse(header + summary, content_type='text/plain; charset=utf-8')
+        return response
+
+
+def _is_staff_caller(request) -> bool:
+    """Whether the request carries a staff bearer token or staff session, checked before the view runs."""
+    from users.authentication import PrincipalJWTAuthentication
+    try:
+        authenticated = PrincipalJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    if authenticated is not None:
+        user = authenticated[0]
+    else:
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not session_key:
+            return False
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = auth.get_user(SimpleNamespace(session=session))
+    return user.is_active and user.is_staff
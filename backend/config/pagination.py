@@ -0,0 +1,154 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination configured per request by HybridPagination."""
+
+    def __init__(self, *, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    - Default: ?page=N&page_size=M (OFFSET/LIMIT), same payload as before
+    - ?pagination=cursor (or any ?cursor=...): seek on the view's
+      `cursor_ordering`, e.g. ("-created_at", "-id"), so deep pages cost the
+      same as the first one
+    - ?count=false: skip the COUNT(*) in either mode; `count` is null
+
+    Views opt into cursor mode by declaring `cursor_ordering`; the leading
+    field should match an index prefix (after any equality filters).
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.include_count = request.query_params.get(
+            self.count_query_param, 'true'
+        ).lower() not in ('false', '0', 'no')
+        self.keyset = None
+
+        ordering = getattr(view, 'cursor_ordering', None)
+        wants_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if ordering and wants_cursor:
+            page_size = self.get_page_size(request)
+            if not page_size:
+                return None
+            self.total = queryset.count() if self.include_count else None
+            self.keyset = KeysetPagination(ordering=ordering, page_size=page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        if self.include_count:
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_without_count(queryset, request)
+
+    def _paginate_without_count(self, queryset, request):
+        """OFFSET/LIMIT without COUNT(*): fetch one extra row to detect a next page."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            number = int(request.query_params.get(self.page_query_param) or 1)
+            if number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message='That page number is not a positive integer',
+            ))
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if number > 1 and not rows:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message='That page contains no results',
+            ))
+        self.page = None
+        self.page_number = number
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.page is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page is not None:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            count = self.total
+            next_link, previous_link = self.keyset.get_next_link(), self.keyset.get_previous_link()
+        else:
+            count = self.page.paginator.count if self.page is not None else None
+            next_link, previous_link = self.get_next_link(), self.get_previous_link()
+        return Response({
+            'count': count,
+            'next': next_link,
+            'previous': previous_link,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
+
+    def get_html_context(self):
+        if self.keyset is not None:
+            return self.keyset.get_html_context()
+        if self.page is None:
+            return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link()}
+        return super().get_html_context()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Set to false to skip the total count (count is null).',
+            'schema': {'type': 'boolean'},
+        })
+        if getattr(view, 'cursor_ordering', None):
+            parameters += [
+                {
+                    'name': self.mode_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'Set to "cursor" for keyset pagination.',
+                    'schema': {'type': 'string', 'enum': ['cursor']},
+                },
+                {
+                    'name': self.cursor_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'The pagination cursor value.',
+                    'schema': {'type': 'string'},
+                },
+            ]
+        return parameters
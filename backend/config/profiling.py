@@ -0,0 +1,173 @@
+"""
+Per-route performance aggregates for this worker process.
+
+ProfilingMiddleware (config.middleware) records one sample per request:
+latency, SQL query count and time, serializer time and response size.
+Each route keeps the last PROFILING_WINDOW samples, from which
+p50/p95/p99 are computed at scrape time, plus cumulative counts and sums.
+`render_prometheus()` exposes them in Prometheus text format.
+
+Serializer time is the time spent in the outermost `serializer.data`
+(to_representation), collected by wrapping BaseSerializer.data once.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from rest_framework.serializers import BaseSerializer
+
+QUANTILES = (0.5, 0.95, 0.99)
+OTHER_ROUTE = '(other)'
+
+# sample field -> (Prometheus metric name, help text)
+METRICS = {
+    'duration': ('inventory_request_duration_seconds', 'Request latency'),
+    'queries': ('inventory_request_sql_queries', 'SQL queries per request'),
+    'sql': ('inventory_request_sql_seconds', 'Time spent in SQL per request'),
+    'serializer': ('inventory_request_serializer_seconds', 'Time spent in DRF serializers per request'),
+    'bytes': ('inventory_response_size_bytes', 'Response body size'),
+}
+
+_serializer_clock: ContextVar[Optional[list]] = ContextVar('serializer_clock', default=None)
+
+
+class RouteWindow:
+    def __init__(self, size: int):
+        self.samples = {name: deque(maxlen=size) for name in METRICS}
+        self.count = 0
+        self.sums = dict.fromkeys(METRICS, 0.0)
+
+    def add(self, sample: Dict[str, float]) -> None:
+        self.count += 1
+        for name, value in sample.items():
+            self.samples[name].append(value)
+            self.sums[name] += value
+
+
+class ProfileStore:
+    def __init__(self, window: int = 1000, max_routes: int = 200):
+        self.window = window
+        self.max_routes = max_routes
+        self._routes: Dict[str, RouteWindow] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, **sample: float) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                # Bound memory if routes explode (e.g. unresolved paths)
+                if len(self._routes) >= self.max_routes:
+                    route = OTHER_ROUTE
+                stats = self._routes.setdefault(route, RouteWindow(self.window))
+            stats.add(sample)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                route: {
+                    'count': stats.count,
+                    'sums': dict(stats.sums),
+                    'quantiles': {name: _quantiles(values) for name, values in stats.samples.items()},
+                }
+                for route, stats in self._routes.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+def _quantiles(values) -> Dict[float, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        _store = ProfileStore(
+            window=getattr(settings, 'PROFILING_WINDOW', 1000),
+            max_routes=getattr(settings, 'PROFILING_MAX_ROUTES', 200),
+        )
+    return _store
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(store: Optional[ProfileStore] = None) -> str:
+    snapshot = (store or get_store()).snapshot()
+    lines: List[str] = []
+    for name, (metric, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text} (rolling window per route)')
+        lines.append(f'# TYPE {metric} summary')
+        for route, stats in sorted(snapshot.items()):
+            label = f'route="{_label(route)}"'
+            for q, value in stats['quantiles'][name].items():
+                lines.append(f'{metric}{{{label},quantile="{q}"}} {value:.6g}')
+            lines.append(f'{metric}_sum{{{label}}} {stats["sums"][name]:.6g}')
+            lines.append(f'{metric}_count{{{label}}} {stats["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# -- serializer timing -------------------------------------------------------
+
+def start_serializer_clock() -> object:
+    return _serializer_clock.set([0.0, 0])  # [seconds, nesting depth]
+
+
+def stop_serializer_clock(token) -> float:
+    clock = _serializer_clock.get()
+    _serializer_clock.reset(token)
+    return clock[0] if clock else 0.0
+
+
+_installed = False
+
+
+def install_serializer_timer() -> None:
+    """Wrap BaseSerializer.data so the outermost evaluation is timed per request."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    original = BaseSerializer.data
+
+    def timed_data(self):
+        clock = _serializer_clock.get()
+        if clock is None:
+            return original.fget(self)
+        clock[1] += 1
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            clock[1] -= 1
+            if clock[1] == 0:  # nested serializers are part of the outer one
+                clock[0] += time.perf_counter() - started
+
+    BaseSerializer.data = property(timed_data)
+
+
+# -- single-request cProfile -------------------------------------------------
+
+def profile_call(func, *args, **kwargs):
+    """Run func under cProfile; returns (result, text summary of the top calls)."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(getattr(settings, 'PROFILING_CPROFILE_LINES', 50))
+    return result, out.getvalue()
@@ -0,0 +1,90 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+Reads of the models listed in DATABASE_REPLICA_MODELS (item, audit and
+report data) go to the DATABASE_REPLICA_ALIAS connection when it is
+configured; everything else, every write and every read inside an open
+transaction on the primary stays on 'default'.
+
+After a write the current context is pinned to the primary for
+DATABASE_STICKY_SECONDS so the caller never reads an older copy from a
+lagging replica. ReplicaStickinessMiddleware (config.middleware) carries
+that pin across requests in a cookie and pins whole unsafe-method
+requests.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Wall-clock time of this context's last write (it also travels in a cookie)
+_last_write: ContextVar[float] = ContextVar('db_last_write', default=0.0)
+_pinned: ContextVar[bool] = ContextVar('db_pinned', default=False)
+
+
+def sticky_seconds() -> float:
+    return getattr(settings, 'DATABASE_STICKY_SECONDS', 5)
+
+
+def replica_alias():
+    """The configured replica alias, or None when reads cannot be offloaded."""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def record_write(at: float = None) -> None:
+    _last_write.set(at if at is not None else time.time())
+
+
+def last_write() -> float:
+    return _last_write.get()
+
+
+def is_pinned() -> bool:
+    return _pinned.get() or time.time() - _last_write.get() < sticky_seconds()
+
+
+@contextmanager
+def write_window(last_write_at: float = 0.0):
+    """Scope one request's stickiness, starting from the client's last write time."""
+    token = _last_write.set(last_write_at)
+    try:
+        yield
+    finally:
+        _last_write.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Send every read in this block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        if replica is None or is_pinned():
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower not in getattr(settings, 'DATABASE_REPLICA_MODELS', ()):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads that are part of a write transaction (ledger, claims)
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        record_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data, so objects from either side relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
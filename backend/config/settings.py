@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +30,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
 
+# `manage.py test`: keeps background writers and spools off the test run
+TESTING = sys.argv[1:2] == ['test']
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -49,54 +55,60 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
 }
 
-import logging
 # Logging Configuration
+# Application logs go to the console at WARNING and above. Per-request data
+# is one JSON line per request from config.middleware.RequestLogMiddleware,
+# written through a non-blocking queue handler.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
         'simple': {
-            'format': '{levelname} {message}',
+            'format': '{levelname} {asctime} {name} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'config.logging_handlers.JsonFormatter',
+        },
     },
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
-            'formatter': 'verbose',
-        },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        # Tests still build the records (and assert on them) but print nothing
+        'request_log': {'class': 'logging.NullHandler'} if TESTING else {
+            'class': 'config.logging_handlers.NonBlockingHandler',
+            'formatter': 'json',
+            # REQUEST_LOG_FILE writes to a file instead of stdout
+            **({'filename': os.environ['REQUEST_LOG_FILE']} if os.environ.get('REQUEST_LOG_FILE') else {'stream': 'ext://sys.stdout'}),
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
     },
     'loggers': {
-        'django': {
-            'handlers': ['file', 'console'],
-            'level': 'INFO',
-            'propagate': True,
-        },
-        'inventory': {
-            'handlers': ['file', 'console'],
+        'request_log': {
+            'handlers': ['request_log'],
             'level': 'INFO',
-            'propagate': True,
+            'propagate': False,
         },
     },
 }
 
-# Log on initialisation
-import sys
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
-logger = logging.getLogger('django')
-logger.info('Django initialisation: INFO log')
-logger.error('Django initialisation: ERROR log')
+# Structured request log (config.middleware.RequestLogMiddleware)
+REQUEST_LOG_ENABLED = True
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', 1.0))  # fraction of requests kept
+REQUEST_LOG_SLOW_MS = 1000  # slower requests (and 5xx) are always logged
+
+# Per-route profiling (config.middleware.ProfilingMiddleware), scraped from
+# /api/metrics/ by admins; ?_profile=1 returns a cProfile summary to staff
+PROFILING_ENABLED = True
+PROFILING_WINDOW = 1000  # samples kept per route for p50/p95/p99
+PROFILING_MAX_ROUTES = 200
+PROFILING_CPROFILE_LINES = 50
 
 
 # Application definition
@@ -107,6 +119,7 @@ INSTALLED_APPS = [
     'inventory',
     'audit',
     'reports',
+    'archive',
     
     # Third party apps
     'corsheaders',
@@ -126,19 +139,22 @@ INSTALLED_APPS = [
 # Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.PrincipalJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.HybridPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
+    'config.middleware.RequestLogMiddleware',
+    'config.middleware.ProfilingMiddleware',
+    'config.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -171,12 +187,91 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres selects the production profile (env-driven, pooled,
+# optional read replica); SQLite remains the development default.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    _primary = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'inventory'),
+        'USER': os.environ.get('DB_USER', 'inventory'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
-}
+    if os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+        # psycopg 3 connection pool per worker process (replaces CONN_MAX_AGE)
+        _primary['CONN_MAX_AGE'] = 0
+        _primary['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        # Persistent connections, reused across requests for this many seconds
+        _primary['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES = {'default': _primary}
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **_primary,
+            'OPTIONS': copy.deepcopy(_primary['OPTIONS']),
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', _primary['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    # Performance mode for single-node SQLite: WAL so readers never wait for
+    # the writer, and a longer busy timeout. Ledger writes (read a level,
+    # then update it) open with BEGIN IMMEDIATE so they queue on that
+    # timeout instead of failing when a read lock upgrades to a write lock;
+    # see ledger.ledger_atomic. Other transactions keep the deferred BEGIN
+    SQLITE_PERFORMANCE_MODE = os.environ.get('SQLITE_PERFORMANCE_MODE', 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # with WAL a power loss may drop recent commits but never corrupts
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))  # seconds
+
+    def _sqlite(name):
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+        if SQLITE_PERFORMANCE_MODE:
+            database['OPTIONS'] = {
+                # init_command runs on every new connection
+                'init_command': ';'.join(f'PRAGMA {key}={value}' for key, value in SQLITE_PRAGMAS.items()),
+                'timeout': SQLITE_BUSY_TIMEOUT,
+            }
+        return database
+
+    DATABASES = {'default': _sqlite(BASE_DIR / 'db.sqlite3')}
+    if os.environ.get('DB_REPLICA_NAME'):
+        # A second SQLite file (e.g. a periodic copy) standing in for a replica
+        DATABASES['replica'] = {
+            **_sqlite(BASE_DIR / os.environ['DB_REPLICA_NAME']),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Reads of these models go to the replica alias (when configured) unless the
+# context wrote within DATABASE_STICKY_SECONDS; see config/routers.py
+DATABASE_ROUTERS = ['config.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_REPLICA_MODELS = (
+    'inventory.item',
+    'inventory.category',
+    'inventory.inventorylevel',
+    'inventory.itemdailyrollup',
+    'inventory.itemhourlyrollup',
+    'audit.auditlog',
+    'reports.reportdefinition',
+    'reports.reportrun',
+    'reports.reportartifact',
+)
+DATABASE_STICKY_SECONDS = 5
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -237,7 +332,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+    'if-modified-since',
 ]
+# Let the dashboard read validators on conditional list endpoints
+CORS_EXPOSE_HEADERS = ['etag', 'last-modified']
 
 # JWT Settings
 from datetime import timedelta
@@ -264,8 +363,17 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
+
+    # Adds username/role/flags/permission version claims (users.authentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.PrincipalTokenObtainPairSerializer',
 }
 
+# Stateless JWT principals: per-process snapshots used once a token's
+# claims are stale (role or permission version changed since issue).
+# Claims are only trusted with a shared cache (ALLOW_PROCESS_LOCAL_CACHE)
+JWT_PRINCIPAL_CACHE_TIMEOUT = 30  # seconds
+JWT_PRINCIPAL_CACHE_SIZE = 10000
+
 # Cookies (names are used below in views)
 JWT_ACCESS_COOKIE_NAME = "access_token"
 JWT_REFRESH_COOKIE_NAME = "refresh_token"
@@ -274,4 +382,73 @@ JWT_COOKIE_SECURE = False    # True in production behind HTTPS
 JWT_COOKIE_PATH = "/"
 
 # Audit logging toggle (can be disabled in tests or dev)
-AUDIT_ENABLED = True
\ No newline at end of file
+AUDIT_ENABLED = True
+# Ledger write strategy: "lock" (select_for_update then save) or
+# "conditional" (single guarded UPDATE ... WHERE quantity + delta >= 0)
+LEDGER_UPDATE_STRATEGY = "lock"
+# Bounded retry for serialization/lock-timeout errors on ledger writes
+LEDGER_MAX_ATTEMPTS = 3
+LEDGER_RETRY_BACKOFF = 0.02  # seconds, doubled (with jitter) per attempt
+
+# Cache backend. LocMem is per worker process; point this at a shared
+# backend (Redis/Memcached) in production so table-version invalidation
+# is seen by every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+# LocMem is only correct with a single server process. Without this the
+# permission cache and JWT claim trust (users.perm_cache) are disabled on
+# a process-local backend; see the users.W001 check.
+ALLOW_PROCESS_LOCAL_CACHE = DEBUG
+
+# Cached "item has an open low stock alert" flags (inventory.services.alerts)
+LOW_STOCK_ALERT_CACHE_TIMEOUT = 300
+
+# Cached effective permissions per user (users.perm_cache)
+PERMISSION_CACHE_TIMEOUT = 300
+
+# Pre-serialized item list pages, invalidated by table version counters
+ITEM_LIST_CACHE_ENABLED = True
+ITEM_LIST_CACHE_TIMEOUT = 300  # seconds
+
+# Delta sync (inventory.services.sync): changes per response, and how old
+# a change must be before it is served (covers in-flight transactions)
+SYNC_MAX_CHANGES = 5000
+# Sequence numbers are assigned at insert, not commit: a transaction that
+# commits more than this many seconds after recording a change can be
+# skipped by clients that synced in between. Ledger writes take well under
+# a second; raise it if long transactions (bulk admin edits, scripts) save
+# items, categories or levels.
+SYNC_SETTLE_SECONDS = 2
+SYNC_RETENTION_DAYS = 30  # prune_sync_changes drops older changes; clients behind that get 410
+
+# Rows applied per transaction by the server-side CSV stock import
+CSV_IMPORT_CHUNK_SIZE = 1000
+
+# Report worker (python manage.py run_report_worker)
+REPORTS_ARTIFACT_ROOT = BASE_DIR / 'report_artifacts'
+REPORTS_WORKER_PROCESSES = 2
+REPORTS_POLL_INTERVAL = 2.0  # seconds between polls when idle
+REPORTS_STALE_RUN_SECONDS = 3600  # running longer than this at startup => failed
+
+# Batched audit writer (audit/sink.py): rows are queued in-process and
+# bulk-inserted by a background thread, with a local spool for crash recovery.
+# Spool files are named after the database they belong to and are only
+# replayed into that database. Tests write audit rows synchronously.
+AUDIT_ASYNC = not TESTING
+AUDIT_SINK_BATCH_SIZE = 200
+AUDIT_SINK_FLUSH_INTERVAL = 1.0  # seconds
+AUDIT_SINK_MAX_QUEUE = 10000  # beyond this, submit() writes synchronously
+AUDIT_SINK_PUT_TIMEOUT = 0.05  # seconds to wait for queue space first
+AUDIT_SINK_SPOOL_DIR = BASE_DIR / 'audit_spool'
+AUDIT_SINK_FSYNC_EACH_ENTRY = False  # True: fsync per row on the request thread, not once per batch
+AUDIT_SINK_MAX_ATTEMPTS = 5  # tries for a batch hitting OperationalError before it is dead-lettered
+AUDIT_SINK_RETRY_BACKOFF = 0.1  # seconds, doubled per attempt
+
+# Archival tier (archive app): archive_ledger moves InventoryTransaction and
+# AuditLog rows older than the horizon into monthly gzip segments
+ARCHIVE_ROOT = BASE_DIR / 'archive_segments'
+ARCHIVE_HORIZON_DAYS = 365  # whole months older than this are archived
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from users.token_views import CustomTokenObtainPairView, CustomTokenRefreshView
+from config.views import metrics
 
 # drf-spectacular imports
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
@@ -12,6 +13,8 @@ urlpatterns = [
     path("api/inventory/", include('inventory.urls')),
     path("api/", include('users.urls')),
     path("api/audit-logs/", include('audit.urls')),
+    path("api/reports/", include('reports.urls')),
+    path("api/metrics/", metrics, name="metrics"),
 
     # drf-spectacular schema and docs
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -0,0 +1,14 @@
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from . import profiling
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-route latency, SQL, serializer and size summaries for this worker (Prometheus text)."""
+    return HttpResponse(profiling.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
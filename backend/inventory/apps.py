@@ -1,2 +1,9 @@
 from django.apps import AppConfig
 
+
+class InventoryConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'inventory'
+
+    def ready(self):
+        from . import signals  # bump cache versions on item/category writes
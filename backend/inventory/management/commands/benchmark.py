@@ -0,0 +1,334 @@
+import json
+import logging
+import math
+import platform
+import random
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit import sink as audit_sink
+from audit.models import AuditLog
+from inventory.models import Item
+from inventory.services import ledger, synthetic
+from users.models import Roles
+
+SCENARIOS = ('ledger', 'bulk', 'item_list', 'audit_list')
+# Latency changes smaller than this are treated as noise whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+def _int_list(value):
+    try:
+        return [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CommandError(f'Expected a comma-separated list of integers, got {value!r}')
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _latency_metrics(prefix, samples):
+    return {
+        f'{prefix}.p50_ms': {'value': _ms(statistics.median(samples)), 'unit': 'ms', 'better': 'lower'},
+        f'{prefix}.p95_ms': {'value': _ms(_percentile(samples, 95)), 'unit': 'ms', 'better': 'lower'},
+    }
+
+
+def compare(metrics, baseline, tolerance):
+    """
+    Compare metric dicts ({name: {value, unit, better}}) against a baseline.
+
+    Returns one row per current metric with its status: 'regressed' or
+    'improved' when it moved by more than `tolerance` (a fraction) in the
+    bad or good direction, 'ok' otherwise, and 'new' when the baseline has
+    no such metric.
+    """
+    rows = []
+    for name, current in sorted(metrics.items()):
+        base = baseline.get(name)
+        row = {'metric': name, 'value': current['value'], 'baseline': None, 'change': None, 'status': 'new'}
+        if base is not None:
+            row['baseline'] = base['value']
+            if base['value']:
+                change = (current['value'] - base['value']) / base['value']
+            else:
+                change = 0.0 if current['value'] == base['value'] else 1.0
+            worse = change if current['better'] == 'lower' else -change
+            noise = current['unit'] == 'ms' and abs(current['value'] - base['value']) < NOISE_FLOOR_MS
+            row['change'] = round(change, 4)
+            if worse > tolerance and not noise:
+                row['status'] = 'regressed'
+            elif worse < -tolerance and not noise:
+                row['status'] = 'improved'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks ledger writes, bulk adjustments and the item/audit list endpoints on a synthetic '
+        'catalog; writes the results as JSON and fails when they regress against a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10000, help='Synthetic catalog size')
+        parser.add_argument('--transactions', type=int, default=100000, help='Ledger rows to generate')
+        parser.add_argument('--audit-ratio', type=float, default=1.0, help='Generated audit rows per transaction')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes for data generation')
+        parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='Only run this scenario (repeatable)')
+        parser.add_argument('--writers', type=_int_list, default=[1, 4, 8], help='Concurrent ledger writers, e.g. 1,4,8')
+        parser.add_argument('--ops', type=int, default=200, help='apply_stock_delta calls per ledger writer')
+        parser.add_argument('--batch-sizes', type=_int_list, default=[10, 100, 1000], help='bulk_adjust_stock batch sizes')
+        parser.add_argument('--pages', type=_int_list, default=[1, 10, 100], help='List page depths to time')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per list page / bulk batch size')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for data and workload')
+        parser.add_argument('--output', help='Write the results JSON here')
+        parser.add_argument('--baseline', help='Compare against this results JSON and fail on regressions')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression (default 0.25)')
+        parser.add_argument('--save-baseline', help='Also write the results JSON here as the new baseline')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the scratch database (and its catalog) for the next run',
+        )
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='Use the configured database instead of a scratch test database (adds synthetic rows to it)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        if options['in_place']:
+            metrics = self._benchmark(options)
+        else:
+            metrics = self._benchmark_in_scratch_database(options)
+
+        results = {
+            'meta': {
+                'engine': connection.vendor,
+                'python': platform.python_version(),
+                'started_at': timezone.now().isoformat(),
+                'config': {
+                    key: options[key] for key in (
+                        'items', 'transactions', 'audit_ratio', 'writers', 'ops', 'batch_sizes', 'pages', 'repeat', 'seed',
+                    )
+                },
+            },
+            'metrics': metrics,
+        }
+        for path in filter(None, (options['output'], options['save_baseline'])):
+            Path(path).write_text(json.dumps(results, indent=2))
+
+        if baseline is None:
+            for name, metric in sorted(metrics.items()):
+                self.stdout.write(f"{name:<40} {metric['value']:>12} {metric['unit']}")
+            return
+        self._report(results, baseline, options['tolerance'])
+
+    def _benchmark_in_scratch_database(self, options):
+        db = connection.settings_dict
+        if db['ENGINE'].endswith('sqlite3') and db['TEST'].get('NAME') in (None, '', ':memory:'):
+            # Concurrent writers need a real file, not the shared in-memory test DB
+            db['TEST']['NAME'] = str(Path(settings.BASE_DIR) / 'benchmark.sqlite3')
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        # No spool: crash leftovers belong to the real database, not the scratch one
+        try:
+            with override_settings(AUDIT_SINK_SPOOL_DIR=None):
+                return self._benchmark(options)
+        finally:
+            if audit_sink.async_enabled():
+                audit_sink.get_sink().stop()  # land queued audit rows before the database goes
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def _benchmark(self, options):
+        rng = random.Random(options['seed'])
+        self.user = self._user()
+        self._generate(options)
+        self.item_ids = list(Item.objects.filter(name__startswith=synthetic.ITEM_PREFIX).values_list('id', flat=True))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        metrics = {}
+        request_log = logging.getLogger('request_log')
+        request_log.disabled = True  # one line per benchmark request would drown the report
+        try:
+            for scenario in options['scenario'] or SCENARIOS:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{scenario}...'))
+                metrics.update(getattr(self, f'_bench_{scenario}')(options, rng))
+        finally:
+            request_log.disabled = False
+        return metrics
+
+    def _user(self):
+        user, _ = get_user_model().objects.get_or_create(
+            username='bench.admin', defaults={'role': Roles.ADMIN, 'is_staff': True},
+        )
+        return user
+
+    # -- synthetic catalog ---------------------------------------------------
+
+    def _generate(self, options):
+        existing = Item.objects.filter(name__startswith=synthetic.ITEM_PREFIX).count()
+        if existing >= options['items']:
+            self.stdout.write(f'Reusing {existing} synthetic items')
+            return
+        # Zipfian popularity and diurnal timing, like production
+        stats = synthetic.generate(
+            categories=50,
+            items=options['items'] - existing,
+            transactions=options['transactions'],
+            days=90,
+            user_ids=[self.user.pk],
+            audit_ratio=options['audit_ratio'],
+            processes=options['processes'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Generated {stats['items']['rows']} items, {stats['transactions']['rows']} transactions and "
+            f"{stats['audit_logs']['rows']} audit rows in {sum(phase['seconds'] for phase in stats.values()):.1f}s"
+        )
+
+    # -- scenarios -------------------------------------------------------------
+
+    def _bench_ledger(self, options, rng):
+        metrics = {}
+        pool = list(Item.objects.filter(pk__in=rng.sample(self.item_ids, min(len(self.item_ids), 1000))))
+        for writers in options['writers']:
+            lock = threading.Lock()
+            latencies, errors = [], []
+
+            def writer(seed):
+                local = random.Random(seed)
+                try:
+                    for _ in range(options['ops']):
+                        started = time.perf_counter()
+                        try:
+                            ledger.apply_stock_delta(
+                                item=local.choice(pool), delta=local.randint(1, 5), user=self.user, reason='adjustment',
+                            )
+                        except ledger.LedgerError:
+                            with lock:
+                                errors.append(1)
+                            continue
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+                finally:
+                    connections.close_all()
+
+            ledger.reset_retry_stats()
+            threads = [threading.Thread(target=writer, args=(rng.random(),)) for _ in range(writers)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            prefix = f'ledger.writers_{writers}'
+            metrics[f'{prefix}.ops_per_s'] = {'value': round(len(latencies) / elapsed, 1), 'unit': 'ops/s', 'better': 'higher'}
+            metrics[f'{prefix}.errors'] = {'value': len(errors), 'unit': 'count', 'better': 'lower'}
+            metrics[f'{prefix}.retries'] = {
+                'value': ledger.retry_stats().get('retried', 0), 'unit': 'count', 'better': 'lower',
+            }
+            if latencies:
+                metrics.update(_latency_metrics(prefix, latencies))
+        return metrics
+
+    def _bench_bulk(self, options, rng):
+        metrics = {}
+        url = reverse('item-bulk-adjust-stock')
+        for size in options['batch_sizes']:
+            size = min(size, len(self.item_ids))
+            latencies = []
+            for _ in range(options['repeat']):
+                payload = {'adjustments': [
+                    {'item': item_id, 'delta': rng.randint(-5, 10)} for item_id in rng.sample(self.item_ids, size)
+                ]}
+                started = time.perf_counter()
+                resp = self.client.post(url, payload, format='json')
+                latencies.append(time.perf_counter() - started)
+                if resp.status_code != 200:
+                    raise CommandError(f'bulk_adjust_stock returned {resp.status_code}: {resp.content[:200]!r}')
+            prefix = f'bulk.batch_{size}'
+            metrics.update(_latency_metrics(prefix, latencies))
+            metrics[f'{prefix}.rows_per_s'] = {
+                'value': round(size * len(latencies) / sum(latencies), 1), 'unit': 'rows/s', 'better': 'higher',
+            }
+        return metrics
+
+    def _bench_item_list(self, options, rng):
+        url = reverse('item-list')
+        # Repeated requests for a page would otherwise be served by the item page cache
+        with override_settings(ITEM_LIST_CACHE_ENABLED=False):
+            metrics = self._bench_pages('item_list', url, len(self.item_ids), options)
+        if getattr(settings, 'ITEM_LIST_CACHE_ENABLED', True):
+            metrics.update(self._bench_pages('item_list.cached', url, len(self.item_ids), options, warm=True))
+        return metrics
+
+    def _bench_audit_list(self, options, rng):
+        return self._bench_pages('audit_list', reverse('auditlog-list'), AuditLog.objects.count(), options)
+
+    def _bench_pages(self, name, url, rows, options, warm=False):
+        """Latency per requested page; with warm=True each page is fetched once first and not timed."""
+        metrics = {}
+        last_page = max(1, math.ceil(rows / settings.REST_FRAMEWORK['PAGE_SIZE']))
+        for page in options['pages']:
+            if page > last_page:
+                self.stdout.write(f'  skipping {name} page {page} (only {last_page} pages)')
+                continue
+            latencies = []
+            if warm:
+                self.client.get(url, {'page': page})
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                resp = self.client.get(url, {'page': page})
+                latencies.append(time.perf_counter() - started)
+                if resp.status_code != 200:
+                    raise CommandError(f'{url}?page={page} returned {resp.status_code}')
+            metrics.update(_latency_metrics(f'{name}.page_{page}', latencies))
+        return metrics
+
+    # -- baseline ------------------------------------------------------------
+
+    def _report(self, results, baseline, tolerance):
+        if baseline.get('meta', {}).get('config') != results['meta']['config']:
+            self.stdout.write(self.style.WARNING('Baseline was recorded with different options; comparison is approximate'))
+        rows = compare(results['metrics'], baseline.get('metrics', {}), tolerance)
+        styles = {'regressed': self.style.ERROR, 'improved': self.style.SUCCESS}
+        for row in rows:
+            change = f"{row['change']:+.1%}" if row['change'] is not None else ''
+            line = f"{row['metric']:<40} {row['value']:>12} {str(row['baseline']):>12} {change:>8}  {row['status']}"
+            self.stdout.write(styles.get(row['status'], str)(line))
+
+        regressed = [row['metric'] for row in rows if row['status'] == 'regressed']
+        if regressed:
+            raise CommandError(f"{len(regressed)} metric(s) regressed beyond {tolerance:.0%}: {', '.join(regressed)}")
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {tolerance:.0%}'))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.services import sync
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes delta-sync changes older than the retention window; clients that '
+        'last synced before it are told to download everything again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'SYNC_RETENTION_DAYS', 30),
+            help='Keep changes from this many days (default SYNC_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must be >= 0')
+        deleted = sync.prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} sync changes; clients need since >= {sync.retained_floor()}.'
+        ))
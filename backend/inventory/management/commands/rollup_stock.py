@@ -0,0 +1,33 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from inventory.services.rollups import rebuild_rollups, last_rollup_date
+
+class Command(BaseCommand):
+    help = 'Builds per-item daily and hourly stock rollups from the transaction ledger (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Rebuild rollups from this date (YYYY-MM-DD) onwards',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild every rollup from the full ledger',
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            since = None
+        elif options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        else:
+            # Recompute the last rolled-up day (it may have been partial) onwards
+            since = last_rollup_date()
+
+        written = rebuild_rollups(since=since)
+        scope = 'all days' if since is None else f'days since {since.isoformat()}'
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows ({scope}).'))
@@ -0,0 +1,207 @@
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Count, Sum
+from django.test import override_settings
+from django.utils import timezone
+
+from inventory.models import InventoryTransaction, Item
+from inventory.services import inventory, ledger, synthetic
+
+MODES = ('legacy', 'performance')
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress-tests SQLite with bulk-import writers and dashboard readers, comparing the '
+        'default journal mode against the WAL performance settings, where ledger writes open with '
+        'BEGIN IMMEDIATE. Writers go '
+        'through ledger.apply_stock_deltas and readers through the low-stock and ledger queries, '
+        'on a scratch database migrated like the real one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds to run each mode')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads')
+        parser.add_argument('--writers', type=int, default=2, help='Concurrent bulk-import writer threads')
+        parser.add_argument('--items', type=int, default=5000, help='Items in the scratch database')
+        parser.add_argument('--batch', type=int, default=1000, help='Adjustments per import transaction')
+        parser.add_argument('--mode', choices=MODES, action='append', help='Only run this mode (repeatable)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+        if pragmas is None:
+            raise CommandError('SQLite performance settings are not loaded (DB_ENGINE is not sqlite)')
+        timeout = getattr(settings, 'SQLITE_BUSY_TIMEOUT', 20)
+        database_options = {
+            # Django's defaults: rollback journal, deferred transactions, 5s busy timeout
+            'legacy': {'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL'},
+            # What settings._sqlite() configures with SQLITE_PERFORMANCE_MODE
+            'performance': {
+                'init_command': ';'.join(f'PRAGMA {key}={value}' for key, value in pragmas.items()),
+                'timeout': timeout,
+            },
+        }
+
+        results = []
+        with tempfile.TemporaryDirectory() as scratch:
+            for mode in options['mode'] or MODES:
+                path = Path(scratch) / f'{mode}.sqlite3'
+                results.append(self._in_scratch_database(path, database_options[mode], mode, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{result['mode']}:"))
+            self.stdout.write(
+                f"  readers: {result['reads']} reads, p50 {result['read_p50_ms']} ms, "
+                f"p95 {result['read_p95_ms']} ms, p99 {result['read_p99_ms']} ms, "
+                f"max {result['read_max_ms']} ms, {result['read_errors']} errors"
+            )
+            self.stdout.write(
+                f"  writers: {result['batches']} batches ({result['rows']} rows), "
+                f"p95 {result['write_p95_ms']} ms per batch, {result['retries']} retries, "
+                f"{result['write_errors']} errors"
+            )
+
+    def _in_scratch_database(self, path, database_options, mode, options):
+        """
+        Run one mode against a freshly migrated SQLite file.
+
+        Every thread's connection is built from the same settings dict, so
+        pointing it at the scratch file redirects the ORM, the ledger and
+        its retries there. The work runs in its own thread: connections
+        this thread already holds (a test database, say) are never reused.
+        """
+        db = connections.settings[DEFAULT_DB_ALIAS]
+        if not db['ENGINE'].endswith('sqlite3'):
+            raise CommandError('sqlite_stress needs the default database to be SQLite')
+        outcome = {}
+
+        def run():
+            saved = {key: db.get(key) for key in ('NAME', 'OPTIONS')}
+            db.update(NAME=str(path), OPTIONS=database_options)
+            ContentType.objects.clear_cache()  # ids differ between the two databases
+            try:
+                # Audit rows land in the writer's transaction instead of a process-wide sink;
+                # the ledger only opens with BEGIN IMMEDIATE in performance mode
+                with override_settings(AUDIT_ASYNC=False, SQLITE_PERFORMANCE_MODE=mode == 'performance'):
+                    call_command('migrate', verbosity=0, interactive=False)
+                    pool = self._setup(options['items'])
+                    outcome['result'] = self._run(pool, mode, options)
+            except BaseException as exc:
+                outcome['error'] = exc
+            finally:
+                connections.close_all()
+                db.update(saved)
+                ContentType.objects.clear_cache()
+
+        thread = threading.Thread(target=run, name=f'sqlite-stress-{mode}')
+        thread.start()
+        thread.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _setup(self, items):
+        rng = random.Random(0)
+        category_ids = synthetic.create_categories(20)
+        created = synthetic.create_items(items, category_ids, rng, created_at=timezone.now() - timedelta(days=1))
+        synthetic.create_levels(created)
+        pool = list(Item.objects.all())
+        for start in range(0, len(pool), 1000):
+            ledger.apply_stock_deltas(
+                adjustments=[{'item': item, 'delta': rng.randint(0, 100)} for item in pool[start:start + 1000]],
+                reason='init',
+            )
+        return pool
+
+    def _run(self, pool, mode, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {'reads': [], 'read_errors': 0, 'writes': [], 'write_errors': 0, 'rows': 0}
+        batch = min(options['batch'], len(pool))
+        item_ids = [item.pk for item in pool]
+
+        def writer():
+            try:
+                while not stop.is_set():
+                    adjustments = [
+                        {'item': item, 'delta': random.randint(-5, 10)} for item in random.sample(pool, batch)
+                    ]
+                    started = time.perf_counter()
+                    try:
+                        ledger.apply_stock_deltas(adjustments=adjustments, reason='csv')
+                    except (ledger.LedgerError, OperationalError):
+                        with lock:
+                            stats['write_errors'] += 1
+                        continue
+                    with lock:
+                        stats['writes'].append(time.perf_counter() - started)
+                        stats['rows'] += batch
+            finally:
+                connections.close_all()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        list(inventory.get_low_stock_items()[:50])
+                        InventoryTransaction.objects.filter(item_id=random.choice(item_ids)).aggregate(
+                            count=Count('id'), total=Sum('delta'),
+                        )
+                    except OperationalError:
+                        with lock:
+                            stats['read_errors'] += 1
+                        continue
+                    with lock:
+                        stats['reads'].append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        ledger.reset_retry_stats()
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        reads, writes = stats['reads'], stats['writes']
+        return {
+            'mode': mode,
+            'reads': len(reads),
+            'read_p50_ms': round(statistics.median(reads) * 1000, 3) if reads else None,
+            'read_p95_ms': _percentile(reads, 95),
+            'read_p99_ms': _percentile(reads, 99),
+            'read_max_ms': round(max(reads) * 1000, 3) if reads else None,
+            'read_errors': stats['read_errors'],
+            'batches': len(writes),
+            'rows': stats['rows'],
+            'write_p95_ms': _percentile(writes, 95),
+            'retries': ledger.retry_stats().get('retried', 0),
+            'write_errors': stats['write_errors'],
+        }
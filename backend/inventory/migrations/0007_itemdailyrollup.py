@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_remove_item_quantity_category_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('inflow', models.PositiveIntegerField(default=0)),
+                ('outflow', models.PositiveIntegerField(default=0)),
+                ('closing_quantity', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='inventory.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='inventory_i_date_3b8073_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'date'), name='uniq_rollup_item_date')],
+            },
+        ),
+    ]
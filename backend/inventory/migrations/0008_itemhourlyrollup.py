@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_itemdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('inflow', models.PositiveIntegerField(default=0)),
+                ('outflow', models.PositiveIntegerField(default=0)),
+                ('closing_quantity', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='inventory.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'hour'), name='uniq_rollup_item_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_itemhourlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archived_through', models.DateTimeField(help_text='Rows created before this moment are archived')),
+                ('balance', models.IntegerField(default=0)),
+                ('inflow', models.PositiveBigIntegerField(default=0)),
+                ('outflow', models.PositiveBigIntegerField(default=0)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoint', to='inventory.item')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:41
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_shortage(apps, schema_editor):
+    """Give every item a level row and compute threshold - quantity."""
+    Item = apps.get_model('inventory', 'Item')
+    InventoryLevel = apps.get_model('inventory', 'InventoryLevel')
+    InventoryLevel.objects.bulk_create(
+        [
+            InventoryLevel(item_id=item_id, quantity=0)
+            for item_id in Item.objects.filter(current_level__isnull=True).values_list('id', flat=True)
+        ],
+        batch_size=1000,
+    )
+    threshold = Item.objects.filter(pk=OuterRef('item_id')).values('low_stock_threshold')[:1]
+    InventoryLevel.objects.update(shortage=Subquery(threshold) - F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_ledgercheckpoint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventorylevel',
+            name='inventory_i_quantit_0e4ea2_idx',
+        ),
+        migrations.AddField(
+            model_name='inventorylevel',
+            name='shortage',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_shortage, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inventorylevel',
+            index=models.Index(condition=models.Q(('shortage__gte', 0)), fields=['-shortage'], name='inventorylevel_low_stock'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+from datetime import timezone as dt_timezone
+
+from django.db import migrations
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Build daily and hourly rollups for ledgers that predate them.
+
+    Only runs when no rollup exists yet, so databases already maintained by
+    the ledger or by `rollup_stock` are left alone. Openings start from the
+    LedgerCheckpoint balance of archived items.
+    """
+    InventoryTransaction = apps.get_model('inventory', 'InventoryTransaction')
+    LedgerCheckpoint = apps.get_model('inventory', 'LedgerCheckpoint')
+    buckets = (
+        (apps.get_model('inventory', 'ItemDailyRollup'), 'date', TruncDate('created_at')),
+        (apps.get_model('inventory', 'ItemHourlyRollup'), 'hour', TruncHour('created_at', tzinfo=dt_timezone.utc)),
+    )
+    if any(model.objects.exists() for model, _, _ in buckets) or not InventoryTransaction.objects.exists():
+        return
+    checkpoints = dict(LedgerCheckpoint.objects.values_list('item_id', 'balance'))
+    for model, field, bucket in buckets:
+        balances = dict(checkpoints)
+        grouped = (
+            InventoryTransaction.objects.annotate(bucket=bucket)
+            .values('item_id', 'bucket')
+            .annotate(
+                inflow=Coalesce(Sum(Case(When(delta__gt=0, then=F('delta')), output_field=IntegerField())), 0),
+                outflow=Coalesce(Sum(Case(When(delta__lt=0, then=-F('delta')), output_field=IntegerField())), 0),
+            )
+            .order_by('item_id', 'bucket')
+        )
+        batch = []
+        for row in grouped.iterator(chunk_size=2000):
+            closing = balances.get(row['item_id'], 0) + row['inflow'] - row['outflow']
+            balances[row['item_id']] = closing
+            batch.append(model(
+                item_id=row['item_id'],
+                inflow=row['inflow'],
+                outflow=row['outflow'],
+                closing_quantity=max(closing, 0),
+                **{field: row['bucket']},
+            ))
+            if len(batch) >= 2000:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_syncchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
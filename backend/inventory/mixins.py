@@ -0,0 +1,57 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .services.cache import list_etag, table_last_modified
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified on reads, answered from table version counters.
+
+    Views set `etag_tables`: every table whose rows feed the response.
+    Their versions (inventory.services.cache) plus host, path, query
+    string and Accept make a strong ETag, and the latest bump time is
+    Last-Modified. Both are checked right after authentication and
+    permissions, so a matching If-None-Match (or If-Modified-Since)
+    gets a bare 304 before any queryset, page cache or serializer runs.
+    Writes to those tables must bump their versions, as the signals and
+    the ledger already do.
+    """
+    etag_tables = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._conditional_validators = None
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return
+        etag = list_etag(
+            self.etag_tables,
+            host=request.get_host(),
+            path=request.path,
+            query_params=request.query_params,
+            accept=request.META.get('HTTP_ACCEPT', ''),
+        )
+        last_modified = int(table_last_modified(self.etag_tables))
+        self._conditional_validators = (etag, last_modified)
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_conditional_validators', None) and response.status_code in (200, 304):
+            etag, last_modified = self._conditional_validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -31,7 +31,8 @@ class Item(models.Model):
         Backed by InventoryLevel via the reverse OneToOne relation
         `current_level` (defined on InventoryLevel.item with related_name="current_level").
 
-        - InventoryLevel is created on the first stock adjustment (see services.ledger.apply_stock_delta)
+        - InventoryLevel is created with the item (see services.inventory.sync_stock_level);
+          items bulk-created without signals get it on their first stock adjustment
         - Until then, accessing `current_level` may raise DoesNotExist; we report 0 in that case
         - API serializers expose this value as read-only to force adjustments through the ledger
         """
@@ -56,10 +57,19 @@ class InventoryLevel(models.Model):
     # Access from Item via `item.current_level` thanks to related_name.
     item = models.OneToOneField(Item, on_delete=models.CASCADE, related_name='current_level')
     quantity = models.PositiveIntegerField(default=0)
+    # Item.low_stock_threshold - quantity, kept in sync by the ledger and by
+    # threshold edits; >= 0 means the item is low, larger is more severe.
+    shortage = models.IntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        indexes = [models.Index(fields=['quantity'])]  # For low-stock queries
+        indexes = [
+            # Only low items are indexed, so the low-stock panel reads a small
+            # index instead of comparing quantity to threshold across a join
+            models.Index(
+                fields=['-shortage'], name='inventorylevel_low_stock', condition=models.Q(shortage__gte=0)
+            ),
+        ]
 
 class InventoryTransaction(models.Model):
     REASON_CHOICES = [
@@ -102,3 +112,60 @@ class Alert(models.Model):
             models.Index(fields=['type', 'resolved_at']),
             models.Index(fields=['item'])
         ]
+
+class ItemDailyRollup(models.Model):
+    # Per-item, per-day ledger summary maintained by the ledger (and rebuilt
+    # by the rollup_stock command). Monthly reports read these instead of
+    # scanning InventoryTransaction.
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    inflow = models.PositiveIntegerField(default=0)
+    outflow = models.PositiveIntegerField(default=0)
+    closing_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'date'], name='uniq_rollup_item_date'),
+        ]
+        indexes = [models.Index(fields=['date'])]
+
+class ItemHourlyRollup(models.Model):
+    # Hourly counterpart of ItemDailyRollup backing hour-resolution stock
+    # trends; `hour` is the UTC start of the bucket.
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='hourly_rollups')
+    hour = models.DateTimeField()
+    inflow = models.PositiveIntegerField(default=0)
+    outflow = models.PositiveIntegerField(default=0)
+    closing_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'hour'], name='uniq_rollup_item_hour'),
+        ]
+
+class LedgerCheckpoint(models.Model):
+    # Summary of InventoryTransaction rows moved to archive segments (see the
+    # archive app): the item's balance as of `archived_through`, so rollup
+    # rebuilds and balance checks still work once old rows leave the table.
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, related_name='ledger_checkpoint')
+    archived_through = models.DateTimeField(help_text='Rows created before this moment are archived')
+    balance = models.IntegerField(default=0)
+    inflow = models.PositiveBigIntegerField(default=0)
+    outflow = models.PositiveBigIntegerField(default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class SyncChange(models.Model):
+    # Append-only change sequence for delta sync (inventory.services.sync):
+    # one row per changed Item / Category / InventoryLevel, in id order.
+    # Level rows use the item id as object_id.
+    TABLES = [
+        ('item', 'Item'),
+        ('category', 'Category'),
+        ('inventorylevel', 'Inventory level'),
+    ]
+
+    table = models.CharField(max_length=20, choices=TABLES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
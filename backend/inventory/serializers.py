@@ -62,6 +62,14 @@ class ItemSerializer(serializers.ModelSerializer):
       return value
 
 
+class LowStockItemSerializer(ItemSerializer):
+    # Units below threshold (0 = exactly at threshold), from get_low_stock_items
+    shortage = serializers.IntegerField(read_only=True)
+
+    class Meta(ItemSerializer.Meta):
+        fields = ItemSerializer.Meta.fields + ["shortage"]
+
+
 class QuantityOnlySerializer(serializers.ModelSerializer):
     class Meta:
         model = Item
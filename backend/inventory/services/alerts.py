@@ -0,0 +1,139 @@
+"""
+Low-stock alert evaluation, driven by threshold crossings.
+
+The ledger hands each batch of (item, old quantity, new quantity) changes
+to evaluate_on_commit(); nothing is queried per adjustment. After the
+ledger transaction commits, evaluate() classifies every changed item once:
+
+- falling or rising (crossed the threshold): checked against the database
+- hovering (was and still is low): nothing to do when the cached
+  alerted-set says the item is already alerted
+- staying above threshold: dropped before any work is scheduled
+
+Checked items are decided from their current InventoryLevel.shortage,
+read under a row lock: low items get an alert unless one is open, and
+items no longer low have their open alerts resolved. Only hovering items
+trust the cache (one key per item, LOW_STOCK_ALERT_CACHE_TIMEOUT), so low
+SKUs that keep moving cost no alert queries at all. Changes to Alert rows made outside
+this module (manual resolve, deletes) drop the cached entry via the
+signal in inventory.signals; with several workers that needs a shared
+cache backend to reach all of them.
+"""
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import Alert, InventoryLevel, Item
+from .cache import bump_table_version
+
+logger = logging.getLogger(__name__)
+
+ALERTED_KEY_PREFIX = 'inventory:alerted:'
+
+Change = Tuple[Item, int, int]  # item, old quantity, new quantity
+
+
+def _key(item_id: int) -> str:
+    return f'{ALERTED_KEY_PREFIX}{item_id}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'LOW_STOCK_ALERT_CACHE_TIMEOUT', 300)
+
+
+def forget(item_ids: Iterable[int]) -> None:
+    """Drop cached alert state so the next change re-checks the database."""
+    cache.delete_many([_key(item_id) for item_id in item_ids])
+
+
+def _open_alert_item_ids(item_ids: List[int]) -> Set[int]:
+    return set(
+        Alert.objects.filter(item_id__in=item_ids, type='low_stock', resolved_at__isnull=True)
+        .values_list('item_id', flat=True)
+    )
+
+
+def evaluate(changes: Iterable[Change]) -> Dict[str, int]:
+    """
+    Open and resolve low-stock alerts for a batch of quantity changes.
+
+    Each item should appear once, with its quantity before the batch and
+    after it. Those quantities only pick the items to look at: callbacks
+    of overlapping ledger transactions can run in any order, so whether
+    an item is low is read from its InventoryLevel row, locked until the
+    alerts are written. Returns {'opened': n, 'resolved': n}.
+    """
+    candidates: Dict[int, Item] = {}
+    hovering: List[Item] = []
+    for item, old_quantity, new_quantity in changes:
+        threshold = item.low_stock_threshold
+        if old_quantity <= threshold and new_quantity <= threshold:
+            hovering.append(item)
+        elif min(old_quantity, new_quantity) <= threshold:
+            candidates[item.pk] = item
+
+    cached = cache.get_many([_key(item.pk) for item in hovering])
+    candidates.update({item.pk: item for item in hovering if cached.get(_key(item.pk)) is not True})
+    if not candidates:
+        return {'opened': 0, 'resolved': 0}
+
+    with transaction.atomic():
+        levels = {
+            item_id: (quantity, shortage)
+            for item_id, quantity, shortage in InventoryLevel.objects.select_for_update()
+            .filter(item_id__in=candidates)
+            .values_list('item_id', 'quantity', 'shortage')
+        }
+        low = {item_id for item_id, (_, shortage) in levels.items() if shortage >= 0}
+        already_open = _open_alert_item_ids(list(levels))
+        new_alerts = [
+            Alert(
+                item=candidates[item_id], type='low_stock',
+                message=f'Low stock alert: {candidates[item_id].name} ({levels[item_id][0]} remaining)',
+            )
+            for item_id in low - already_open
+        ]
+        recovered = already_open - low
+        resolved = 0
+        if recovered:
+            resolved = Alert.objects.filter(
+                item_id__in=recovered, type='low_stock', resolved_at__isnull=True,
+            ).update(resolved_at=timezone.now())
+        if new_alerts:
+            Alert.objects.bulk_create(new_alerts, batch_size=500)
+        if recovered or new_alerts:
+            bump_table_version('alert')
+        # Written under the row locks, so a later evaluation cannot be overwritten by an earlier one
+        cache.set_many({_key(item_id): item_id in low for item_id in levels}, _timeout())
+    return {'opened': len(new_alerts), 'resolved': resolved}
+
+
+def evaluate_on_commit(changes: Iterable[Change]) -> None:
+    """
+    Schedule evaluate() for after the current transaction commits.
+
+    Items that were and stay above their threshold are dropped here, so
+    the common adjustment schedules nothing. Alert writes happen outside
+    the ledger transaction; a failure is logged and the affected items
+    are re-checked against the database on their next change.
+    """
+    pending = [
+        (item, old_quantity, new_quantity)
+        for item, old_quantity, new_quantity in changes
+        if min(old_quantity, new_quantity) <= item.low_stock_threshold
+    ]
+    if not pending:
+        return
+
+    def run():
+        try:
+            evaluate(pending)
+        except Exception:
+            logger.exception('Low stock alert evaluation failed for %d items', len(pending))
+            forget(item.pk for item, _, _ in pending)
+
+    transaction.on_commit(run)
@@ -1,12 +1,15 @@
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db import transaction as db_transaction
 
 try:
     from audit.models import AuditLog
+    from audit import sink as audit_sink
 except Exception:  # pragma: no cover - during early migrations/imports
     AuditLog = None  # type: ignore
+    audit_sink = None  # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +26,31 @@ def _coalesce_context(context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
+def _stock_adjust_entry(*, item, actor, content_type, before_state, after_state, ctx) -> Dict[str, Any]:
+    """AuditLog column values for one stock adjustment (see audit.sink.ENTRY_FIELDS)."""
+    return {
+        'actor_id': getattr(actor, 'pk', None),
+        'action': 'STOCK_ADJUST',
+        'content_type_id': content_type.pk,
+        'object_id': str(item.pk),
+        'before_state': before_state,
+        'after_state': after_state,
+        'ip_address': ctx.get('ip_address'),
+        'user_agent': ctx.get('user_agent', ''),
+        'additional_context': {k: v for k, v in ctx.items() if k not in {'ip_address', 'user_agent'}},
+    }
+
+
+def _write_entries(entries: List[Dict[str, Any]]) -> None:
+    """Hand rows to the async sink (settings.AUDIT_ASYNC) or insert them now."""
+    if audit_sink is not None and audit_sink.async_enabled():
+        sink = audit_sink.get_sink()
+        for entry in entries:
+            sink.submit(entry)
+        return
+    AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries], batch_size=500)
+
+
 def log_stock_adjust(
     *,
     item,
@@ -36,6 +64,7 @@ def log_stock_adjust(
     - Respects settings.AUDIT_ENABLED (default True)
     - Coalesces missing fields (user_agent)
     - Uses on_commit to avoid rolling back main transaction on audit errors
+    - With settings.AUDIT_ASYNC, hands the row to the batched audit sink
     - Catches and logs exceptions to keep domain flow robust
     """
     if not getattr(settings, 'AUDIT_ENABLED', True):
@@ -47,17 +76,55 @@ def log_stock_adjust(
         if AuditLog is None:
             return
         try:
-            AuditLog.log_action(
+            _write_entries([_stock_adjust_entry(
+                item=item,
                 actor=actor,
-                action='STOCK_ADJUST',
-                instance=item,
+                content_type=ContentType.objects.get_for_model(item),
                 before_state=before_state,
                 after_state=after_state,
-                ip_address=ctx.get('ip_address'),
-                user_agent=ctx.get('user_agent', ''),
-                additional_context={k: v for k, v in ctx.items() if k not in {'ip_address', 'user_agent'}},
-            )
+                ctx=ctx,
+            )])
         except Exception:
             logger.exception('Audit logging failed for item %s', getattr(item, 'id', None))
 
     db_transaction.on_commit(_write)
+
+
+def log_stock_adjust_many(
+    *,
+    entries: List[Dict[str, Any]],
+    actor,
+    context: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Batched variant of log_stock_adjust for bulk ledger writes.
+
+    Each entry carries `item`, `before_state`, `after_state` and optionally
+    `context` (merged over the shared context, e.g. note/correlation_id).
+    All rows are written with a single bulk_create after commit, or
+    handed to the audit sink when settings.AUDIT_ASYNC is on.
+    """
+    if not getattr(settings, 'AUDIT_ENABLED', True) or not entries:
+        return
+
+    shared = context or {}
+
+    def _write():
+        if AuditLog is None:
+            return
+        try:
+            content_type = ContentType.objects.get_for_model(entries[0]['item'])
+            _write_entries([
+                _stock_adjust_entry(
+                    item=entry['item'],
+                    actor=actor,
+                    content_type=content_type,
+                    before_state=entry['before_state'],
+                    after_state=entry['after_state'],
+                    ctx=_coalesce_context({**shared, **(entry.get('context') or {})}),
+                )
+                for entry in entries
+            ])
+        except Exception:
+            logger.exception('Bulk audit logging failed for %d entries', len(entries))
+
+    db_transaction.on_commit(_write)
@@ -0,0 +1,113 @@
+import hashlib
+import time
+from typing import Dict, Iterable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'inventory:tablever:'
+MODIFIED_KEY_PREFIX = 'inventory:tablemod:'
+ITEM_LIST_KEY_PREFIX = 'inventory:items:list:'
+
+# Tables whose changes invalidate the cached item list payloads
+ITEM_LIST_TABLES = ('item', 'category', 'inventorylevel')
+
+
+def _version_key(table: str) -> str:
+    return f'{VERSION_KEY_PREFIX}{table}'
+
+
+def _modified_key(table: str) -> str:
+    return f'{MODIFIED_KEY_PREFIX}{table}'
+
+
+def table_versions(tables: Iterable[str]) -> Dict[str, int]:
+    """
+    Current change counters for the given tables.
+
+    A missing counter (never bumped, or evicted) is seeded from the clock so
+    it can never move backwards onto a key that still holds old payloads.
+    """
+    tables = list(tables)
+    found = cache.get_many([_version_key(t) for t in tables])
+    versions = {}
+    for table in tables:
+        key = _version_key(table)
+        if key not in found:
+            cache.add(key, int(time.time() * 1000), None)
+            found[key] = cache.get(key)
+        versions[table] = found[key]
+    return versions
+
+
+def table_last_modified(tables: Iterable[str]) -> float:
+    """
+    Latest change time (epoch seconds) across the given tables.
+
+    A missing timestamp is seeded with the current time: later than the
+    real change, which only costs clients one extra full response.
+    """
+    tables = list(tables)
+    found = cache.get_many([_modified_key(t) for t in tables])
+    for table in tables:
+        key = _modified_key(table)
+        if key not in found:
+            cache.add(key, time.time(), None)
+            found[key] = cache.get(key)
+    return max(found.values())
+
+
+def _bump(tables: Iterable[str]) -> None:
+    now = time.time()
+    for table in tables:
+        key = _version_key(table)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter missing: seed it past anything handed out before
+            if not cache.add(key, int(time.time() * 1000), None):
+                cache.incr(key)
+    cache.set_many({_modified_key(table): now for table in tables}, None)
+
+
+def bump_table_version(*tables: str) -> None:
+    """
+    Invalidate cached reads built from `tables`.
+
+    Bumps immediately and again on commit: the first bump stops readers from
+    reusing entries right away, the second discards anything a concurrent
+    reader cached from pre-commit data in between.
+    """
+    _bump(tables)
+    transaction.on_commit(lambda: _bump(tables))
+
+
+def list_etag(tables: Iterable[str], *, host: str, path: str, query_params, accept: str = '') -> str:
+    """Strong ETag for a read built from `tables`: their versions + the request shape."""
+    tables = list(tables)
+    versions = table_versions(tables)
+    params = sorted((k, v) for k in query_params for v in query_params.getlist(k))
+    raw = repr(([versions[t] for t in tables], host, path, params, accept))
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def item_list_cache_key(*, host: str, query_params) -> str:
+    """Cache key for one item list page: table versions + host + query string."""
+    versions = table_versions(ITEM_LIST_TABLES)
+    params = sorted((k, v) for k in query_params for v in query_params.getlist(k))
+    raw = repr((host, params))
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    version = '.'.join(str(versions[t]) for t in ITEM_LIST_TABLES)
+    return f'{ITEM_LIST_KEY_PREFIX}{version}:{digest}'
+
+
+def get_item_list_page(key: str) -> Optional[dict]:
+    if not getattr(settings, 'ITEM_LIST_CACHE_ENABLED', True):
+        return None
+    return cache.get(key)
+
+
+def set_item_list_page(key: str, payload: dict) -> None:
+    if not getattr(settings, 'ITEM_LIST_CACHE_ENABLED', True):
+        return
+    cache.set(key, payload, getattr(settings, 'ITEM_LIST_CACHE_TIMEOUT', 300))
@@ -0,0 +1,166 @@
+import csv
+import io
+import itertools
+import re
+from typing import Any, Dict, Iterator, List, Optional
+from django.db.models import Q
+from inventory.models import Item
+from .ledger import LedgerBusyError, apply_stock_deltas
+
+# Same columns as the dashboard template: item_id, item_name, quantity_delta, reason
+REQUIRED_COLUMNS = {'quantity_delta'}
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+_INT_RE = re.compile(r'^[-+]?\d+$')
+
+
+class CsvImportError(Exception):
+    """Raised when the file itself cannot be imported (encoding, header)"""
+    pass
+
+
+class CsvImportBusyError(LedgerBusyError):
+    """The ledger stayed busy partway through; `summary` covers the chunks already committed"""
+    def __init__(self, message: str, summary: Dict[str, Any]):
+        super().__init__(message)
+        self.summary = summary
+
+
+def parse_delta(value: Optional[str]) -> Optional[int]:
+    """Integer with optional sign; spaces and thousands separators ignored."""
+    text = re.sub(r'[\s,]', '', value or '')
+    return int(text) if _INT_RE.match(text) else None
+
+
+def _resolve_items(rows: List[Dict[str, Any]]) -> Dict[str, Dict[Any, Item]]:
+    """Look up every item referenced by a chunk with a single IN query."""
+    ids, names = set(), set()
+    for row in rows:
+        if row['item_id'] is not None:
+            ids.add(row['item_id'])
+        elif row['item_name']:
+            names.add(row['item_name'])
+    if not ids and not names:
+        return {'id': {}, 'name': {}}
+    items = Item.objects.filter(Q(pk__in=ids) | Q(name__in=names))
+    by_id, by_name = {}, {}
+    for item in items:
+        by_id[item.pk] = item
+        by_name[item.name] = item
+    return {'id': by_id, 'name': by_name}
+
+
+def _read_rows(stream) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(stream)
+    columns = {c.strip() for c in (reader.fieldnames or [])}
+    missing = REQUIRED_COLUMNS - columns
+    if missing or not columns & {'item_id', 'item_name'}:
+        raise CsvImportError(
+            'CSV header must include quantity_delta and item_id or item_name'
+        )
+    for line_no, raw in enumerate(reader, start=2):  # header is line 1
+        raw = {(k or '').strip(): (v or '').strip() for k, v in raw.items() if k}
+        if not any(raw.values()):
+            continue
+        item_id = raw.get('item_id', '')
+        yield {
+            'row': line_no,
+            'item_id': int(item_id) if item_id.isdigit() else None,
+            'raw_item_id': item_id,
+            'item_name': raw.get('item_name', ''),
+            'delta': parse_delta(raw.get('quantity_delta')),
+            'note': raw.get('reason', ''),
+        }
+
+
+def iter_stock_csv_import(
+    uploaded_file,
+    *,
+    user=None,
+    reason: str = 'csv',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+    audit_context: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a stock adjustment CSV and apply it chunk by chunk.
+
+    The file is read row by row (Django spools large uploads to disk), each
+    chunk resolves its items with one IN query and is applied through
+    ledger.apply_stock_deltas in its own transaction. A failing row is
+    reported and skipped; it never rolls back other rows.
+
+    Yields one progress dict per chunk:
+        {'chunk', 'rows', 'applied', 'errors': [{'row', 'error'}, ...]}
+    """
+    try:
+        stream = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    except AttributeError:
+        raise CsvImportError('Upload is not a readable file')
+
+    rows = _read_rows(stream)
+    try:
+        for chunk_no in itertools.count(1):
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            items = _resolve_items(chunk)
+            adjustments, errors = [], []
+            for row in chunk:
+                if row['delta'] is None:
+                    errors.append({'row': row['row'], 'error': 'quantity_delta required (integer)'})
+                    continue
+                if row['item_id'] is not None:
+                    item = items['id'].get(row['item_id'])
+                elif row['raw_item_id']:
+                    errors.append({'row': row['row'], 'error': f"Invalid item_id {row['raw_item_id']!r}"})
+                    continue
+                else:
+                    item = items['name'].get(row['item_name'])
+                if item is None:
+                    ref = row['raw_item_id'] or row['item_name'] or '(blank)'
+                    errors.append({'row': row['row'], 'error': f'Item {ref} not found'})
+                    continue
+                adjustments.append({'item': item, 'delta': row['delta'], 'note': row['note']})
+
+            if adjustments and not dry_run:
+                apply_stock_deltas(
+                    adjustments=adjustments,
+                    user=user,
+                    reason=reason,
+                    audit_context=audit_context,
+                )
+            yield {
+                'chunk': chunk_no,
+                'rows': len(chunk),
+                'applied': 0 if dry_run else len(adjustments),
+                'valid': len(adjustments),
+                'errors': errors,
+            }
+    except UnicodeDecodeError:
+        raise CsvImportError('CSV must be UTF-8 encoded')
+    finally:
+        stream.detach()
+
+
+def import_stock_csv(uploaded_file, **kwargs) -> Dict[str, Any]:
+    """
+    Run iter_stock_csv_import to completion and summarize it.
+
+    Raises CsvImportBusyError, carrying the summary of the committed
+    chunks, if the ledger stays busy partway through.
+    """
+    summary = {'rows': 0, 'applied': 0, 'valid': 0, 'chunks': 0, 'error_count': 0, 'errors': []}
+    try:
+        for progress in iter_stock_csv_import(uploaded_file, **kwargs):
+            summary['chunks'] = progress['chunk']
+            summary['rows'] += progress['rows']
+            summary['applied'] += progress['applied']
+            summary['valid'] += progress['valid']
+            summary['error_count'] += len(progress['errors'])
+            room = MAX_REPORTED_ERRORS - len(summary['errors'])
+            summary['errors'].extend(progress['errors'][:max(room, 0)])
+    except LedgerBusyError as e:
+        raise CsvImportBusyError(str(e), summary) from e
+    return summary
@@ -0,0 +1,85 @@
+import csv
+import io
+import itertools
+import json
+from datetime import timezone as dt_timezone
+from typing import Iterable, Iterator
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+from django.utils.dateparse import parse_datetime
+
+# Columns written by the ledger export, in order
+TRANSACTION_EXPORT_FIELDS = (
+    'id', 'created_at', 'item_id', 'item__name', 'delta', 'reason',
+    'performed_by_id', 'performed_by__username',
+)
+TRANSACTION_EXPORT_HEADER = (
+    'id', 'created_at', 'item', 'item_name', 'delta', 'reason',
+    'performed_by', 'performed_by_username',
+)
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _transaction_rows(queryset: QuerySet, chunk_size: int, archived: Iterable[dict] = ()) -> Iterator[tuple]:
+    """
+    Flat ledger rows in chronological order, created_at as ISO text.
+
+    item/performed_by names come from the same JOINed query (no per-row
+    lookups) and iterator() streams them in chunks, using a server-side
+    cursor where the backend supports one. `archived` records (serialized
+    transactions from archive segments, oldest first) precede the hot rows.
+    """
+    hot = (
+        queryset.order_by('created_at', 'id')
+        .values_list(*TRANSACTION_EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    return itertools.chain(
+        (_archived_row(record) for record in archived),
+        ((row[0], row[1].isoformat(), *row[2:]) for row in hot),
+    )
+
+
+def _archived_row(record: dict) -> tuple:
+    row = {**record, 'created_at': parse_datetime(record['created_at']).astimezone(dt_timezone.utc).isoformat()}
+    return tuple(row[column] for column in TRANSACTION_EXPORT_HEADER)
+
+
+def iter_transactions_csv(queryset: QuerySet, chunk_size: int = 2000, archived: Iterable[dict] = ()) -> Iterator[str]:
+    """Yield CSV text, one chunk of rows per yield, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TRANSACTION_EXPORT_HEADER)
+    yield buffer.getvalue()
+
+    rows = _transaction_rows(queryset, chunk_size, archived)
+    for batch in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def iter_transactions_ndjson(queryset: QuerySet, chunk_size: int = 2000, archived: Iterable[dict] = ()) -> Iterator[str]:
+    """Yield newline-delimited JSON objects, one chunk of rows per yield."""
+    rows = _transaction_rows(queryset, chunk_size, archived)
+    for batch in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+        lines = [json.dumps(dict(zip(TRANSACTION_EXPORT_HEADER, row))) for row in batch]
+        yield '\n'.join(lines) + '\n'
+
+
+async def aiter_chunks(chunks: Iterable[str]):
+    """
+    Serve a synchronous chunk iterator from an async (ASGI) response.
+
+    Django would otherwise buffer sync iterators fully under ASGI; pulling
+    one chunk at a time keeps memory flat. thread_sensitive keeps every
+    pull on the same thread, and therefore the same DB connection/cursor.
+    """
+    iterator = iter(chunks)
+    pull = sync_to_async(lambda: next(iterator, None), thread_sensitive=True)
+    while (chunk := await pull()) is not None:
+        yield chunk
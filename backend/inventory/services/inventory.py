@@ -1,5 +1,14 @@
-from django.db.models import QuerySet
-from inventory.models import Item
+from django.db.models import F, QuerySet
+from inventory.models import InventoryLevel, Item
+from . import alerts
+
+# ?ordering= values for get_low_stock_items -> order_by fields
+LOW_STOCK_ORDERINGS = {
+    'severity': ('-shortage', 'id'),
+    '-severity': ('shortage', 'id'),
+    'category': ('category_name', '-shortage', 'id'),
+    '-category': ('-category_name', '-shortage', 'id'),
+}
 
 def get_items() -> QuerySet[Item]:
     """
@@ -11,4 +20,47 @@ def get_items() -> QuerySet[Item]:
     return Item.objects.select_related(
         "category",
         "current_level"
-    )
\ No newline at end of file
+    )
+
+def get_low_stock_items(ordering: str = 'severity') -> QuerySet[Item]:
+    """
+    Items at or below their threshold, read through the partial
+    InventoryLevel shortage index rather than a quantity/threshold join.
+
+    Each item is annotated with `shortage` (threshold - quantity, 0 when
+    exactly at threshold) and `category_name`, so the orderings are plain
+    fields that keyset pagination can seek on. `ordering` is a key of
+    LOW_STOCK_ORDERINGS.
+    """
+    return (
+        get_items()
+        .filter(current_level__shortage__gte=0)
+        .annotate(shortage=F('current_level__shortage'), category_name=F('category__name'))
+        .order_by(*LOW_STOCK_ORDERINGS[ordering])
+    )
+
+def sync_stock_level(item: Item, created: bool = False) -> None:
+    """
+    Keep the item's InventoryLevel.shortage in step with its threshold.
+
+    New items get a zero-quantity level right away, so never-stocked items
+    are listed as low too. A threshold edit rewrites the shortage and lets
+    the alert evaluator open or resolve the item's alert.
+    """
+    if created:
+        # By id: passing the instance would cache this row on item.current_level
+        InventoryLevel.objects.get_or_create(
+            item_id=item.pk, defaults={'quantity': 0, 'shortage': item.low_stock_threshold}
+        )
+        return
+    level = InventoryLevel.objects.filter(item=item).values_list('quantity', 'shortage').first()
+    if level is None:
+        return
+    quantity, shortage = level
+    threshold = item.low_stock_threshold
+    if threshold - quantity == shortage:
+        return
+    InventoryLevel.objects.filter(item=item).update(shortage=threshold - F('quantity'))
+    # Express the old low/not-low state as a quantity against the new threshold
+    was_low = shortage >= 0
+    alerts.evaluate_on_commit([(item, threshold if was_low else threshold + 1, quantity)])
@@ -1,14 +1,24 @@
-from typing import Optional, Dict, Any
-from django.db import transaction
+import functools
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+from django.conf import settings
+from django.db import transaction, OperationalError
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from inventory.models import (
     Item, 
     InventoryTransaction, 
     InventoryLevel,
-    Alert
 )
-from .audit import log_stock_adjust
+from . import alerts, sync
+from .audit import log_stock_adjust, log_stock_adjust_many
+from .cache import bump_table_version
+from .rollups import record_rollup, record_rollups
 
 class LedgerError(Exception):
     """Base exception for ledger operations"""
@@ -18,7 +28,121 @@ class InsufficientStockError(LedgerError):
     """Raised when trying to reduce stock below zero"""
     pass
 
-#@transaction.atomic
+class LedgerBusyError(LedgerError):
+    """Raised when a ledger write still conflicts after all retries"""
+    pass
+
+UPDATE_STRATEGIES = ('lock', 'conditional')
+
+# SQLSTATE codes (PostgreSQL) worth retrying, mapped to a counter name
+_RETRYABLE_SQLSTATES = {
+    '40001': 'serialization',  # serialization_failure
+    '40P01': 'deadlock',       # deadlock_detected
+    '55P03': 'lock_timeout',   # lock_not_available
+}
+
+_retry_stats = Counter()
+_retry_stats_lock = threading.Lock()
+
+def _record_retry_event(kind: str) -> None:
+    with _retry_stats_lock:
+        _retry_stats[kind] += 1
+
+def retry_stats() -> Dict[str, int]:
+    """
+    Snapshot of contention counters for this process.
+
+    Keys: serialization, deadlock, lock_timeout (one per failed attempt),
+    retried (attempts that were re-run) and exhausted (calls that gave up).
+    """
+    with _retry_stats_lock:
+        return dict(_retry_stats)
+
+def reset_retry_stats() -> None:
+    with _retry_stats_lock:
+        _retry_stats.clear()
+
+def classify_contention_error(exc: BaseException) -> Optional[str]:
+    """Return the counter name for a retryable contention error, else None."""
+    cause = exc.__cause__ or exc
+    sqlstate = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    if sqlstate in _RETRYABLE_SQLSTATES:
+        return _RETRYABLE_SQLSTATES[sqlstate]
+    message = str(exc).lower()
+    if 'database is locked' in message or 'lock timeout' in message:
+        return 'lock_timeout'
+    if 'could not serialize' in message:
+        return 'serialization'
+    if 'deadlock' in message:
+        return 'deadlock'
+    return None
+
+def retry_on_contention(func):
+    """
+    Re-run a ledger write on serialization/lock-timeout errors.
+
+    Bounded by settings.LEDGER_MAX_ATTEMPTS (default 3) with jittered
+    exponential backoff starting at settings.LEDGER_RETRY_BACKOFF seconds.
+    Retries only happen when the wrapped call owns the outermost
+    transaction; inside a caller's atomic block the error is re-raised
+    because the enclosing transaction is already doomed.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        max_attempts = max(1, getattr(settings, 'LEDGER_MAX_ATTEMPTS', 3))
+        backoff = getattr(settings, 'LEDGER_RETRY_BACKOFF', 0.02)
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                kind = classify_contention_error(exc)
+                if kind is None:
+                    raise
+                _record_retry_event(kind)
+                if transaction.get_connection().in_atomic_block:
+                    raise
+                if attempt >= max_attempts:
+                    _record_retry_event('exhausted')
+                    raise LedgerBusyError(
+                        f"Stock update conflicted {attempt} times; try again shortly."
+                    ) from exc
+                _record_retry_event('retried')
+                time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+                attempt += 1
+    return wrapper
+
+@contextmanager
+def ledger_atomic():
+    """
+    transaction.atomic for ledger writes, opened with BEGIN IMMEDIATE on
+    SQLite in performance mode.
+
+    Ledger writes read the level and then update it. Under a plain
+    (deferred) BEGIN, two such transactions can both hold read locks and
+    neither can upgrade, which fails at once with "database is locked"
+    instead of waiting on the busy timeout. Taking the write lock up front
+    makes them queue. Only the outermost block starts a transaction, and
+    other transactions keep SQLite's default.
+    """
+    connection = transaction.get_connection()
+    if (connection.vendor != 'sqlite' or connection.in_atomic_block
+            or not getattr(settings, 'SQLITE_PERFORMANCE_MODE', False)):
+        with transaction.atomic():
+            yield
+        return
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'  # read once, by atomic()'s BEGIN
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
+
+@retry_on_contention
+@ledger_atomic()
 def apply_stock_delta(
     *, 
     item: Item, 
@@ -27,9 +151,15 @@ def apply_stock_delta(
     note: str = "",
     reason: str = "manual",
     audit_context: Optional[Dict[str, Any]] = None,
+    strategy: Optional[str] = None,
 ) -> InventoryTransaction:
     """
     Apply a stock quantity change and record the transaction.
+
+    The ledger owns its transaction boundary: the level update and
+    transaction row commit together, and contention errors are retried
+    (see retry_on_contention). Low stock alerts follow after commit
+    (see inventory.services.alerts).
     
     Args:
         item: The item to adjust
@@ -37,36 +167,23 @@ def apply_stock_delta(
         user: User making the change
         note: Optional note about the change
         reason: Why the change is being made
+        strategy: 'lock' (select_for_update, then write) or 'conditional'
+            (single guarded UPDATE); defaults to settings.LEDGER_UPDATE_STRATEGY
         
     Returns:
         Created InventoryTransaction record
         
     Raises:
         InsufficientStockError: If change would make stock negative
+        LedgerBusyError: If the write kept conflicting after all retries
     """
-    # InventoryLevel is the snapshot backing Item.quantity, accessible via
-    # Item.current_level (reverse OneToOne). We create/update it here so
-    # reads don't need to aggregate transactions. See Item.quantity docs.
-    #
-    # Get or create inventory level with a row lock to serialize concurrent changes
-    level, created = InventoryLevel.objects.select_for_update().get_or_create(
-        item=item,
-        defaults={'quantity': 0}
-    )
-
-    # Calculate new balance
-    new_quantity = level.quantity + delta
-    if new_quantity < 0:
-        raise InsufficientStockError(
-            f"Cannot reduce stock by {abs(delta)}. Only {level.quantity} available."
-        )
-
-    # Store old quantity for audit
-    old_quantity = level.quantity
-
-    # Update level
-    level.quantity = new_quantity
-    level.save()
+    strategy = strategy or getattr(settings, 'LEDGER_UPDATE_STRATEGY', 'lock')
+    if strategy == 'conditional':
+        old_quantity, new_quantity = _conditional_update(item, delta)
+    elif strategy == 'lock':
+        old_quantity, new_quantity = _locked_update(item, delta)
+    else:
+        raise ValueError(f"Unknown ledger update strategy: {strategy!r}")
 
     # Record transaction
     transaction = InventoryTransaction.objects.create(
@@ -76,8 +193,12 @@ def apply_stock_delta(
         performed_by=user
     )
 
-    # Check for low stock condition
-    handle_low_stock_alert(item, new_quantity, old_quantity)
+    bump_table_version('inventorylevel')
+    sync.record('inventorylevel', [item.pk])
+    record_rollup(item_id=item.pk, delta=delta, closing_quantity=new_quantity)
+
+    # Low stock alerts are evaluated in a batch once this commits
+    alerts.evaluate_on_commit([(item, old_quantity, new_quantity)])
 
     # Record audit log via facade (safe and deferred)
     # Include correlation_id to tie audit to this transaction
@@ -92,32 +213,167 @@ def apply_stock_delta(
 
     return transaction
 
-def handle_low_stock_alert(
-    item: Item,
-    new_quantity: int,
-    old_quantity: int
-) -> Optional[Alert]:
+def _locked_update(item: Item, delta: int) -> Tuple[int, int]:
+    """Read-lock-write: hold a row lock on the level while computing the balance."""
+    # InventoryLevel is the snapshot backing Item.quantity, accessible via
+    # Item.current_level (reverse OneToOne). We create/update it here so
+    # reads don't need to aggregate transactions. See Item.quantity docs.
+    #
+    # Get or create inventory level with a row lock to serialize concurrent changes
+    level, created = InventoryLevel.objects.select_for_update().get_or_create(
+        item=item,
+        defaults={'quantity': 0, 'shortage': item.low_stock_threshold}
+    )
+
+    # Calculate new balance
+    new_quantity = level.quantity + delta
+    if new_quantity < 0:
+        raise InsufficientStockError(
+            f"Cannot reduce stock by {abs(delta)}. Only {level.quantity} available."
+        )
+
+    old_quantity = level.quantity
+    level.quantity = new_quantity
+    level.shortage -= delta  # threshold - quantity, whatever the threshold is now
+    level.save()
+    return old_quantity, new_quantity
+
+def _conditional_update(item: Item, delta: int) -> Tuple[int, int]:
     """
-    Create or resolve low stock alerts based on threshold.
+    Single guarded statement:
+    UPDATE ... SET quantity = quantity + delta WHERE quantity + delta >= 0.
+
+    The row lock is only held from the UPDATE to commit, so hot SKUs don't
+    queue behind a SELECT ... FOR UPDATE round trip.
     """
-    if new_quantity <= item.low_stock_threshold:
-        # Create new alert if stock is low
-        alert, created = Alert.objects.get_or_create(
-            item=item,
-            type='low_stock',
-            resolved_at__isnull=True,
-            defaults={
-                'message': f'Low stock alert: {item.name} ({new_quantity} remaining)'
-            }
+    levels = InventoryLevel.objects.filter(item=item)
+    guarded = levels.filter(quantity__gte=-delta) if delta < 0 else levels
+    updated = guarded.update(
+        quantity=F('quantity') + delta, shortage=F('shortage') - delta, updated_at=timezone.now()
+    )
+    if not updated:
+        available = levels.values_list('quantity', flat=True).first()
+        if available is None and delta >= 0:
+            # First adjustment for this item; fall back to creating the level.
+            return _locked_update(item, delta)
+        raise InsufficientStockError(
+            f"Cannot reduce stock by {abs(delta)}. Only {available or 0} available."
         )
-        return alert if created else None
-    
-    elif old_quantity <= item.low_stock_threshold and new_quantity > item.low_stock_threshold:
-        # Resolve existing alerts if stock is now sufficient
-        Alert.objects.filter(
+    # Our UPDATE holds the row lock until commit, so this read is stable.
+    new_quantity = levels.values_list('quantity', flat=True).get()
+    return new_quantity - delta, new_quantity
+
+@retry_on_contention
+@ledger_atomic()
+def apply_stock_deltas(
+    *,
+    adjustments: Sequence[Dict[str, Any]],
+    user=None,
+    reason: str = "csv",
+    clamp: bool = True,
+    audit_context: Optional[Dict[str, Any]] = None,
+) -> List[InventoryTransaction]:
+    """
+    Apply many stock changes in one set-based pass.
+
+    Each adjustment is a dict with `item`, `delta` and optional `note`
+    (the shape produced by BulkStockAdjustmentSerializer); pass a sequence,
+    not a generator, so the batch can be replayed on retry. Rows are applied
+    in order against a running in-memory balance, so the result matches
+    calling apply_stock_delta once per row, but the database sees:
+
+    - one query to create missing InventoryLevel rows and one to lock them all
+    - one bulk insert for transactions and one bulk update for levels
+    - after commit, one alert evaluation over each item's net change
+    - one deferred bulk insert for audit rows
+
+    Args:
+        adjustments: Ordered adjustment rows
+        user: User making the change
+        reason: Why the change is being made (shared by all rows)
+        clamp: Clamp negative deltas so stock never goes below zero;
+            when False an InsufficientStockError aborts the whole batch
+        audit_context: Shared audit context (ip/user agent)
+
+    Returns:
+        Created InventoryTransaction records, one per adjustment, in order
+    """
+    adjustments = list(adjustments)
+    if not adjustments:
+        return []
+
+    items = {adj['item'].pk: adj['item'] for adj in adjustments}
+    levels = _lock_levels(items)
+    balances = {item_id: level.quantity for item_id, level in levels.items()}
+
+    transactions = []
+    audit_entries = []
+    opening = dict(balances)
+    for adj in adjustments:
+        item = items[adj['item'].pk]
+        delta = adj['delta']
+        old_quantity = balances[item.pk]
+        if old_quantity + delta < 0:
+            if not clamp:
+                raise InsufficientStockError(
+                    f"Cannot reduce stock of {item.name} by {abs(delta)}. Only {old_quantity} available."
+                )
+            delta = -old_quantity  # zero out the stock at most
+        new_quantity = old_quantity + delta
+        balances[item.pk] = new_quantity
+
+        transactions.append(InventoryTransaction(
             item=item,
-            type='low_stock',
-            resolved_at__isnull=True
-        ).update(resolved_at=timezone.now())
-    
-    return None
\ No newline at end of file
+            delta=delta,
+            reason=reason,
+            performed_by=user,
+        ))
+        audit_entries.append({
+            'item': item,
+            'before_state': {'quantity': old_quantity},
+            'after_state': {'quantity': new_quantity},
+            'context': {'note': adj.get('note', ''), 'reason': reason},
+        })
+
+    now = timezone.now()
+    for item_id, level in levels.items():
+        level.shortage -= balances[item_id] - level.quantity
+        level.quantity = balances[item_id]
+        level.updated_at = now  # bulk_update skips auto_now
+    InventoryLevel.objects.bulk_update(levels.values(), ['quantity', 'shortage', 'updated_at'], batch_size=500)
+    bump_table_version('inventorylevel')
+    sync.record('inventorylevel', levels)
+    InventoryTransaction.objects.bulk_create(transactions, batch_size=500)
+    record_rollups(_rollup_changes(transactions, balances))
+    alerts.evaluate_on_commit(
+        (items[item_id], opening[item_id], balances[item_id]) for item_id in items
+    )
+
+    for entry, txn in zip(audit_entries, transactions):
+        entry['context']['correlation_id'] = txn.id
+    log_stock_adjust_many(entries=audit_entries, actor=user, context=audit_context)
+
+    return transactions
+
+def _rollup_changes(transactions: List[InventoryTransaction], balances: Dict[int, int]) -> Dict[int, Tuple[int, int, int]]:
+    """Per-item (inflow, outflow, closing) for a batch, for record_rollups."""
+    flows: Dict[int, List[int]] = {}
+    for txn in transactions:
+        inflow_outflow = flows.setdefault(txn.item_id, [0, 0])
+        if txn.delta >= 0:
+            inflow_outflow[0] += txn.delta
+        else:
+            inflow_outflow[1] -= txn.delta
+    return {item_id: (inflow, outflow, balances[item_id]) for item_id, (inflow, outflow) in flows.items()}
+
+def _lock_levels(items: Dict[int, Item]) -> Dict[int, InventoryLevel]:
+    """Ensure an InventoryLevel exists for every item and lock them in one query."""
+    item_ids = list(items)
+    InventoryLevel.objects.bulk_create(
+        [InventoryLevel(item_id=item_id, quantity=0, shortage=items[item_id].low_stock_threshold) for item_id in item_ids],
+        ignore_conflicts=True,
+    )
+    return {
+        level.item_id: level
+        for level in InventoryLevel.objects.select_for_update().filter(item_id__in=item_ids)
+    }
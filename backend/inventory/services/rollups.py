@@ -0,0 +1,222 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+from django.utils import timezone
+from inventory.models import Item, InventoryTransaction, ItemDailyRollup, ItemHourlyRollup, LedgerCheckpoint
+
+# item_id -> (inflow, outflow, closing_quantity)
+RollupChanges = Dict[int, Tuple[int, int, int]]
+
+
+# Rollup tables and the field holding each row's bucket
+ROLLUP_BUCKETS = (
+    (ItemDailyRollup, 'date'),
+    (ItemHourlyRollup, 'hour'),
+)
+
+
+def _flows(delta: int) -> Tuple[int, int]:
+    return (delta, 0) if delta >= 0 else (0, -delta)
+
+
+def _buckets(at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Bucket values (day, UTC hour) for a moment, defaulting to now."""
+    at = at or timezone.now()
+    return {
+        'date': timezone.localdate(at),
+        'hour': at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0),
+    }
+
+
+def record_rollup(*, item_id: int, delta: int, closing_quantity: int, at: Optional[datetime] = None) -> None:
+    """
+    Fold one ledger change into the current daily and hourly rollup rows.
+
+    Callers hold the item's InventoryLevel row lock (see ledger), so the
+    update-then-create sequence cannot race with another writer.
+    """
+    buckets = _buckets(at)
+    inflow, outflow = _flows(delta)
+    for model, field in ROLLUP_BUCKETS:
+        lookup = {'item_id': item_id, field: buckets[field]}
+        updated = model.objects.filter(**lookup).update(
+            inflow=F('inflow') + inflow,
+            outflow=F('outflow') + outflow,
+            closing_quantity=closing_quantity,
+        )
+        if not updated:
+            model.objects.create(
+                **lookup, inflow=inflow, outflow=outflow, closing_quantity=closing_quantity
+            )
+
+
+def record_rollups(changes: RollupChanges, at: Optional[datetime] = None) -> None:
+    """Batched record_rollup: per table one SELECT, one bulk update and one bulk insert."""
+    if not changes:
+        return
+    buckets = _buckets(at)
+    for model, field in ROLLUP_BUCKETS:
+        bucket = buckets[field]
+        existing = {
+            row.item_id: row
+            for row in model.objects.filter(**{field: bucket, 'item_id__in': list(changes)})
+        }
+        to_create, to_update = [], []
+        for item_id, (inflow, outflow, closing) in changes.items():
+            row = existing.get(item_id)
+            if row is None:
+                to_create.append(model(
+                    item_id=item_id, inflow=inflow, outflow=outflow, closing_quantity=closing,
+                    **{field: bucket},
+                ))
+            else:
+                row.inflow += inflow
+                row.outflow += outflow
+                row.closing_quantity = closing
+                to_update.append(row)
+        if to_update:
+            model.objects.bulk_update(to_update, ['inflow', 'outflow', 'closing_quantity'], batch_size=500)
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=500)
+
+
+def closing_before(model, field: str, bucket) -> Subquery:
+    """Latest closing balance strictly before `bucket` for the outer Item."""
+    return Subquery(
+        model.objects.filter(item=OuterRef('pk'), **{f'{field}__lt': bucket})
+        .order_by(f'-{field}')
+        .values('closing_quantity')[:1]
+    )
+
+
+def archived_through() -> Optional[date]:
+    """First day still in InventoryTransaction once old rows were archived, if any were."""
+    moment = LedgerCheckpoint.objects.aggregate(last=Max('archived_through'))['last']
+    return timezone.localdate(moment) if moment is not None else None
+
+
+@transaction.atomic
+def rebuild_rollups(since: Optional[date] = None, batch_size: int = 2000) -> int:
+    """
+    (Re)build daily and hourly rollups from InventoryTransaction for days >= since.
+
+    With since=None every rollup is rebuilt. Buckets before `since` are kept
+    and only used to seed each item's opening balance, so an incremental
+    run only scans the tail of the ledger.
+
+    Days whose transactions were archived cannot be rebuilt, so `since` is
+    raised to the archive boundary; openings fall back to the item's
+    LedgerCheckpoint balance when no earlier rollup exists.
+
+    Returns the number of daily rollup rows written.
+    """
+    floor = archived_through()
+    if floor is not None and (since is None or since < floor):
+        since = floor
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since is not None else None
+    written = {}
+    for model, field in ROLLUP_BUCKETS:
+        if field == 'date':
+            boundary, bucket = since, TruncDate('created_at')
+        else:
+            boundary, bucket = start, TruncHour('created_at', tzinfo=dt_timezone.utc)
+        written[field] = _rebuild(model, field, bucket, boundary, start, batch_size)
+    return written['date']
+
+
+def _rebuild(model, field: str, bucket, boundary, start: Optional[datetime], batch_size: int) -> int:
+    rollups = model.objects.all()
+    transactions = InventoryTransaction.objects.all()
+    balances: Dict[int, int] = {}
+    if boundary is not None:
+        rollups = rollups.filter(**{f'{field}__gte': boundary})
+        transactions = transactions.filter(created_at__gte=start)
+        checkpoint = Subquery(
+            LedgerCheckpoint.objects.filter(item=OuterRef('pk')).values('balance')[:1]
+        )
+        balances = dict(
+            Item.objects.annotate(opening=Coalesce(closing_before(model, field, boundary), checkpoint, Value(0)))
+            .filter(opening__gt=0)
+            .values_list('id', 'opening')
+        )
+    rollups.delete()
+
+    grouped = (
+        transactions.annotate(bucket=bucket)
+        .values('item_id', 'bucket')
+        .annotate(
+            inflow=Coalesce(Sum(Case(When(delta__gt=0, then=F('delta')), output_field=IntegerField())), 0),
+            outflow=Coalesce(Sum(Case(When(delta__lt=0, then=-F('delta')), output_field=IntegerField())), 0),
+        )
+        .order_by('item_id', 'bucket')
+    )
+    written = 0
+    batch = []
+    for row in grouped.iterator(chunk_size=batch_size):
+        closing = balances.get(row['item_id'], 0) + row['inflow'] - row['outflow']
+        balances[row['item_id']] = closing
+        batch.append(model(
+            item_id=row['item_id'],
+            inflow=row['inflow'],
+            outflow=row['outflow'],
+            closing_quantity=max(closing, 0),
+            **{field: row['bucket']},
+        ))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def last_rollup_date() -> Optional[date]:
+    return ItemDailyRollup.objects.aggregate(last=Max('date'))['last']
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def monthly_stock_summary(year: int, month: int) -> List[dict]:
+    """
+    Opening, inflow, outflow and closing per item for one month.
+
+    Reads only ItemDailyRollup: one grouped query over the month's rows and
+    one item query whose opening balance comes from an indexed
+    (item, date) lookup of the last rollup before the month.
+    """
+    start, end = month_bounds(year, month)
+    flows = {
+        row['item_id']: row
+        for row in ItemDailyRollup.objects.filter(date__gte=start, date__lt=end)
+        .values('item_id')
+        .annotate(inflow=Sum('inflow'), outflow=Sum('outflow'))
+    }
+    end_dt = timezone.make_aware(datetime.combine(end, time.min))
+    items = (
+        Item.objects.filter(created_at__lt=end_dt)
+        .annotate(opening=Coalesce(closing_before(ItemDailyRollup, 'date', start), Value(0)))
+        .order_by('id')
+        .values('id', 'name', 'category__name', 'opening')
+    )
+    summary = []
+    for item in items:
+        row = flows.get(item['id'], {})
+        inflow, outflow = row.get('inflow', 0), row.get('outflow', 0)
+        summary.append({
+            'item_id': item['id'],
+            'item_name': item['name'],
+            'category': item['category__name'],
+            'opening': item['opening'],
+            'inflow': inflow,
+            'outflow': outflow,
+            'closing': item['opening'] + inflow - outflow,
+        })
+    return summary
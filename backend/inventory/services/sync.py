@@ -0,0 +1,128 @@
+"""
+Delta sync for offline clients: "what changed since sequence N".
+
+Every change to an Item, Category or InventoryLevel appends a SyncChange
+row in the same transaction as the change. Model saves and deletes are
+recorded by signals (inventory.signals) and the ledger records the
+levels it writes. The row id is the sequence number. A client keeps the
+last `next` it received and asks for everything after it. Each changed
+row is reported once, in its current state, and deleted rows come back
+as tombstones.
+
+Ids are handed out when rows are inserted, not when they commit, so a
+slow transaction could commit a lower id after a client has already
+moved past it. Reads therefore stop at rows older than
+SYNC_SETTLE_SECONDS, which ledger transactions comfortably fit in. A
+transaction that commits later than that after recording its change is
+missed by clients that synced in between, until the row changes again.
+Bulk loads that bypass models and the ledger (synthetic data) are not
+recorded; clients need a full download after those.
+
+prune() (the prune_sync_changes command) drops changes older than
+SYNC_RETENTION_DAYS. A client whose `since` is below the oldest retained
+change has missed some and gets ResyncRequired instead of a delta.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Set
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from inventory.models import Category, InventoryLevel, SyncChange
+from . import inventory
+
+# SyncChange.table -> response section
+SECTIONS = {'item': 'items', 'category': 'categories', 'inventorylevel': 'levels'}
+
+
+class ResyncRequired(Exception):
+    """Changes after the client's sequence were pruned; it must download everything again."""
+
+
+def record(table: str, object_ids: Iterable[int], deleted: bool = False) -> None:
+    """Append one change per object id; call inside the writing transaction."""
+    now = timezone.now()
+    SyncChange.objects.bulk_create(
+        [SyncChange(table=table, object_id=object_id, deleted=deleted, created_at=now) for object_id in object_ids],
+        batch_size=500,
+    )
+
+
+def _settled():
+    return SyncChange.objects.filter(
+        created_at__lte=timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+    )
+
+
+def high_water_mark() -> int:
+    """Sequence a new client should start from after a full download."""
+    return _settled().order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def retained_floor() -> int:
+    """Lowest `since` that still gets every later change: the sequence before the oldest kept row."""
+    oldest = SyncChange.objects.aggregate(oldest=Min('id'))['oldest']
+    return oldest - 1 if oldest is not None else 0
+
+
+def prune(older_than: datetime) -> int:
+    """
+    Delete changes created before `older_than`; returns rows deleted.
+
+    The newest change is always kept, so the sequence carries on from it
+    (SQLite would otherwise hand out ids from 1 again) and retained_floor()
+    stays meaningful.
+    """
+    newest = SyncChange.objects.aggregate(newest=Max('id'))['newest']
+    if newest is None:
+        return 0
+    deleted, _ = SyncChange.objects.filter(created_at__lt=older_than, id__lt=newest).delete()
+    return deleted
+
+
+def changes_since(since: int, limit: int) -> Dict:
+    """
+    Rows changed after sequence `since`, up to `limit` changes.
+
+    Returns {'next', 'has_more', 'items', 'categories', 'levels',
+    'deleted'}: Item and Category instances, {'item', 'quantity',
+    'updated_at'} dicts for levels, and for each of those sections the
+    ids removed (item ids for levels). When has_more is set, ask again
+    from `next`. Raises ResyncRequired when changes after `since` were
+    pruned.
+    """
+    entries = list(
+        _settled().filter(id__gt=since).order_by('id')
+        .values_list('id', 'table', 'object_id', 'deleted')[:limit]
+    )
+    # Checked after reading, so a prune running meanwhile is caught too
+    if since < retained_floor():
+        raise ResyncRequired(f'Changes after {since} are no longer retained')
+    latest: Dict[tuple, bool] = {}
+    for _, table, object_id, deleted in entries:
+        latest[(table, object_id)] = deleted  # last change wins
+    changed: Dict[str, Set[int]] = {table: set() for table in SECTIONS}
+    removed: Dict[str, Set[int]] = {table: set() for table in SECTIONS}
+    for (table, object_id), deleted in latest.items():
+        (removed if deleted else changed)[table].add(object_id)
+
+    items = list(inventory.get_items().filter(pk__in=changed['item']).order_by('id'))
+    categories = list(Category.objects.filter(pk__in=changed['category']).order_by('id'))
+    levels = list(
+        InventoryLevel.objects.filter(item_id__in=changed['inventorylevel'])
+        .order_by('item_id').values('item', 'quantity', 'updated_at')
+    )
+    # Changed, then deleted after the settled window: report as gone
+    removed['item'] |= changed['item'] - {item.pk for item in items}
+    removed['category'] |= changed['category'] - {category.pk for category in categories}
+    removed['inventorylevel'] |= changed['inventorylevel'] - {level['item'] for level in levels}
+
+    return {
+        'next': entries[-1][0] if entries else since,
+        'has_more': len(entries) == limit,
+        'items': items,
+        'categories': categories,
+        'levels': levels,
+        'deleted': {SECTIONS[table]: sorted(ids) for table, ids in removed.items()},
+    }
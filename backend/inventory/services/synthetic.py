@@ -0,0 +1,319 @@
+"""
+Synthetic inventory data at production scale.
+
+SKU popularity follows a Zipf law (a few items take most adjustments, as
+in real catalogs) and adjustment times follow a diurnal and weekly
+profile. Categories and items go through bulk_create; the ledger and
+audit rows are written as plain multi-row inserts (COPY on PostgreSQL)
+in batches, one transaction per batch, and split into chunks that are
+generated and inserted by a pool of worker processes.
+
+Levels are derived from the generated ledger, so quantities match the
+transaction history, and open low-stock alerts match the levels.
+"""
+import math
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import django
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from audit.models import AuditLog
+from inventory.models import Alert, Category, InventoryLevel, InventoryTransaction, Item
+from .cache import bump_table_version
+
+ITEM_PREFIX = 'Synthetic item '
+CATEGORY_PREFIX = 'Synthetic category '
+
+# Relative adjustment rate per hour of day: quiet nights, morning receiving, afternoon peak
+HOURLY_PROFILE = (
+    0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.8, 1.4, 1.8, 1.9, 1.8, 1.7,
+    1.6, 1.8, 2.0, 1.9, 1.6, 1.2, 0.9, 0.7, 0.5, 0.4, 0.3, 0.2,
+)
+WEEKEND_RATE = 0.4  # weekend days relative to weekdays
+
+TRANSACTION_FIELDS = ('item', 'delta', 'reason', 'performed_by', 'created_at')
+AUDIT_FIELDS = (
+    'actor', 'action', 'content_type', 'object_id', 'before_state', 'after_state',
+    'user_agent', 'additional_context', 'created_at',
+)
+_PREPARED_TYPES = {'DateTimeField', 'JSONField'}
+
+
+def zipf_cum_weights(n: int, exponent: float) -> List[float]:
+    """Cumulative Zipf weights for ranks 1..n, for random.choices(cum_weights=...)."""
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def diurnal_moment(rng: random.Random, start: datetime, days: int, day_weights: List[float]) -> datetime:
+    """A random moment in [start, start + days) following the daily/weekly profile."""
+    slot = rng.choices(range(days * 24), cum_weights=day_weights)[0]
+    return start + timedelta(hours=slot, seconds=rng.random() * 3600)
+
+
+def _slot_cum_weights(start: datetime, days: int) -> List[float]:
+    weights = []
+    for day in range(days):
+        rate = WEEKEND_RATE if (start + timedelta(days=day)).weekday() >= 5 else 1.0
+        weights.extend(rate * hourly for hourly in HOURLY_PROFILE)
+    return list(accumulate(weights))
+
+
+def random_delta(rng: random.Random) -> Tuple[int, str]:
+    """One adjustment: mostly small picks, occasional receipts and recounts."""
+    roll = rng.random()
+    if roll < 0.06:
+        return rng.randint(20, 120), 'csv'
+    if roll < 0.11:
+        return rng.choice((-3, -2, -1, 1, 2, 3)), 'manual'
+    return -rng.randint(1, 6), 'adjustment'
+
+
+def insert_rows(model, fields: Sequence[str], rows: Iterable[Sequence[Any]], using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Insert raw rows (values in `fields` order; ids for foreign keys) without
+    building model instances. Date and JSON values are adapted by their
+    fields, so any backend accepts them.
+    """
+    connection = connections[using]
+    model_fields = [model._meta.get_field(name) for name in fields]
+    adapt = [(i, field) for i, field in enumerate(model_fields) if field.get_internal_type() in _PREPARED_TYPES]
+    prepared = []
+    for row in rows:
+        row = list(row)
+        for i, field in adapt:
+            row[i] = field.get_db_prep_save(row[i], connection)
+        prepared.append(row)
+    if not prepared:
+        return 0
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in model_fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for row in prepared:
+                    copy.write_row(row)
+        else:
+            placeholders = ', '.join(['%s'] * len(model_fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', prepared)
+    return len(prepared)
+
+
+# -- catalog ---------------------------------------------------------------
+
+def create_categories(count: int) -> List[int]:
+    Category.objects.bulk_create(
+        [Category(name=f'{CATEGORY_PREFIX}{n:04d}') for n in range(count)], ignore_conflicts=True,
+    )
+    return list(Category.objects.filter(name__startswith=CATEGORY_PREFIX).values_list('id', flat=True))
+
+
+def create_items(
+    count: int, category_ids: Sequence[int], rng: random.Random, *, created_at: datetime, batch_size: int = 5000,
+) -> List[Tuple[int, str, int]]:
+    """Create `count` items; returns (id, name, low_stock_threshold) per item."""
+    # Numbering from the current max pk keeps names unique across runs
+    first = (Item.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    category_weights = zipf_cum_weights(len(category_ids), 0.8)
+    created = []
+    for start in range(first, first + count, batch_size):
+        numbers = range(start, min(start + batch_size, first + count))
+        items = Item.objects.bulk_create([
+            Item(
+                name=f'{ITEM_PREFIX}{n:08d}',
+                category_id=rng.choices(category_ids, cum_weights=category_weights)[0],
+                price=Decimal(round(math.exp(rng.gauss(2.5, 1.0)), 2)).quantize(Decimal('0.01')),
+                low_stock_threshold=rng.choice((0, 5, 10, 10, 20, 25, 50)),
+                created_at=created_at,
+                modified_at=created_at,
+            )
+            for n in numbers
+        ])
+        created.extend((item.pk, item.name, item.low_stock_threshold) for item in items)
+    return created
+
+
+# -- ledger (worker processes) --------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(state: Dict[str, Any]) -> None:
+    django.setup()  # no-op when forked, needed with the spawn start method
+    _worker.clear()
+    _worker.update(state)
+    _worker['item_weights'] = zipf_cum_weights(len(state['item_ids']), state['zipf'])
+    _worker['slot_weights'] = _slot_cum_weights(state['start'], state['days'])
+
+
+def _ledger_chunk(task: Tuple[int, int]) -> Tuple[int, int]:
+    """Generate and insert `count` transactions (plus sampled audit rows)."""
+    seed, count = task
+    state = _worker
+    rng = random.Random(seed)
+    written = audited = 0
+    while written < count:
+        size = min(state['batch_size'], count - written)
+        transactions, audits = [], []
+        for item_id in rng.choices(state['item_ids'], cum_weights=state['item_weights'], k=size):
+            delta, reason = random_delta(rng)
+            at = diurnal_moment(rng, state['start'], state['days'], state['slot_weights'])
+            actor = rng.choice(state['user_ids']) if state['user_ids'] else None
+            transactions.append((item_id, delta, reason, actor, at))
+            if rng.random() < state['audit_ratio']:
+                audits.append((
+                    actor, 'STOCK_ADJUST', state['content_type_id'], str(item_id), None, {'delta': delta},
+                    '', {'note': '', 'reason': reason, 'synthetic': True}, at,
+                ))
+        with transaction.atomic():
+            insert_rows(InventoryTransaction, TRANSACTION_FIELDS, transactions)
+            insert_rows(AuditLog, AUDIT_FIELDS, audits)
+        written += size
+        audited += len(audits)
+    return written, audited
+
+
+def generate_ledger(
+    item_ids: Sequence[int],
+    *,
+    transactions: int,
+    start: datetime,
+    days: int,
+    user_ids: Sequence[int] = (),
+    audit_ratio: float = 1.0,
+    zipf: float = 1.1,
+    processes: int = 1,
+    batch_size: int = 10000,
+    seed: int = 0,
+) -> Tuple[int, int]:
+    """Insert `transactions` ledger rows over `item_ids`; returns (transactions, audit rows)."""
+    if not item_ids or transactions <= 0:
+        return 0, 0
+    ranked = list(item_ids)
+    random.Random(seed).shuffle(ranked)  # popularity rank is independent of id order
+    state = {
+        'item_ids': ranked, 'zipf': zipf, 'start': start, 'days': days, 'user_ids': list(user_ids),
+        'audit_ratio': audit_ratio, 'batch_size': batch_size,
+        'content_type_id': ContentType.objects.get_for_model(Item).pk,
+    }
+    chunk = max(batch_size, math.ceil(transactions / (processes * 4)))
+    tasks = [(seed + n, min(chunk, transactions - offset)) for n, offset in enumerate(range(0, transactions, chunk))]
+
+    if processes <= 1:
+        _init_worker(state)
+        results = [_ledger_chunk(task) for task in tasks]
+    else:
+        # Children must open their own connections, never share the parent's
+        connections.close_all()
+        with multiprocessing.get_context().Pool(processes, initializer=_init_worker, initargs=(state,)) as pool:
+            results = pool.map(_ledger_chunk, tasks)
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+# -- derived state -----------------------------------------------------------
+
+def create_levels(items: Sequence[Tuple[int, str, int]], *, batch_size: int = 10000) -> Dict[int, int]:
+    """Create InventoryLevel rows from each item's ledger total; returns {item_id: quantity}."""
+    item_ids = [item_id for item_id, _, _ in items]
+    if not item_ids:
+        return {}
+    # New items occupy one id range, so a single range scan covers them
+    totals = dict(
+        InventoryTransaction.objects.filter(item__gte=min(item_ids), item__lte=max(item_ids))
+        .order_by().values_list('item_id').annotate(total=Sum('delta'))
+    )
+    quantities = {item_id: max(0, totals.get(item_id) or 0) for item_id in item_ids}
+    now = timezone.now()
+    for start in range(0, len(items), batch_size):
+        insert_rows(InventoryLevel, ('item', 'quantity', 'shortage', 'updated_at'), (
+            (item_id, quantities[item_id], threshold - quantities[item_id], now)
+            for item_id, _, threshold in items[start:start + batch_size]
+        ))
+    return quantities
+
+
+def create_alerts(
+    items: Sequence[Tuple[int, str, int]],
+    quantities: Dict[int, int],
+    rng: random.Random,
+    *,
+    start: datetime,
+    days: int,
+    resolved_ratio: float = 0.2,
+) -> int:
+    """Open low-stock alerts for items at or below threshold, plus resolved history."""
+    now = timezone.now()
+    rows = []
+    for item_id, name, threshold in items:
+        for _ in range(sum(rng.random() < resolved_ratio for _ in range(3))):
+            triggered = start + timedelta(seconds=rng.random() * days * 86400)
+            resolved = min(triggered + timedelta(hours=rng.uniform(1, 96)), now)
+            rows.append((item_id, 'low_stock', f'Low stock alert: {name} ({rng.randint(0, threshold)} remaining)', triggered, resolved))
+        if quantities[item_id] <= threshold:
+            rows.append((item_id, 'low_stock', f'Low stock alert: {name} ({quantities[item_id]} remaining)', now, None))
+    return insert_rows(Alert, ('item', 'type', 'message', 'triggered_at', 'resolved_at'), rows)
+
+
+def generate(
+    *,
+    categories: int,
+    items: int,
+    transactions: int,
+    days: int = 365,
+    user_ids: Sequence[int] = (),
+    audit_ratio: float = 1.0,
+    zipf: float = 1.1,
+    processes: int = 1,
+    batch_size: int = 10000,
+    seed: int = 0,
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    Generate a full synthetic dataset; returns row counts and seconds per phase.
+
+    `progress(phase, rows, seconds)` is called after each phase.
+    """
+    rng = random.Random(seed)
+    start = (timezone.now() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+    stats: Dict[str, Any] = {}
+
+    def done(name, rows, started):
+        stats[name] = {'rows': rows, 'seconds': round(time.perf_counter() - started, 2)}
+        if progress is not None:
+            progress(name, rows, stats[name]['seconds'])
+
+    started = time.perf_counter()
+    category_ids = create_categories(categories)
+    done('categories', len(category_ids), started)
+
+    started = time.perf_counter()
+    created = create_items(items, category_ids, rng, created_at=start)
+    done('items', len(created), started)
+
+    started = time.perf_counter()
+    written, audited = generate_ledger(
+        [item_id for item_id, _, _ in created], transactions=transactions, start=start, days=days,
+        user_ids=user_ids, audit_ratio=audit_ratio, zipf=zipf, processes=processes,
+        batch_size=batch_size, seed=seed,
+    )
+    done('transactions', written, started)
+    stats['audit_logs'] = {'rows': audited, 'seconds': stats['transactions']['seconds']}
+
+    started = time.perf_counter()
+    quantities = create_levels(created)
+    done('levels', len(quantities), started)
+
+    started = time.perf_counter()
+    done('alerts', create_alerts(created, quantities, rng, start=start, days=days), started)
+
+    bump_table_version('item', 'category', 'inventorylevel', 'alert')
+    return stats
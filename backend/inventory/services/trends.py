@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from inventory.models import Item, ItemDailyRollup, ItemHourlyRollup
+from .rollups import closing_before
+
+RESOLUTIONS = ('hour', 'day', 'week')
+# Default window when no start is given
+DEFAULT_SPANS = {'hour': timedelta(hours=48), 'day': timedelta(days=90), 'week': timedelta(weeks=52)}
+MAX_POINTS = 2000
+MAX_ITEMS = 100
+
+
+class TrendError(ValueError):
+    """Raised for unsupported resolutions or oversized windows"""
+    pass
+
+
+def _bucket_of(resolution: str, moment: datetime):
+    """Bucket key containing `moment`: UTC hour start, local date, or Monday of the week."""
+    if resolution == 'hour':
+        return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    day = timezone.localdate(moment)
+    return day if resolution == 'day' else day - timedelta(days=day.weekday())
+
+
+def _step(resolution: str) -> timedelta:
+    return {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[resolution]
+
+
+def _source(resolution: str) -> Tuple[type, str]:
+    # Weeks are downsampled from daily rollups: last close of each week
+    return (ItemHourlyRollup, 'hour') if resolution == 'hour' else (ItemDailyRollup, 'date')
+
+
+def stock_trends(
+    item_ids: Iterable[int],
+    *,
+    resolution: str = 'day',
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[int, List[dict]]:
+    """
+    Closing balance per bucket for each item, from precomputed rollups.
+
+    The series is dense: every bucket in [start, end] is present, carrying
+    the previous balance forward through buckets without activity. Two
+    queries regardless of item count: openings (last rollup before the
+    window) and the rollup rows inside it.
+
+    Returns {item_id: [{'t': iso bucket start, 'quantity': n}, ...]}.
+    """
+    if resolution not in RESOLUTIONS:
+        raise TrendError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    item_ids = list(dict.fromkeys(item_ids))
+    if len(item_ids) > MAX_ITEMS:
+        raise TrendError(f'At most {MAX_ITEMS} items per request')
+    end = end or timezone.now()
+    start = start or end - DEFAULT_SPANS[resolution]
+    first, last, step = _bucket_of(resolution, start), _bucket_of(resolution, end), _step(resolution)
+    if last < first:
+        raise TrendError('start must be before end')
+    if (last - first) // step + 1 > MAX_POINTS:
+        raise TrendError(f'Window exceeds {MAX_POINTS} {resolution} buckets; use a coarser resolution')
+
+    model, field = _source(resolution)
+    # A week bucket covers its Monday through Sunday in the daily rollups
+    source_last = last + timedelta(days=6) if resolution == 'week' else last
+    openings = dict(
+        Item.objects.filter(pk__in=item_ids)
+        .annotate(opening=Coalesce(closing_before(model, field, first), Value(0)))
+        .values_list('id', 'opening')
+    )
+    closes: Dict[int, Dict] = {item_id: {} for item_id in openings}
+    rows = (
+        model.objects.filter(item_id__in=list(openings), **{f'{field}__gte': first, f'{field}__lte': source_last})
+        .order_by('item_id', field)
+        .values_list('item_id', field, 'closing_quantity')
+    )
+    for item_id, bucket, closing in rows:
+        if resolution == 'week':
+            bucket = bucket - timedelta(days=bucket.weekday())
+        closes[item_id][bucket] = closing  # ordered, so the last close in a bucket wins
+
+    series = {}
+    for item_id, opening in openings.items():
+        balance, points, bucket = opening, [], first
+        while bucket <= last:
+            balance = closes[item_id].get(bucket, balance)
+            points.append({'t': bucket.isoformat(), 'quantity': balance})
+            bucket += step
+        series[item_id] = points
+    return series
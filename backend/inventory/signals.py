@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Alert, Item, Category, InventoryLevel
+from .services import alerts, inventory, sync
+from .services.cache import bump_table_version
+
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_item_reads(sender, instance: Item, **kwargs):
+    bump_table_version('item')
+
+@receiver(post_save, sender=Item)
+def sync_item_stock_level(sender, instance: Item, created: bool, raw: bool = False, **kwargs):
+    if not raw:  # fixtures bring their own levels
+        inventory.sync_stock_level(instance, created=created)
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_reads(sender, instance: Category, **kwargs):
+    bump_table_version('category')
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Category)
+def record_sync_change(sender, instance, raw: bool = False, **kwargs):
+    if not raw:
+        sync.record(sender._meta.model_name, [instance.pk])
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=InventoryLevel)
+def record_sync_tombstone(sender, instance, **kwargs):
+    # Levels are keyed by item for sync clients
+    object_id = instance.item_id if sender is InventoryLevel else instance.pk
+    sync.record(sender._meta.model_name, [object_id], deleted=True)
+
+@receiver([post_save, post_delete], sender=Alert)
+def forget_alert_state(sender, instance: Alert, **kwargs):
+    # Manual resolves and deletes: re-check this item on its next change
+    alerts.forget([instance.item_id])
+    bump_table_version('alert')
@@ -1,9 +1,28 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from datetime import timedelta
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from inventory.models import Item, Category
+from inventory.models import Item, Category, Alert, InventoryLevel, InventoryTransaction, SyncChange
+from inventory.services import alerts, csv_import, ledger
 from django.contrib.auth import get_user_model
 from users.models import Roles
+from audit.models import AuditLog
+from config import profiling, routers
+from config.logging_handlers import JsonFormatter
+from inventory.management.commands.benchmark import compare
 
 class ItemAPITestCase(APITestCase):
     def setUp(self):
@@ -25,6 +44,25 @@ class ItemAPITestCase(APITestCase):
         self.assertEqual(response.data['name'], self.item.name)
         self.assertEqual(response.data['category']['id'], self.category.id)
 
+    def test_item_list_is_cached_until_a_write(self):
+        url = reverse('item-list')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['results'][0]['quantity'], 0)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, first.data)
+
+        self.item.adjust_stock(4, reason="manual")
+        fresh = self.client.get(url)
+        self.assertEqual(fresh.data['results'][0]['quantity'], 4)
+
+        self.category.name = "Renamed"
+        self.category.save()
+        fresh = self.client.get(url)
+        self.assertEqual(fresh.data['results'][0]['category']['name'], "Renamed")
+
 class CategoryAPITestCase(APITestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(username="testuser", password="testpass")
@@ -139,3 +177,726 @@ class BulkStockAPITestCase(APITestCase):
         self.item2.refresh_from_db()
         self.assertEqual(self.item1.quantity, q1_before + 5)
         self.assertEqual(self.item2.quantity, max(0, q2_before - 1))
+
+    def test_bulk_repeated_item_clamps_against_running_balance(self):
+        url = reverse('item-bulk-adjust-stock')
+        payload = {
+            "adjustments": [
+                {"item": self.item1.id, "delta": -3, "note": "sale", "reason": "csv"},
+                {"item": self.item1.id, "delta": -4, "note": "sale", "reason": "csv"},
+                {"item": self.item2.id, "delta": 10, "note": "restock", "reason": "csv"},
+            ],
+            "reason": "csv",
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(url, payload, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['delta'] for row in resp.data], [-3, -2, 10])
+        self.assertEqual(resp.data[0]['item_name'], self.item1.name)
+
+        self.item1.refresh_from_db()
+        self.item2.refresh_from_db()
+        self.assertEqual(self.item1.quantity, 0)
+        self.assertEqual(self.item2.quantity, 10)
+        # item1 dropped below its threshold; exactly one open alert is kept
+        self.assertEqual(
+            Alert.objects.filter(item=self.item1, resolved_at__isnull=True).count(), 1
+        )
+
+    @override_settings(CSV_IMPORT_CHUNK_SIZE=2)
+    def test_csv_import_applies_valid_rows_and_reports_errors(self):
+        url = reverse('item-import-csv')
+        content = (
+            "item_id,item_name,quantity_delta,reason\n"
+            f"{self.item1.id},,+3,recount\n"
+            f",{self.item2.name},\"1,000\",shipment\n"
+            "999999,,5,bad id\n"
+            f"{self.item1.id},,abc,bad delta\n"
+        ).encode()
+        upload = SimpleUploadedFile("stock.csv", content, content_type="text/csv")
+        resp = self.client.post(url, {"file": upload}, format='multipart')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['rows'], 4)
+        self.assertEqual(resp.data['applied'], 2)
+        self.assertEqual(resp.data['chunks'], 2)
+        self.assertEqual([e['row'] for e in resp.data['errors']], [4, 5])
+
+        self.item1.refresh_from_db()
+        self.item2.refresh_from_db()
+        self.assertEqual(self.item1.quantity, 8)
+        self.assertEqual(self.item2.quantity, 1000)
+
+    @override_settings(CSV_IMPORT_CHUNK_SIZE=1)
+    def test_csv_import_reports_committed_rows_when_ledger_stays_busy(self):
+        real_apply = csv_import.apply_stock_deltas
+        calls = []
+
+        def busy_after_first_chunk(**kwargs):
+            calls.append(kwargs)
+            if len(calls) > 1:
+                raise ledger.LedgerBusyError("Stock update conflicted 3 times; try again shortly.")
+            return real_apply(**kwargs)
+
+        content = f"item_id,quantity_delta\n{self.item1.id},2\n{self.item2.id},4\n".encode()
+        upload = SimpleUploadedFile("stock.csv", content, content_type="text/csv")
+        with mock.patch.object(csv_import, 'apply_stock_deltas', side_effect=busy_after_first_chunk):
+            resp = self.client.post(reverse('item-import-csv'), {"file": upload}, format='multipart')
+        self.assertEqual(resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(resp['Retry-After'], '1')
+        self.assertEqual((resp.data['committed']['chunks'], resp.data['committed']['applied']), (1, 1))
+        self.item1.refresh_from_db()
+        self.assertEqual(self.item1.quantity, 7)
+
+    def test_csv_import_rejects_missing_columns(self):
+        url = reverse('item-import-csv')
+        upload = SimpleUploadedFile("stock.csv", b"sku,qty\n1,2\n", content_type="text/csv")
+        resp = self.client.post(url, {"file": upload}, format='multipart')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+class LedgerStrategyTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Ledger Cat")
+        self.item = Item.objects.create(
+            name="Ledger Item",
+            category=self.category,
+            price=1.00,
+            low_stock_threshold=2,
+        )
+
+    @override_settings(LEDGER_UPDATE_STRATEGY="conditional")
+    def test_conditional_update_creates_level_and_applies_delta(self):
+        ledger.apply_stock_delta(item=self.item, delta=5)
+        txn = ledger.apply_stock_delta(item=self.item, delta=-2)
+        self.assertEqual(txn.delta, -2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 3)
+
+    @override_settings(LEDGER_UPDATE_STRATEGY="conditional")
+    def test_conditional_update_rejects_negative_balance(self):
+        ledger.apply_stock_delta(item=self.item, delta=1)
+        with self.assertRaises(ledger.InsufficientStockError):
+            ledger.apply_stock_delta(item=self.item, delta=-2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 1)
+
+
+class LedgerRetryTestCase(SimpleTestCase):
+    def setUp(self):
+        ledger.reset_retry_stats()
+
+    @override_settings(LEDGER_MAX_ATTEMPTS=3, LEDGER_RETRY_BACKOFF=0)
+    def test_retries_lock_timeouts_then_succeeds(self):
+        calls = []
+
+        @ledger.retry_on_contention
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "ok"
+
+        self.assertEqual(flaky(), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(ledger.retry_stats(), {"lock_timeout": 2, "retried": 2})
+
+    @override_settings(LEDGER_MAX_ATTEMPTS=2, LEDGER_RETRY_BACKOFF=0)
+    def test_gives_up_after_max_attempts(self):
+        @ledger.retry_on_contention
+        def always_locked():
+            raise OperationalError("could not serialize access due to concurrent update")
+
+        with self.assertRaises(ledger.LedgerBusyError):
+            always_locked()
+        self.assertEqual(ledger.retry_stats()["exhausted"], 1)
+        self.assertEqual(ledger.retry_stats()["serialization"], 2)
+
+    def test_other_operational_errors_are_not_retried(self):
+        @ledger.retry_on_contention
+        def broken():
+            raise OperationalError("no such table: inventory_item")
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(ledger.retry_stats(), {})
+
+
+class PaginationModesTestCase(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(
+            username="pager", password="testpass", role=Roles.ADMIN, is_staff=True,
+        )
+        self.client.force_authenticate(user=self.admin)
+        category = Category.objects.create(name="Pages")
+        self.item = Item.objects.create(name="Paged", category=category, price=1, low_stock_threshold=0)
+        for _ in range(5):
+            self.item.adjust_stock(1, reason="manual")
+
+    def test_transactions_cursor_mode_walks_every_row_once(self):
+        url = reverse('transaction-list')
+        resp = self.client.get(url, {"pagination": "cursor", "page_size": 2, "item": self.item.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['count'], 5)
+        seen = [row['id'] for row in resp.data['results']]
+        while resp.data['next']:
+            resp = self.client.get(resp.data['next'])
+            seen += [row['id'] for row in resp.data['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_transactions_export_streams_csv_and_ndjson(self):
+        url = reverse('transaction-export')
+        resp = self.client.get(url, {"item": self.item.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.streaming)
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,created_at,item,item_name,delta,reason,performed_by,performed_by_username")
+        self.assertEqual(len(lines), 6)
+
+        resp = self.client.get(url, {"export_format": "ndjson"})
+        records = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["item_name"], "Paged")
+
+        resp = self.client.get(url, {"export_format": "xml"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_filters_reject_malformed_values(self):
+        for params in ({"item": "abc"}, {"start_date": "garbage"}, {"end_date": "2024-02-30"}):
+            for url in (reverse('transaction-export'), reverse('transaction-list')):
+                resp = self.client.get(url, params)
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, (url, params))
+                self.assertFalse(resp.streaming)
+
+    def test_count_can_be_skipped(self):
+        url = reverse('item-list')
+        resp = self.client.get(url, {"count": "false", "page_size": 1})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIsNone(resp.data['count'])
+        self.assertIsNone(resp.data['next'])
+        self.assertEqual(len(resp.data['results']), 1)
+
+
+class StockTrendAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="trender", password="testpass")
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name="Trends")
+        self.item = Item.objects.create(name="Trending", category=category, price=1, low_stock_threshold=0)
+        self.other = Item.objects.create(name="Flat", category=category, price=1, low_stock_threshold=0)
+
+    def test_day_trend_is_dense_and_carries_balance_forward(self):
+        self.item.adjust_stock(7, reason="manual")
+        self.item.adjust_stock(-2, reason="manual")
+        today = timezone.localdate()
+        url = reverse('item-trend', args=[self.item.id])
+        resp = self.client.get(url, {"resolution": "day", "start": (today - timedelta(days=2)).isoformat()})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['quantity'] for p in resp.data['series']], [0, 0, 5])
+        self.assertEqual(resp.data['series'][-1]['t'], today.isoformat())
+
+    def test_multi_item_hour_trend(self):
+        self.item.adjust_stock(3, reason="manual")
+        url = reverse('item-trends')
+        resp = self.client.get(url, {"ids": f"{self.item.id},{self.other.id}", "resolution": "hour"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['series'][str(self.item.id)][-1]['quantity'], 3)
+        self.assertEqual(resp.data['series'][str(self.other.id)][-1]['quantity'], 0)
+        self.assertEqual(len(resp.data['series'][str(self.item.id)]), 49)
+
+    def test_rejects_unknown_resolution(self):
+        url = reverse('item-trend', args=[self.item.id])
+        resp = self.client.get(url, {"resolution": "minute"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_impossible_dates(self):
+        for params in ({"start": "2024-02-30"}, {"end": "2024-02-30T10:00:00"}):
+            resp = self.client.get(reverse('item-trend', args=[self.item.id]), params)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, params)
+            resp = self.client.get(reverse('item-trends'), {"ids": str(self.item.id), **params})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+REPLICA_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+class DatabaseRoutingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        window = routers.write_window()
+        window.__enter__()
+        self.addCleanup(window.__exit__, None, None, None)
+
+    @override_settings(DATABASES=REPLICA_DATABASES)
+    def test_item_reads_use_replica_until_a_write(self):
+        self.assertEqual(self.router.db_for_read(Item), 'replica')
+        self.assertEqual(self.router.db_for_read(get_user_model()), 'default')
+
+        self.assertEqual(self.router.db_for_write(Item), 'default')
+        self.assertEqual(self.router.db_for_read(Item), 'default')
+
+        routers.record_write(at=0.0)  # stickiness window has passed
+        self.assertEqual(self.router.db_for_read(Item), 'replica')
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Item), 'default')
+
+    def test_without_replica_everything_uses_default(self):
+        self.assertEqual(self.router.db_for_read(Item), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'inventory'))
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='default')  # exercise stickiness on the test database
+class ReplicaStickinessTestCase(APITestCase):
+    def setUp(self):
+        self.manager = get_user_model().objects.create_user(
+            username="sticky", password="testpass", role=Roles.MANAGER,
+        )
+        self.client.force_authenticate(user=self.manager)
+        category = Category.objects.create(name="Sticky")
+        self.item = Item.objects.create(name="Sticky item", category=category, price=1)
+
+    def test_write_sets_primary_cookie_and_reads_do_not(self):
+        resp = self.client.get(reverse('item-list'))
+        self.assertNotIn('db_last_write', resp.cookies)
+
+        url = reverse('item-adjust-stock', args=[self.item.id])
+        resp = self.client.post(url, {"delta": 3, "reason": "manual"}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn('db_last_write', resp.cookies)
+        self.assertGreater(float(resp.cookies['db_last_write'].value), 0)
+
+
+class SqliteStressCommandTestCase(SimpleTestCase):
+    databases = {'default'}  # the command's threads migrate and use their own scratch file
+
+    def test_immediate_writers_never_fail_and_readers_keep_reading(self):
+        out = io.StringIO()
+        call_command('sqlite_stress', duration=0.5, items=200, batch=50, mode=['performance'], json=True, stdout=out)
+        [result] = json.loads(out.getvalue())
+        self.assertEqual(result['write_errors'], 0)
+        self.assertEqual(result['read_errors'], 0)
+        self.assertGreater(result['batches'], 0)
+        self.assertGreater(result['reads'], 0)
+
+
+class LedgerTransactionModeTestCase(SimpleTestCase):
+    databases = {'default'}  # outside a test transaction, so BEGIN is really issued
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=True)
+    def test_only_ledger_transactions_begin_immediate(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite transaction modes')
+        with CaptureQueriesContext(connection) as queries:
+            with ledger.ledger_atomic():
+                Item.objects.exists()
+                with ledger.ledger_atomic():  # nested: a savepoint
+                    Item.objects.exists()
+            with transaction.atomic():
+                Item.objects.exists()
+        begins = [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+
+class RequestLogTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="logged", password="testpass")
+        self.client.force_authenticate(user=self.user)
+        Category.objects.create(name="Logged")
+
+    def test_one_structured_line_per_request(self):
+        with self.assertLogs('request_log', level='INFO') as logs:
+            resp = self.client.get(reverse('category-list'))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        [record] = logs.records
+        fields = record.fields
+        self.assertEqual(fields['view'], 'category-list')
+        self.assertEqual((fields['method'], fields['status'], fields['user_id']), ('GET', 200, self.user.pk))
+        self.assertGreater(fields['db_queries'], 0)
+        self.assertEqual(fields['bytes'], len(resp.content))
+        self.assertIn('"route": ', JsonFormatter().format(record))
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0, REQUEST_LOG_SLOW_MS=60_000)
+    def test_sampling_drops_ordinary_requests(self):
+        with self.assertNoLogs('request_log', level='INFO'):
+            self.client.get(reverse('category-list'))
+
+
+class ProfilingTestCase(APITestCase):
+    def setUp(self):
+        profiling.get_store().reset()
+        self.admin = get_user_model().objects.create_user(
+            username="profiler", password="testpass", role=Roles.ADMIN, is_staff=True,
+        )
+        self.user = get_user_model().objects.create_user(username="viewer", password="testpass")
+        Category.objects.create(name="Profiled")
+
+    def test_metrics_expose_route_summaries_to_admins_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('category-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        body = resp.content.decode()
+        self.assertIn('inventory_request_sql_queries{route="GET category-list",quantile="0.95"}', body)
+        self.assertIn('inventory_request_duration_seconds_count{route="GET category-list"} 1', body)
+        self.assertIn('# TYPE inventory_request_serializer_seconds summary', body)
+
+    def test_profile_summary_is_returned_to_staff_only(self):
+        def bearer(username):
+            resp = self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': 'testpass'})
+            return f"Bearer {resp.data['access']}"
+
+        # Anonymous and non-staff callers are never run under cProfile
+        with mock.patch.object(profiling, 'profile_call') as profile_call:
+            self.client.get(reverse('category-list'), {'_profile': '1'})
+            resp = self.client.get(reverse('category-list'), {'_profile': '1'}, HTTP_AUTHORIZATION=bearer('viewer'))
+        profile_call.assert_not_called()
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['count'], 1)
+
+        resp = self.client.get(reverse('category-list'), {'_profile': '1'}, HTTP_AUTHORIZATION=bearer('profiler'))
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        self.assertIn('cumulative', resp.content.decode())
+
+        self.client.force_login(self.admin)
+        resp = self.client.get(reverse('category-list'), {'_profile': '1'})
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        self.assertIn('cumulative', resp.content.decode())
+        self.assertIn('queries', resp.content.decode().splitlines()[1])
+
+
+@override_settings(AUDIT_ASYNC=False)
+class BenchmarkCommandTestCase(APITestCase):
+    def run_benchmark(self, *extra):
+        call_command(
+            'benchmark', '--in-place', '--items', '120', '--transactions', '200',
+            '--scenario', 'bulk', '--scenario', 'item_list', '--scenario', 'audit_list',
+            '--batch-sizes', '5,20', '--pages', '1,2,50', '--repeat', '2', *extra, stdout=io.StringIO(),
+        )
+
+    def test_writes_results_and_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            self.run_benchmark('--output', output)
+            with open(output) as f:
+                results = json.load(f)
+            metrics = results['metrics']
+            self.assertEqual(metrics['bulk.batch_20.p95_ms']['unit'], 'ms')
+            self.assertIn('item_list.page_2.p50_ms', metrics)
+            self.assertIn('item_list.cached.page_2.p50_ms', metrics)
+            self.assertIn('audit_list.page_1.p95_ms', metrics)
+            self.assertNotIn('item_list.page_50.p50_ms', metrics)  # beyond the last page
+            self.assertEqual(Item.objects.count(), 120)
+            self.assertEqual(results['meta']['config']['batch_sizes'], [5, 20])
+
+            # A baseline far faster than anything achievable must fail the run
+            baseline = os.path.join(tmp, 'baseline.json')
+            for metric in metrics.values():
+                metric['value'] = metric['value'] / 100 if metric['better'] == 'lower' else metric['value'] * 100
+            with open(baseline, 'w') as f:
+                json.dump(results, f)
+            with self.assertRaisesMessage(CommandError, 'regressed beyond 25%'):
+                self.run_benchmark('--baseline', baseline)
+
+    def test_compare_respects_direction_tolerance_and_noise(self):
+        baseline = {
+            'a.p95_ms': {'value': 100.0, 'unit': 'ms', 'better': 'lower'},
+            'b.ops_per_s': {'value': 100.0, 'unit': 'ops/s', 'better': 'higher'},
+            'c.p50_ms': {'value': 1.0, 'unit': 'ms', 'better': 'lower'},
+        }
+        current = {
+            'a.p95_ms': {'value': 130.0, 'unit': 'ms', 'better': 'lower'},
+            'b.ops_per_s': {'value': 130.0, 'unit': 'ops/s', 'better': 'higher'},
+            'c.p50_ms': {'value': 1.8, 'unit': 'ms', 'better': 'lower'},
+            'd.p50_ms': {'value': 5.0, 'unit': 'ms', 'better': 'lower'},
+        }
+        statuses = {row['metric']: row['status'] for row in compare(current, baseline, 0.25)}
+        self.assertEqual(statuses, {'a.p95_ms': 'regressed', 'b.ops_per_s': 'improved', 'c.p50_ms': 'ok', 'd.p50_ms': 'new'})
+
+
+class GenerateDataCommandTestCase(TestCase):
+    def test_generates_consistent_skewed_dataset(self):
+        call_command(
+            'generate_data', '--categories', '5', '--items', '50', '--transactions', '3000', '--audit-ratio', '0.5',
+            '--days', '14', '--processes', '1', '--batch-size', '1000', stdout=io.StringIO(),
+        )
+        self.assertEqual(Item.objects.count(), 50)
+        self.assertEqual(InventoryTransaction.objects.count(), 3000)
+        self.assertAlmostEqual(AuditLog.objects.filter(action='STOCK_ADJUST').count(), 1500, delta=200)
+
+        # Levels are the ledger totals, and open alerts match low levels
+        totals = dict(InventoryTransaction.objects.order_by().values_list('item').annotate(total=Sum('delta')))
+        for level in InventoryLevel.objects.select_related('item'):
+            self.assertEqual(level.quantity, max(0, totals.get(level.item_id, 0)))
+        low = InventoryLevel.objects.filter(quantity__lte=F('item__low_stock_threshold')).count()
+        self.assertEqual(Alert.objects.filter(resolved_at__isnull=True).count(), low)
+
+        # Zipfian popularity: the busiest SKU sees far more traffic than the median one
+        counts = sorted(InventoryTransaction.objects.order_by().values('item').annotate(n=Count('id')).values_list('n', flat=True))
+        self.assertGreater(counts[-1], 5 * counts[len(counts) // 2])
+
+    def test_flush_deletes_without_per_row_tombstones(self):
+        category = Category.objects.create(name="Stale")
+        old = [Item.objects.create(name=f"Stale {n}", category=category, price=1) for n in range(3)]
+        old[0].adjust_stock(5, reason="init")
+        newest = SyncChange.objects.latest('id').pk
+        call_command(
+            'generate_data', '--categories', '2', '--items', '5', '--transactions', '10', '--days', '1',
+            '--processes', '1', '--flush', stdout=io.StringIO(),
+        )
+        self.assertFalse(Item.objects.filter(pk__in=[item.pk for item in old]).exists())
+        self.assertEqual(Item.objects.count(), 5)
+        self.assertEqual(list(SyncChange.objects.values_list('id', 'deleted')), [(newest, False)])
+
+
+class LowStockAlertTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Alerts")
+        self.item = Item.objects.create(name="Hovering", category=category, price=1, low_stock_threshold=5)
+        self.item.adjust_stock(10, reason="init")
+
+    def open_alerts(self):
+        return Alert.objects.filter(item=self.item, resolved_at__isnull=True)
+
+    def test_alerts_follow_threshold_crossings_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.adjust_stock(-7, reason="manual")
+        self.assertEqual(self.open_alerts().count(), 1)
+        self.assertIn("(3 remaining)", self.open_alerts().get().message)
+
+        # Still low and known to be alerted: no alert queries at all
+        with self.assertNumQueries(0):
+            self.assertEqual(alerts.evaluate([(self.item, 3, 2)]), {'opened': 0, 'resolved': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.adjust_stock(4, reason="manual")
+        self.assertFalse(self.open_alerts().exists())
+        self.assertEqual(Alert.objects.filter(item=self.item).count(), 1)
+
+    def test_manual_resolve_is_not_masked_by_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.adjust_stock(-7, reason="manual")
+        alert = self.open_alerts().get()
+        alert.resolved_at = timezone.now()
+        alert.save()
+
+        # The item is still low, so its next change opens a fresh alert
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.adjust_stock(-1, reason="manual")
+        self.assertEqual(self.open_alerts().count(), 1)
+        self.assertEqual(Alert.objects.filter(item=self.item).count(), 2)
+
+    def test_out_of_order_callbacks_follow_the_current_level(self):
+        # Overlapping transactions took the item to 3 and back to 8; the fall's
+        # callback runs last and must not alert an item above its threshold
+        self.item.adjust_stock(-7, reason="manual")
+        self.item.adjust_stock(5, reason="manual")
+        alerts.evaluate([(self.item, 3, 8)])
+        self.assertEqual(alerts.evaluate([(self.item, 10, 3)]), {'opened': 0, 'resolved': 0})
+        self.assertFalse(self.open_alerts().exists())
+
+        # Back down to 2: a late rise callback must not resolve the fresh alert
+        self.item.adjust_stock(-6, reason="manual")
+        alerts.evaluate([(self.item, 8, 2)])
+        alerts.evaluate([(self.item, 8, 2)])
+        self.assertEqual(alerts.evaluate([(self.item, 3, 8)]), {'opened': 0, 'resolved': 0})
+        self.assertEqual(self.open_alerts().count(), 1)
+
+    def test_rolled_back_adjustments_never_evaluate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ledger.InsufficientStockError):
+                with transaction.atomic():
+                    self.item.adjust_stock(-8, reason="manual")
+                    self.item.adjust_stock(-8, reason="manual")
+        self.assertFalse(Alert.objects.exists())
+
+
+class LowStockPanelTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username="panel", password="testpass")
+        self.client.force_authenticate(user=user)
+        self.tools = Category.objects.create(name="Tools")
+        self.food = Category.objects.create(name="Food")
+
+        def make(name, category, threshold, quantity):
+            item = Item.objects.create(name=name, category=category, price=1, low_stock_threshold=threshold)
+            if quantity:
+                item.adjust_stock(quantity, reason="init")
+            return item
+
+        self.hammer = make("Hammer", self.tools, threshold=10, quantity=2)
+        self.bread = make("Bread", self.food, threshold=5, quantity=5)
+        self.saw = make("Saw", self.tools, threshold=3, quantity=10)
+        self.nails = make("Nails", self.tools, threshold=0, quantity=0)  # never stocked
+        self.url = reverse('item-low-stock')
+
+    def names(self, resp):
+        return [(row['name'], row['shortage']) for row in resp.data['results']]
+
+    def test_sorted_by_severity_or_category(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(resp), [("Hammer", 8), ("Bread", 0), ("Nails", 0)])
+
+        resp = self.client.get(self.url, {'ordering': 'category'})
+        self.assertEqual(self.names(resp), [("Bread", 0), ("Hammer", 8), ("Nails", 0)])
+
+        resp = self.client.get(self.url, {'ordering': 'severity', 'category': self.tools.pk})
+        self.assertEqual(self.names(resp), [("Hammer", 8), ("Nails", 0)])
+
+        resp = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(self.names(resp), [("Hammer", 8), ("Bread", 0)])
+        resp = self.client.get(resp.data['next'])
+        self.assertEqual(self.names(resp), [("Nails", 0)])
+
+        self.assertEqual(self.client.get(self.url, {'ordering': 'price'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LEDGER_UPDATE_STRATEGY='conditional')
+    def test_shortage_tracks_ledger_and_threshold_edits(self):
+        self.saw.adjust_stock(-8, reason="manual")
+        self.assertEqual(InventoryLevel.objects.get(item=self.saw).shortage, 1)
+        ledger.apply_stock_deltas(adjustments=[{'item': self.saw, 'delta': 5}, {'item': self.hammer, 'delta': 1}])
+        levels = dict(InventoryLevel.objects.values_list('item__name', 'shortage'))
+        self.assertEqual((levels["Saw"], levels["Hammer"]), (-4, 7))
+
+        # Raising the threshold makes the item low and opens its alert
+        self.saw.low_stock_threshold = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.saw.save()
+        self.assertEqual(InventoryLevel.objects.get(item=self.saw).shortage, 13)
+        self.assertTrue(Alert.objects.filter(item=self.saw, resolved_at__isnull=True).exists())
+
+        self.saw.low_stock_threshold = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.saw.save()
+        self.assertFalse(Alert.objects.filter(item=self.saw, resolved_at__isnull=True).exists())
+        self.assertNotIn("Saw", [name for name, _ in self.names(self.client.get(self.url))])
+
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username="poller", password="testpass")
+        self.client.force_authenticate(user=user)
+        self.category = Category.objects.create(name="Tools")
+        self.item = Item.objects.create(name="Hammer", category=self.category, price=5, low_stock_threshold=2)
+
+    def test_unchanged_lists_answer_304_without_queries(self):
+        for name in ('item-list', 'category-list', 'alert-list'):
+            url = reverse(name)
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            self.assertTrue(first['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', first)
+
+            with self.assertNumQueries(0):
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(again.content, b'')
+            self.assertEqual(again['ETag'], first['ETag'])
+
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Query string is part of the validator
+        page = self.client.get(reverse('item-list'), {'page_size': 1})
+        self.assertNotEqual(page['ETag'], self.client.get(reverse('item-list'))['ETag'])
+
+    def test_writes_change_the_etag(self):
+        items_etag = self.client.get(reverse('item-list'))['ETag']
+        alerts_etag = self.client.get(reverse('alert-list'))['ETag']
+        categories_etag = self.client.get(reverse('category-list'))['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.adjust_stock(1, reason="manual")  # at threshold: opens an alert
+        resp = self.client.get(reverse('item-list'), HTTP_IF_NONE_MATCH=items_etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['results'][0]['quantity'], 1)
+        resp = self.client.get(reverse('alert-list'), HTTP_IF_NONE_MATCH=alerts_etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 1)
+
+        resp = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=categories_etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        Category.objects.create(name="Paint")
+        resp = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=categories_etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTestCase(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="handheld", password="testpass")
+        self.client.force_authenticate(user=user)
+        self.url = reverse('sync-list')
+        self.mark = self.client.get(self.url).data['next']
+
+    def sync(self, since, **params):
+        resp = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data
+
+    def test_changes_and_tombstones_since_mark(self):
+        self.assertEqual(self.sync(self.mark)['next'], self.mark)  # nothing new
+
+        tools = Category.objects.create(name="Tools")
+        hammer = Item.objects.create(name="Hammer", category=tools, price=5, low_stock_threshold=1)
+        saw = Item.objects.create(name="Saw", category=tools, price=9, low_stock_threshold=1)
+        hammer.adjust_stock(3, reason="manual")
+        ledger.apply_stock_deltas(adjustments=[{'item': hammer, 'delta': 2}, {'item': saw, 'delta': 1}])
+
+        data = self.sync(self.mark)
+        self.assertGreater(data['next'], self.mark)
+        self.assertFalse(data['has_more'])
+        self.assertEqual([row['name'] for row in data['items']], ["Hammer", "Saw"])
+        self.assertEqual([row['name'] for row in data['categories']], ["Tools"])
+        self.assertEqual([(row['item'], row['quantity']) for row in data['levels']], [(hammer.pk, 5), (saw.pk, 1)])
+        self.assertEqual(data['deleted'], {'items': [], 'categories': [], 'levels': []})
+
+        mark = data['next']
+        saw_id = saw.pk
+        saw.delete()
+        data = self.sync(mark)
+        self.assertEqual(data['items'], [])
+        self.assertEqual(data['deleted'], {'items': [saw_id], 'categories': [], 'levels': [saw_id]})
+        self.assertEqual(self.sync(data['next'])['next'], data['next'])
+
+    def test_limit_pages_through_changes(self):
+        for n in range(3):
+            Category.objects.create(name=f"Cat {n}")
+        first = self.sync(self.mark, limit=2)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['categories']), 2)
+        rest = self.sync(first['next'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual([row['name'] for row in rest['categories']], ["Cat 2"])
+
+        resp = self.client.get(self.url, {'since': 'latest'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clients_behind_pruned_changes_must_resync(self):
+        for n in range(3):
+            Category.objects.create(name=f"Old {n}")
+        SyncChange.objects.update(created_at=timezone.now() - timedelta(days=40))
+        caught_up = self.sync(self.mark)['next']
+        Category.objects.create(name="Recent")
+
+        call_command('prune_sync_changes', days=30, stdout=io.StringIO())
+        self.assertEqual(SyncChange.objects.count(), 1)
+        resp = self.client.get(self.url, {'since': self.mark})
+        self.assertEqual(resp.status_code, status.HTTP_410_GONE)
+        self.assertEqual(resp.data['next'], SyncChange.objects.get().pk)
+        self.assertEqual([row['name'] for row in self.sync(caught_up)['categories']], ["Recent"])
+
+        # The newest change is kept whatever its age, so the sequence never restarts
+        SyncChange.objects.update(created_at=timezone.now() - timedelta(days=40))
+        call_command('prune_sync_changes', days=0, stdout=io.StringIO())
+        self.assertEqual(SyncChange.objects.count(), 1)
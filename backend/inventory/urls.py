@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ItemViewSet, CategoryViewSet, 
-    InventoryTransactionViewSet, AlertViewSet
+    InventoryTransactionViewSet, AlertViewSet, SyncViewSet
 )
 
 router = DefaultRouter()
@@ -10,6 +10,7 @@ router.register(r'items', ItemViewSet, basename='item')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'transactions', InventoryTransactionViewSet, basename='transaction')
 router.register(r'alerts', AlertViewSet, basename='alert')
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
 path('', include(router.urls)),
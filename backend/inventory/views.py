@@ -1,53 +1,61 @@
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
 from django.db.models import Q, Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime
+import json
 import logging
-from drf_spectacular.utils import extend_schema
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from .models import Item, Category, InventoryTransaction, Alert, InventoryLevel
 from .serializers import (
     ItemSerializer, CategorySerializer, InventoryTransactionSerializer,
     AlertSerializer, StockAdjustmentSerializer, BulkStockAdjustmentSerializer,
-    QuantityOnlySerializer,
+    QuantityOnlySerializer, LowStockItemSerializer,
 )
-from .services import ledger, inventory
+from .services import ledger, inventory, export, csv_import, trends, sync
+from .services.cache import ITEM_LIST_TABLES, item_list_cache_key, get_item_list_page, set_item_list_page
+from .mixins import ConditionalGetMixin
 from django.conf import settings
 from users.permissions import IsViewerOrReadOnly, IsManagerOrAbove, RequireModelPerm
+from config.pagination import HybridPagination
+from archive.mixins import ArchiveFanoutMixin
+from archive.services import fanout
 
 logger = logging.getLogger(__name__)
 
-class ItemPagination(PageNumberPagination):
+class ItemPagination(HybridPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     permission_classes = [IsViewerOrReadOnly]
     pagination_class = ItemPagination
+    cursor_ordering = ('id',)
+    etag_tables = ITEM_LIST_TABLES
 
     def get_queryset(self):
-        logger.info("ItemViewSet.get_queryset called")
-        queryset = inventory.get_items()
-        logger.info(f"Found {queryset.count()} items")
-        return queryset
+        return inventory.get_items().order_by('id')
 
     def list(self, request, *args, **kwargs):
-        logger.info("ItemViewSet.list called")
-        logger.info(f"User: {request.user.username}")
-        
-        # Get paginated response
-        response = super().list(request, *args, **kwargs)
-        
-        # Print raw response data
-        print("=== Raw Response Data ===")
-        print(response.data)
-        print("=== End Raw Response Data ===")
-        
+        # Serve repeat reads from the pre-serialized page cache; the key embeds
+        # item/category/level table versions so any write invalidates it.
+        key = item_list_cache_key(host=request.get_host(), query_params=request.query_params)
+        payload = get_item_list_page(key)
+        if payload is not None:
+            response = Response(payload)
+        else:
+            response = super().list(request, *args, **kwargs)
+            set_item_list_page(key, response.data)
         return response
 
     @extend_schema(
@@ -82,6 +90,95 @@ class ItemViewSet(viewsets.ModelViewSet):
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except ledger.LedgerBusyError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+
+    def _trend_window(self, request):
+        """Parse resolution/start/end query params shared by trend and trend_series."""
+        window = {'resolution': request.query_params.get('resolution', 'day')}
+        for name in ('start', 'end'):
+            raw = request.query_params.get(name)
+            if not raw:
+                continue
+            try:
+                value = parse_datetime(raw)
+                if value is None and parse_date(raw) is not None:
+                    value = datetime.combine(parse_date(raw), datetime.min.time())
+            except ValueError:  # well-formed but impossible, e.g. 2024-02-30
+                value = None
+            if value is None:
+                raise trends.TrendError(f'{name} must be an ISO date or datetime')
+            window[name] = value if timezone.is_aware(value) else timezone.make_aware(value)
+        return window
+
+    @extend_schema(parameters=[
+        OpenApiParameter('resolution', str, enum=trends.RESOLUTIONS),
+        OpenApiParameter('start', str),
+        OpenApiParameter('end', str),
+    ])
+    @action(detail=True, methods=['get'])
+    def trend(self, request, pk=None):
+        """Stock balance series for one item at hour, day or week resolution"""
+        item = self.get_object()
+        try:
+            series = trends.stock_trends([item.pk], **self._trend_window(request))
+        except trends.TrendError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'item': item.pk, 'series': series[item.pk]})
+
+    @extend_schema(parameters=[
+        OpenApiParameter('ids', str, description='Comma-separated item ids'),
+        OpenApiParameter('resolution', str, enum=trends.RESOLUTIONS),
+        OpenApiParameter('start', str),
+        OpenApiParameter('end', str),
+    ])
+    @action(detail=False, methods=['get'], url_path='trends', url_name='trends')
+    def trend_series(self, request):
+        """Stock balance series for several items (?ids=1,2,3) to compare SKUs"""
+        try:
+            ids = [int(part) for part in request.query_params.get('ids', '').split(',') if part.strip()]
+        except ValueError:
+            return Response({'error': 'ids must be comma-separated integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'error': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            series = trends.stock_trends(ids, **self._trend_window(request))
+        except trends.TrendError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'series': {str(item_id): points for item_id, points in series.items()}})
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('ordering', str, enum=[*inventory.LOW_STOCK_ORDERINGS]),
+            OpenApiParameter('category', int),
+        ],
+        responses=LowStockItemSerializer(many=True),
+    )
+    @action(detail=False, methods=['get'], serializer_class=LowStockItemSerializer)
+    def low_stock(self, request):
+        """Items at or below their threshold, most severe shortage first (?ordering=severity|category)"""
+        ordering = request.query_params.get('ordering', 'severity')
+        if ordering not in inventory.LOW_STOCK_ORDERINGS:
+            return Response(
+                {'error': f"ordering must be one of: {', '.join(inventory.LOW_STOCK_ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = inventory.get_low_stock_items(ordering)
+        category = request.query_params.get('category')
+        if category:
+            if not category.isdigit():
+                return Response({'error': 'category must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(category_id=category)
+
+        # Keyset mode seeks on the same ordering as the page
+        self.cursor_ordering = inventory.LOW_STOCK_ORDERINGS[ordering]
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def get_permissions(self):
         """Enforce role- and permission-based access for item writes.
@@ -116,72 +213,100 @@ class ItemViewSet(viewsets.ModelViewSet):
         """Adjust stock quantities for multiple items"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        # Negative deltas are clamped so stock never goes below zero.
+        # This makes bulk operations forgiving and avoids partial failures.
         try:
-            transactions = []
-            for adjustment in serializer.validated_data['adjustments']:
-                item = adjustment['item']
-                requested_delta = adjustment['delta']
-                # Clamp negative deltas so stock never goes below zero.
-                # This makes bulk operations forgiving and avoids partial failures.
-                if requested_delta < 0:
-                    available = item.quantity  # uses InventoryLevel snapshot; 0 if none
-                    if available + requested_delta < 0:
-                        requested_delta = -available  # zero out the stock at most
-
-                transaction = ledger.apply_stock_delta(
-                    item=item,
-                    delta=requested_delta,
-                    user=request.user,
-                    note=adjustment.get('note', ''),
-                    reason=serializer.validated_data.get('reason', 'csv'),
-                    audit_context={
-                        'ip_address': request.META.get('REMOTE_ADDR'),
-                        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                    }
-                )
-                transactions.append(transaction)
-            return Response(
-                InventoryTransactionSerializer(transactions, many=True).data
+            transactions = ledger.apply_stock_deltas(
+                adjustments=serializer.validated_data['adjustments'],
+                user=request.user,
+                reason=serializer.validated_data.get('reason', 'csv'),
+                clamp=True,
+                audit_context={
+                    'ip_address': request.META.get('REMOTE_ADDR'),
+                    'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                }
             )
-        except ledger.InsufficientStockError as e:
+        except ledger.LedgerBusyError as e:
             return Response(
                 {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
             )
+        return Response(
+            InventoryTransactionSerializer(transactions, many=True).data
+        )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        request={'multipart/form-data': {
+            'type': 'object',
+            'properties': {
+                'file': {'type': 'string', 'format': 'binary'},
+                'dry_run': {'type': 'boolean'},
+                'progress': {'type': 'boolean'},
+            },
+        }},
+        responses={200: dict},
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsManagerOrAbove],
+        parser_classes=[MultiPartParser],
+    )
+    def import_csv(self, request):
+        """Stream a stock adjustment CSV (item_id/item_name, quantity_delta, reason) and apply it in chunks.
+
+        Returns a summary with per-row errors, or NDJSON progress lines per chunk when progress=true.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def flag(name):
+            return str(request.data.get(name, request.query_params.get(name, ''))).lower() in ('1', 'true', 'yes')
+
+        options = {
+            'user': request.user,
+            'dry_run': flag('dry_run'),
+            'chunk_size': getattr(settings, 'CSV_IMPORT_CHUNK_SIZE', csv_import.DEFAULT_CHUNK_SIZE),
+            'audit_context': {
+                'ip_address': request.META.get('REMOTE_ADDR'),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+            },
+        }
+        upload.open('rb')
+        if flag('progress'):
+            def events():
+                try:
+                    for progress in csv_import.iter_stock_csv_import(upload, **options):
+                        yield json.dumps(progress) + '\n'
+                except csv_import.CsvImportError as e:
+                    yield json.dumps({'error': str(e)}) + '\n'
+                except ledger.LedgerBusyError as e:
+                    # Headers are already sent; earlier progress lines are the committed chunks
+                    yield json.dumps({'error': str(e), 'retry_after': 1}) + '\n'
+            return StreamingHttpResponse(events(), content_type='application/x-ndjson')
+
+        try:
+            summary = csv_import.import_stock_csv(upload, **options)
+        except csv_import.CsvImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except csv_import.CsvImportBusyError as e:
+            # Chunks before the busy one are committed; report them so the client resumes after them
+            return Response(
+                {'error': str(e), 'committed': e.summary},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+        return Response(summary)
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsViewerOrReadOnly]
+    etag_tables = ('category',)
 
     def get_queryset(self):
-        logger.info("CategoryViewSet.get_queryset called")
-        queryset = Category.objects.all()
-        logger.info(f"Found {queryset.count()} categories")
-        return queryset
-
-    def list(self, request, *args, **kwargs):
-        logger.info("=== CategoryViewSet.list API Call ===")
-        logger.info(f"User: {request.user.username}")
-        logger.info(f"Request Method: {request.method}")
-        logger.info(f"Request Headers: {request.headers}")
-        logger.info(f"Query Params: {request.query_params}")
-        
-        # Get paginated response
-        response = super().list(request, *args, **kwargs)
-        
-        # Log detailed info
-        logger.info("=== API Response Details ===")
-        logger.info(f"Total categories in database: {self.get_queryset().count()}")
-        logger.info(f"Response Status: {response.status_code}")
-        logger.info(f"Response Headers: {response.headers}")
-        logger.info(f"Page Size: {len(response.data['results'])}")
-        logger.info(f"Full Response Data: {response.data}")
-        logger.info(f"Categories Data: {[{'id': c['id'], 'name': c['name']} for c in response.data['results']]}")
-        logger.info(f"Next Page: {response.data['next']}")
-        logger.info(f"Previous Page: {response.data['previous']}")
-        logger.info("=== End Category API Call ===")
-        
-        return response
+        return Category.objects.all()
 
     def get_permissions(self):
         """Admins only for writes; viewers (and above) can read.
@@ -192,9 +317,14 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return [IsAdmin()]
         return super().get_permissions()
 
-class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryTransactionViewSet(ArchiveFanoutMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = InventoryTransactionSerializer
     permission_classes = [IsAdminUser]
+    # Seeks on the (item, created_at) index when filtered by item
+    cursor_ordering = ('-created_at', '-id')
+    # start_date before the archive horizon also reads archived months
+    archive_table = 'transactions'
+    archive_filter_params = ('item',)
 
     def get_queryset(self):
         queryset = InventoryTransaction.objects.select_related('item', 'performed_by')
@@ -202,21 +332,53 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter by item if specified
         item_id = self.request.query_params.get('item')
         if item_id:
-            queryset = queryset.filter(item_id=item_id)
+            if not item_id.isdigit():
+                raise ValidationError({'item': 'Must be an item id'})
+            queryset = queryset.filter(item_id=int(item_id))
             
         # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
+        start_date = self.get_date_bound('start_date')
+        end_date = self.get_date_bound('end_date')
         if start_date:
             queryset = queryset.filter(created_at__gte=start_date)
         if end_date:
             queryset = queryset.filter(created_at__lte=end_date)
             
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
-class AlertViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('export_format', str, enum=list(export.EXPORT_FORMATS)),
+            OpenApiParameter('item', int),
+            OpenApiParameter('start_date', str),
+            OpenApiParameter('end_date', str),
+        ],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['get'], url_path='export', url_name='export')
+    def export_transactions(self, request):
+        """Stream the filtered ledger as CSV (default) or NDJSON with constant memory"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in export.EXPORT_FORMATS:
+            return Response(
+                {'error': f"export_format must be one of {', '.join(export.EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        write = export.iter_transactions_csv if export_format == 'csv' else export.iter_transactions_ndjson
+        queryset = self.get_queryset()  # validates the filters before the archive is read
+        archived = fanout.archived_rows(self.archive_table, request.query_params, self.get_archive_filters())
+        chunks = write(queryset, archived=archived.oldest_first() if archived is not None else ())
+        if isinstance(request._request, ASGIRequest):
+            chunks = export.aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=export.EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+class AlertViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('-triggered_at', '-id')
+    etag_tables = ('alert', 'item')  # item_name
 
     def get_queryset(self):
         # By default, show only unresolved alerts
@@ -226,7 +388,7 @@ class AlertViewSet(viewsets.ModelViewSet):
         if not show_resolved:
             queryset = queryset.filter(resolved_at__isnull=True)
             
-        return queryset.order_by('-triggered_at')
+        return queryset.order_by('-triggered_at', '-id')
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -247,4 +409,47 @@ class AlertViewSet(viewsets.ModelViewSet):
                 user_agent=request.META.get('HTTP_USER_AGENT'),
                 additional_context={'action': 'resolve'}
             )
-        return Response(self.get_serializer(alert).data)
\ No newline at end of file
+        return Response(self.get_serializer(alert).data)
+
+class SyncViewSet(viewsets.ViewSet):
+    """Delta sync for offline clients (see inventory.services.sync)"""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(parameters=[
+        OpenApiParameter('since', int, description='Last `next` received; omit to get the current mark'),
+        OpenApiParameter('limit', int),
+    ])
+    def list(self, request):
+        """
+        Items, categories and stock levels changed after ?since=<seq>, with tombstones.
+        410 when those changes were pruned: download the catalog again and sync from `next`.
+        """
+        raw = request.query_params.get('since')
+        if raw is None:
+            # New clients: take this mark, download the catalog, then sync from it
+            return Response({'next': sync.high_water_mark()})
+        max_limit = getattr(settings, 'SYNC_MAX_CHANGES', 5000)
+        try:
+            since = int(raw)
+            limit = min(int(request.query_params.get('limit', max_limit)), max_limit)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or limit < 1:
+            return Response({'error': 'since must be >= 0 and limit >= 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changes = sync.changes_since(since, limit)
+        except sync.ResyncRequired:
+            return Response(
+                {'error': 'full resync required', 'next': sync.high_water_mark()},
+                status=status.HTTP_410_GONE,
+            )
+        return Response({
+            'since': since,
+            'next': changes['next'],
+            'has_more': changes['has_more'],
+            'items': ItemSerializer(changes['items'], many=True).data,
+            'categories': CategorySerializer(changes['categories'], many=True).data,
+            'levels': changes['levels'],
+            'deleted': changes['deleted'],
+        })
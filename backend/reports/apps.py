@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        from . import generators  # register built-in report generators
+        from .services.registry import ensure_definitions
+        post_migrate.connect(ensure_definitions, sender=self)
@@ -0,0 +1,48 @@
+import csv
+import io
+from datetime import MAXYEAR, MINYEAR
+from inventory.models import Item
+from inventory.services.rollups import monthly_stock_summary
+from .services.registry import register
+
+MONTHLY_COLUMNS = ['item_id', 'item_name', 'category', 'opening', 'inflow', 'outflow', 'closing']
+
+
+def parse_month(value):
+    """'YYYY-MM' -> (year, month); raises ValueError on bad input."""
+    year, month = (int(part) for part in str(value).split('-'))
+    if not (MINYEAR <= year <= MAXYEAR and 1 <= month <= 12):
+        raise ValueError(f'Invalid month: {value}')
+    return year, month
+
+
+def text_writer(out):
+    """Wrap a binary artifact stream for csv/json writers."""
+    return io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+
+
+@register('stock_snapshot', name='Stock snapshot', format='csv')
+def stock_snapshot(run, out):
+    """Current on-hand quantity, threshold and price for every item."""
+    text = text_writer(out)
+    writer = csv.writer(text)
+    writer.writerow(['item_id', 'item_name', 'category', 'quantity', 'low_stock_threshold', 'price'])
+    rows = (
+        Item.objects.order_by('id')
+        .values_list('id', 'name', 'category__name', 'current_level__quantity', 'low_stock_threshold', 'price')
+        .iterator(chunk_size=2000)
+    )
+    for item_id, name, category, quantity, threshold, price in rows:
+        writer.writerow([item_id, name, category, quantity or 0, threshold, price])
+    text.detach()
+
+
+@register('monthly_stock', name='Monthly stock', format='csv')
+def monthly_stock(run, out):
+    """Opening, inflow, outflow and closing per item for parameters['month'] (YYYY-MM), from daily rollups."""
+    year, month = parse_month(run.parameters.get('month', ''))
+    text = text_writer(out)
+    writer = csv.DictWriter(text, fieldnames=MONTHLY_COLUMNS)
+    writer.writeheader()
+    writer.writerows(monthly_stock_summary(year, month))
+    text.detach()
@@ -0,0 +1,87 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reports.services import runner, worker
+
+
+class Command(BaseCommand):
+    help = 'Claims queued report runs and executes them in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=getattr(settings, 'REPORTS_WORKER_PROCESSES', 2),
+            help='Pool size; 0 runs reports inline in this process',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'REPORTS_POLL_INTERVAL', 2.0),
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is drained instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        stale = runner.fail_stale_runs(getattr(settings, 'REPORTS_STALE_RUN_SECONDS', 3600))
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Marked {stale} stale run(s) as failed.'))
+
+        if options['processes'] <= 0:
+            self.run_inline(options)
+        else:
+            self.run_pool(options)
+
+    def run_inline(self, options):
+        while True:
+            run_id = runner.claim_next_run()
+            if run_id is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.report(run_id, runner.execute_run(run_id))
+
+    def run_pool(self, options):
+        size = options['processes']
+        # spawn: children set up Django themselves and never inherit the
+        # parent's open DB connection
+        context = multiprocessing.get_context('spawn')
+        self.stdout.write(self.style.SUCCESS(f'Report worker started with {size} process(es).'))
+        with ProcessPoolExecutor(
+            max_workers=size, mp_context=context, initializer=worker.init_worker_process
+        ) as pool:
+            inflight = {}
+            while True:
+                while len(inflight) < size:
+                    run_id = runner.claim_next_run()
+                    if run_id is None:
+                        break
+                    inflight[pool.submit(worker.execute_run, run_id)] = run_id
+
+                if not inflight:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(inflight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    run_id = inflight.pop(future)
+                    try:
+                        self.report(run_id, future.result())
+                    except Exception as exc:  # child crashed before recording a status
+                        runner.mark_failed(run_id, f'Worker crashed: {exc}')
+                        self.stderr.write(f'Run {run_id} crashed: {exc}')
+
+    def report(self, run_id, status):
+        style = self.style.SUCCESS if status == 'success' else self.style.ERROR
+        self.stdout.write(style(f'Run {run_id}: {status}'))
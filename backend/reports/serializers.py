@@ -0,0 +1,27 @@
+from rest_framework import serializers
+from .models import ReportDefinition, ReportRun, ReportArtifact
+
+class ReportDefinitionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportDefinition
+        fields = ['id', 'code', 'name', 'description', 'format']
+
+class ReportArtifactSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportArtifact
+        fields = ['id', 'file_name', 'content_type', 'size_bytes', 'checksum', 'created_at']
+
+class ReportRunSerializer(serializers.ModelSerializer):
+    definition = serializers.SlugRelatedField(slug_field='code', queryset=ReportDefinition.objects.all())
+    requested_by = serializers.StringRelatedField()
+    artifacts = ReportArtifactSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ReportRun
+        fields = [
+            'id', 'definition', 'status', 'parameters', 'requested_by',
+            'requested_at', 'started_at', 'finished_at', 'error_message', 'artifacts'
+        ]
+        read_only_fields = [
+            'status', 'requested_by', 'requested_at', 'started_at', 'finished_at', 'error_message'
+        ]
@@ -0,0 +1,56 @@
+from typing import Callable, Dict, Optional, BinaryIO
+
+# code -> {'generator', 'name', 'description', 'format'}
+_REGISTRY: Dict[str, Dict] = {}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'pdf': 'application/pdf',
+}
+
+
+def register(code: str, *, name: str, format: str = 'csv', description: str = '') -> Callable:
+    """
+    Register a report generator under a ReportDefinition code.
+
+    A generator is called as generator(run, out) where `run` is the
+    ReportRun being executed and `out` a binary file to stream output into.
+
+    Usage:
+        @register('stock_snapshot', name='Stock snapshot', format='csv')
+        def stock_snapshot(run, out):
+            ...
+    """
+    def decorator(func: Callable[..., None]) -> Callable[..., None]:
+        _REGISTRY[code] = {
+            'generator': func,
+            'name': name,
+            'description': description or (func.__doc__ or '').strip(),
+            'format': format,
+        }
+        return func
+    return decorator
+
+
+def get_generator(code: str) -> Optional[Callable[..., None]]:
+    entry = _REGISTRY.get(code)
+    return entry['generator'] if entry else None
+
+
+def registered() -> Dict[str, Dict]:
+    return dict(_REGISTRY)
+
+
+def ensure_definitions(sender=None, **kwargs) -> None:
+    """post_migrate hook: make sure every registered generator has a ReportDefinition row."""
+    from reports.models import ReportDefinition
+    for code, entry in _REGISTRY.items():
+        ReportDefinition.objects.update_or_create(
+            code=code,
+            defaults={
+                'name': entry['name'],
+                'description': entry['description'],
+                'format': entry['format'],
+            },
+        )
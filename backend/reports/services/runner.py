@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from reports.models import ReportRun, ReportArtifact
+from .registry import get_generator, CONTENT_TYPES
+
+try:
+    from audit.models import AuditLog
+except Exception:  # pragma: no cover - during early migrations/imports
+    AuditLog = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class ReportError(Exception):
+    """Base exception for report execution"""
+    pass
+
+
+def artifact_root() -> Path:
+    return Path(getattr(settings, 'REPORTS_ARTIFACT_ROOT', settings.BASE_DIR / 'report_artifacts'))
+
+
+class HashingWriter:
+    """Binary file wrapper that tracks size and SHA-256 while streaming to disk."""
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._fh.write(data)
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return False
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._fh.closed
+
+
+def enqueue_run(*, definition, user=None, parameters: Optional[dict] = None) -> ReportRun:
+    """Queue a report; a worker (run_report_worker) picks it up."""
+    if get_generator(definition.code) is None:
+        raise ReportError(f"No generator registered for report '{definition.code}'")
+    return ReportRun.objects.create(
+        definition=definition,
+        requested_by=user,
+        parameters=parameters or {},
+    )
+
+
+def claim_next_run() -> Optional[int]:
+    """
+    Atomically move the oldest queued run to running and return its id.
+
+    SKIP LOCKED lets several workers poll without blocking on each other's
+    candidates (backends without it ignore the hint); the guarded UPDATE
+    makes the claim safe either way.
+    """
+    with transaction.atomic():
+        candidate = (
+            ReportRun.objects.select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('requested_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        claimed = ReportRun.objects.filter(pk=candidate, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+    return candidate if claimed else None
+
+
+def fail_stale_runs(older_than_seconds: int) -> int:
+    """Mark runs left 'running' by a crashed worker as failed."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    return ReportRun.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='failed',
+        finished_at=timezone.now(),
+        error_message='Worker stopped before the run finished',
+    )
+
+
+def mark_failed(run_id: int, message: str) -> None:
+    """Record a failure for a run whose worker died before finishing it."""
+    ReportRun.objects.filter(pk=run_id, status='running').update(
+        status='failed', finished_at=timezone.now(), error_message=message
+    )
+
+
+def execute_run(run_id: int) -> str:
+    """
+    Run a claimed report and record its artifact.
+
+    Output is streamed to REPORTS_ARTIFACT_ROOT/<run id>/ and recorded as a
+    ReportArtifact with size and SHA-256. Returns the final status.
+    """
+    run = ReportRun.objects.select_related('definition', 'requested_by').get(pk=run_id)
+    definition = run.definition
+    generator = get_generator(definition.code)
+    file_name = f"{definition.code}-{run.pk}.{definition.format}"
+    relative = Path(str(run.pk)) / file_name
+    path = artifact_root() / relative
+    try:
+        if generator is None:
+            raise ReportError(f"No generator registered for report '{definition.code}'")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as fh:
+            out = HashingWriter(fh)
+            generator(run, out)
+        ReportArtifact.objects.create(
+            report_run=run,
+            file_name=file_name,
+            file_path=str(relative),
+            content_type=CONTENT_TYPES.get(definition.format, 'application/octet-stream'),
+            size_bytes=out.size,
+            checksum=out.sha256.hexdigest(),
+        )
+        run.status = 'success'
+    except Exception:
+        logger.exception('Report run %s failed', run.pk)
+        path.unlink(missing_ok=True)
+        run.status = 'failed'
+        run.error_message = traceback.format_exc(limit=5)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error_message', 'finished_at'])
+
+    if run.status == 'success' and AuditLog is not None and getattr(settings, 'AUDIT_ENABLED', True):
+        try:
+            AuditLog.log_action(
+                actor=run.requested_by,
+                action='REPORT_GENERATE',
+                instance=run,
+                after_state={'status': run.status, 'definition': definition.code},
+            )
+        except Exception:
+            logger.exception('Audit logging failed for report run %s', run.pk)
+    return run.status
+
@@ -0,0 +1,17 @@
+"""
+Process pool entry points for run_report_worker.
+
+Kept free of model imports at module level: spawned children unpickle these
+functions before Django is set up, so setup happens in the initializer.
+"""
+
+
+def init_worker_process() -> None:
+    """ProcessPoolExecutor initializer: set up Django in a spawned child."""
+    import django
+    django.setup()
+
+
+def execute_run(run_id: int) -> str:
+    from .runner import execute_run as _execute_run
+    return _execute_run(run_id)
@@ -1,3 +1,109 @@
-from django.test import TestCase
+import io
+import hashlib
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.models import Category, Item, InventoryTransaction, ItemDailyRollup
+from reports.models import ReportRun
+from users.models import Roles
+
+
+class ReportRunAPITestCase(APITestCase):
+    def setUp(self):
+        self.artifact_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.artifact_dir, ignore_errors=True)
+        self.manager = get_user_model().objects.create_user(
+            username="reporter", password="testpass", role=Roles.MANAGER,
+        )
+        self.client.force_authenticate(user=self.manager)
+        category = Category.objects.create(name="Reports")
+        item = Item.objects.create(name="Counted", category=category, price=2, low_stock_threshold=1)
+        item.adjust_stock(7, reason="init")
+
+    def test_enqueue_run_and_worker_writes_artifact(self):
+        with override_settings(REPORTS_ARTIFACT_ROOT=Path(self.artifact_dir)):
+            resp = self.client.post(reverse('report-run-list'), {"definition": "stock_snapshot"}, format='json')
+            self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(resp.data['status'], 'queued')
+
+            call_command('run_report_worker', processes=0, once=True, stdout=io.StringIO())
+
+            resp = self.client.get(reverse('report-run-detail', args=[resp.data['id']]))
+            self.assertEqual(resp.data['status'], 'success')
+            artifact = resp.data['artifacts'][0]
+
+            download = self.client.get(reverse('report-run-download', args=[resp.data['id'], artifact['id']]))
+            body = b"".join(download.streaming_content)
+        self.assertEqual(artifact['size_bytes'], len(body))
+        self.assertEqual(artifact['checksum'], hashlib.sha256(body).hexdigest())
+        self.assertIn(b"Counted,Reports,7", body)
+
+    def test_claim_is_exclusive(self):
+        from reports.services import runner
+        run = ReportRun.objects.create(definition_id=self._definition_id(), requested_by=self.manager)
+        self.assertEqual(runner.claim_next_run(), run.id)
+        self.assertIsNone(runner.claim_next_run())
+
+    def _definition_id(self):
+        from reports.models import ReportDefinition
+        return ReportDefinition.objects.get(code='stock_snapshot').id
+
+
+class MonthlyReportTestCase(APITestCase):
+    def setUp(self):
+        self.manager = get_user_model().objects.create_user(
+            username="monthly", password="testpass", role=Roles.MANAGER,
+        )
+        self.client.force_authenticate(user=self.manager)
+        category = Category.objects.create(name="Monthly")
+        self.item = Item.objects.create(
+            name="Rolled", category=category, price=1, low_stock_threshold=0,
+            created_at=timezone.make_aware(datetime(2025, 1, 1)),
+        )
+
+    def _backdate(self, delta, when):
+        txn = self.item.adjust_stock(delta, reason="manual")
+        InventoryTransaction.objects.filter(pk=txn.pk).update(created_at=timezone.make_aware(when))
+
+    def test_ledger_maintains_todays_rollup(self):
+        self.item.adjust_stock(10, reason="manual")
+        self.item.adjust_stock(-4, reason="manual")
+        rollup = ItemDailyRollup.objects.get(item=self.item, date=timezone.localdate())
+        self.assertEqual((rollup.inflow, rollup.outflow, rollup.closing_quantity), (10, 4, 6))
+
+    def test_monthly_report_reads_rebuilt_rollups(self):
+        self._backdate(10, datetime(2025, 1, 20))
+        self._backdate(5, datetime(2025, 2, 3))
+        self._backdate(-7, datetime(2025, 2, 10))
+        self._backdate(2, datetime(2025, 3, 1))
+        call_command('rollup_stock', full=True, stdout=io.StringIO())
+
+        resp = self.client.get(reverse('report-monthly'), {"month": "2025-02"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        row = resp.data['items'][0]
+        self.assertEqual(
+            (row['opening'], row['inflow'], row['outflow'], row['closing']),
+            (10, 5, 7, 8),
+        )
+
+        for month in ("2025-13", "0-01", "10000-01"):
+            resp = self.client.get(reverse('report-monthly'), {"month": month})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incremental_rebuild_keeps_earlier_days(self):
+        self._backdate(10, datetime(2025, 1, 20))
+        call_command('rollup_stock', full=True, stdout=io.StringIO())
+        self._backdate(-3, datetime(2025, 2, 3))
+        call_command('rollup_stock', since="2025-02-01", stdout=io.StringIO())
+        closing = ItemDailyRollup.objects.get(item=self.item, date="2025-02-03").closing_quantity
+        self.assertEqual(closing, 7)
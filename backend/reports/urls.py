@@ -0,0 +1,11 @@
+from django.urls import path
+from rest_framework import routers
+from .views import ReportDefinitionViewSet, ReportRunViewSet, monthly_report
+
+router = routers.DefaultRouter()
+router.register(r'definitions', ReportDefinitionViewSet, basename='report-definition')
+router.register(r'runs', ReportRunViewSet, basename='report-run')
+
+urlpatterns = [
+    path('monthly/', monthly_report, name='report-monthly'),
+] + router.urls
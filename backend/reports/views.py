@@ -1,3 +1,73 @@
-from django.shortcuts import render
+from django.http import FileResponse, Http404
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from users.permissions import IsManagerOrAbove
+from .models import ReportDefinition, ReportRun, ReportArtifact
+from .serializers import ReportDefinitionSerializer, ReportRunSerializer
+from .services import runner
+from .generators import parse_month
+from inventory.services.rollups import monthly_stock_summary
+
+class ReportDefinitionViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ReportDefinition.objects.order_by('code')
+    serializer_class = ReportDefinitionSerializer
+    permission_classes = [IsManagerOrAbove]
+
+class ReportRunViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Enqueue report runs and poll their status; a run_report_worker process executes them."""
+    serializer_class = ReportRunSerializer
+    permission_classes = [IsManagerOrAbove]
+    cursor_ordering = ('-requested_at', '-id')
+
+    def get_queryset(self):
+        queryset = ReportRun.objects.select_related('definition', 'requested_by').prefetch_related('artifacts')
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset.order_by('-requested_at', '-id')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            run = runner.enqueue_run(
+                definition=serializer.validated_data['definition'],
+                user=request.user,
+                parameters=serializer.validated_data.get('parameters'),
+            )
+        except runner.ReportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(run).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path=r'artifacts/(?P<artifact_id>\d+)/download')
+    def download(self, request, pk=None, artifact_id=None):
+        """Stream a generated artifact file"""
+        run = self.get_object()
+        try:
+            artifact = run.artifacts.get(pk=artifact_id)
+        except ReportArtifact.DoesNotExist:
+            raise Http404
+        path = runner.artifact_root() / artifact.file_path
+        if not path.is_file():
+            raise Http404
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=artifact.file_name,
+            content_type=artifact.content_type,
+        )
+
+@api_view(["GET"])
+@permission_classes([IsManagerOrAbove])
+def monthly_report(request):
+    """Monthly stock movement per item (?month=YYYY-MM), served from daily rollups."""
+    try:
+        year, month = parse_month(request.query_params.get('month', ''))
+    except ValueError:
+        return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'month': f'{year:04d}-{month:02d}',
+        'items': monthly_stock_summary(year, month),
+    })
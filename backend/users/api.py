@@ -5,6 +5,8 @@ from rest_framework.response import Response
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema
 
+from users import perm_cache
+
 
 class MeSerializer(serializers.Serializer):
     id = serializers.IntegerField()
@@ -21,6 +23,6 @@ def me(request):
         "id": u.id,
         "username": u.username,
         "role": getattr(u, "role", ""),
-        "perms": list(u.get_all_permissions()),
+        "perms": sorted(perm_cache.get_permissions(u)),
     }
     return Response(data)
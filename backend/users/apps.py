@@ -43,9 +43,13 @@ def bootstrap_roles_and_perms(sender, **kwargs):
     g_manager.permissions.set([item_change, item_view, cat_view])
     g_viewer.permissions.set([item_view, cat_view])
 
+    from users import perm_cache
+    perm_cache.bump_permission_version()  # group permissions may have changed for everyone
+
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     def ready(self):
         from . import signals  # sync role->group
+        from . import checks  # noqa: F401 (registers the shared cache check)
         post_migrate.connect(bootstrap_roles_and_perms, sender=self)
\ No newline at end of file
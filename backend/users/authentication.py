@@ -0,0 +1,124 @@
+"""
+JWT authentication that usually skips the user lookup.
+
+Access tokens issued by PrincipalTokenObtainPairSerializer carry the
+claims authorization needs: username, role, is_staff, is_superuser and
+the user's permission version (users.perm_cache) at issue time.
+PrincipalJWTAuthentication turns such a token into a User instance built
+from those claims. It is not loaded from the database, but it works for
+role checks, perm_cache lookups and foreign keys (only pk is needed).
+Every other field is blank, so a principal refuses to be saved.
+
+Revocation rides on the permission version, which sync_user_group bumps
+whenever a user's role, flags, password or groups change:
+
+- token version == current version: principal from the token claims
+- otherwise: principal from a per-process snapshot keyed by
+  (user id, current version), loading the user once per
+  JWT_PRINCIPAL_CACHE_TIMEOUT seconds and rejecting deleted or
+  inactive users exactly like JWTAuthentication
+
+Versions come from the default cache, so claims are only trusted when
+perm_cache.cache_is_shared(): with a per-process cache, a worker that
+did not see the bump would keep honouring a revoked token. Otherwise
+every request loads the user, as JWTAuthentication does.
+
+Views that need the whole row (e.g. to serialize email or date_joined)
+set `requires_full_user = True`, per view or per @action, and get the
+usual database-loaded user.
+"""
+import threading
+import time
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from users import perm_cache
+
+User = get_user_model()
+
+VERSION_CLAIM = 'perm_ver'
+PRINCIPAL_FIELDS = ('username', 'role', 'is_staff', 'is_superuser')
+
+
+class PrincipalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for field in PRINCIPAL_FIELDS:
+            token[field] = getattr(user, field)
+        token[VERSION_CLAIM] = perm_cache.permission_version(user.pk)
+        return token
+
+
+class _SnapshotCache:
+    """Small TTL map of (user id, version) -> principal fields, per process."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[int, str], Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, fields: dict) -> None:
+        timeout = getattr(settings, 'JWT_PRINCIPAL_CACHE_TIMEOUT', 30)
+        with self._lock:
+            if len(self._entries) >= getattr(settings, 'JWT_PRINCIPAL_CACHE_SIZE', 10000):
+                self._entries.clear()  # superseded versions pile up; start over
+            self._entries[key] = (time.monotonic() + timeout, fields)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+snapshots = _SnapshotCache()
+
+
+def build_principal(user_id, fields: dict):
+    """A User carrying only id, is_active and PRINCIPAL_FIELDS; never saved."""
+    user = User(pk=user_id, is_active=True, **fields)
+    user._state.adding = False
+    user._state.db = router.db_for_read(User)
+    user.is_token_principal = True
+    return user
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        self.requires_full_user = getattr(view, 'requires_full_user', False)
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        claims_version = validated_token.get(VERSION_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if (self.requires_full_user or claims_version is None or user_id is None
+                or not perm_cache.cache_is_shared()):
+            return super().get_user(validated_token)
+        try:
+            user_id = User._meta.pk.to_python(user_id)  # simplejwt stores the claim as a string
+        except ValidationError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        version = perm_cache.permission_version(user_id)
+        if claims_version == version:
+            return build_principal(user_id, {field: validated_token[field] for field in PRINCIPAL_FIELDS})
+
+        fields = snapshots.get((user_id, version))
+        if fields is not None:
+            return build_principal(user_id, fields)
+        user = super().get_user(validated_token)  # raises for deleted/inactive users
+        snapshots.set((user_id, version), {field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+        return user
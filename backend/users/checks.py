@@ -0,0 +1,18 @@
+from django.core.checks import Tags, Warning, register
+
+from users import perm_cache
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if perm_cache.cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is process-local, so permission versions are not shared between workers.',
+        hint=(
+            'Configure a shared cache backend (Redis, Memcached or the database cache) in CACHES, '
+            'or set ALLOW_PROCESS_LOCAL_CACHE = True when only one server process runs. '
+            'Until then permissions are not cached and JWT claims are not trusted.'
+        ),
+        id='users.W001',
+    )]
@@ -13,6 +13,27 @@ class User(AbstractUser):
     last_login_at = models.DateTimeField(null=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    # Fields whose change matters for groups, permissions and issued tokens
+    # (users.signals compares them with the values loaded from the database)
+    TRACKED_FIELDS = ("role", "is_active", "is_staff", "is_superuser", "username", "password")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    # True for users built from JWT claims (users.authentication): only the
+    # claimed fields are set, so saving one would blank the rest of the row.
+    is_token_principal = False
+
+    def save(self, *args, **kwargs):
+        if self.is_token_principal:
+            raise RuntimeError("Token principals are partial; load the user from the database to save it.")
+        super().save(*args, **kwargs)
+
     @property
     def is_admin(self): return self.role == Roles.ADMIN
     @property
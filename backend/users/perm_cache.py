@@ -0,0 +1,111 @@
+"""
+Shared cache of each user's effective permissions.
+
+JWT auth loads a fresh User per request, so Django's per-instance
+permission cache never survives and every has_perm() costs the group and
+user permission queries again. Here the result of get_all_permissions()
+is cached under the user's id and a permission version:
+
+    users:perms:<user id>:<global version>.<user version>
+
+The global version is bumped when role groups are (re)configured
+(bootstrap_roles_and_perms, Group.permissions edits); a user's own version
+when their role, flags, groups or direct permissions change
+(sync_user_group, set_role, m2m edits). Old entries are never read again
+and simply expire after PERMISSION_CACHE_TIMEOUT.
+
+Versions live in the cache too; as with the table versions in
+inventory.services.cache, a missing counter is seeded from the clock so
+it cannot fall back onto entries cached under an earlier value.
+
+This needs a cache every server process shares (Redis, Memcached, the
+database cache): with a per-process one, a bump in the worker that made
+the change leaves the others serving the old permissions. Unless
+ALLOW_PROCESS_LOCAL_CACHE says there is only one process (runserver,
+tests), a process-local backend disables the cache, and the users.W001
+system check reports it.
+"""
+import time
+from typing import FrozenSet, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GLOBAL_VERSION_KEY = 'users:permver'
+USER_VERSION_KEY_PREFIX = 'users:permver:'
+PERMS_KEY_PREFIX = 'users:perms:'
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _user_version_key(user_id: int) -> str:
+    return f'{USER_VERSION_KEY_PREFIX}{user_id}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def cache_is_shared() -> bool:
+    """True when version bumps are seen by every process serving requests."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return backend not in PROCESS_LOCAL_BACKENDS or getattr(settings, 'ALLOW_PROCESS_LOCAL_CACHE', False)
+
+
+def _seed(key: str) -> int:
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def _incr(keys: Iterable[str]) -> None:
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, int(time.time() * 1000), None):
+                cache.incr(key)
+
+
+def permission_version(user_id: int) -> str:
+    """Current '<global>.<user>' permission version for a user."""
+    user_key = _user_version_key(user_id)
+    found = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    global_version = found[GLOBAL_VERSION_KEY] if GLOBAL_VERSION_KEY in found else _seed(GLOBAL_VERSION_KEY)
+    user_version = found[user_key] if user_key in found else _seed(user_key)
+    return f'{global_version}.{user_version}'
+
+
+def bump_permission_version(*user_ids: int) -> None:
+    """
+    Invalidate cached permissions for `user_ids`, or for everyone if none given.
+
+    Bumps now and again on commit, like bump_table_version, so an entry
+    cached from pre-commit data in between is discarded too.
+    """
+    keys = [_user_version_key(user_id) for user_id in user_ids] or [GLOBAL_VERSION_KEY]
+    _incr(keys)
+    transaction.on_commit(lambda: _incr(keys))
+
+
+def get_permissions(user) -> FrozenSet[str]:
+    """The user's get_all_permissions(), served from the cache when warm."""
+    if user.is_anonymous or not user.is_active:
+        return frozenset()
+    if not cache_is_shared():
+        return frozenset(user.get_all_permissions())
+    key = f'{PERMS_KEY_PREFIX}{user.pk}:{permission_version(user.pk)}'
+    perms = cache.get(key)
+    if perms is None:
+        perms = frozenset(user.get_all_permissions())
+        cache.set(key, perms, _timeout())
+    return perms
+
+
+def has_perms(user, perms: Iterable[str]) -> bool:
+    """Cached equivalent of user.has_perms() for the ModelBackend."""
+    if user.is_active and user.is_superuser:
+        return True
+    return set(perms) <= get_permissions(user)
@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from django.contrib.auth.models import AnonymousUser
 from users.models import Roles
+from users import perm_cache
 
 ROLE_ORDER = {Roles.VIEWER: 1, Roles.MANAGER: 2, Roles.ADMIN: 3}
 
@@ -28,10 +29,10 @@ class IsAdmin(RoleAtLeast):
     required = ROLE_ORDER[Roles.ADMIN]
 
 class RequireModelPerm(BasePermission):
-    """Combine with RoleAtLeast; leverages Django's Group perms."""
+    """Combine with RoleAtLeast; leverages Django's Group perms (cached, see users.perm_cache)."""
     required_perms = []  # ["inventory.change_item"]
     def has_permission(self, request, view):
-        return request.user.is_authenticated and all(request.user.has_perm(p) for p in self.required_perms)
+        return request.user.is_authenticated and perm_cache.has_perms(request.user, self.required_perms)
 # class IsAdminOrHasModelPerm(RequireModelPerm):
 #     required_perms = []  # ["inventory.change_item"]
 #     def has_permission(self, request, view):
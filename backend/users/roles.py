@@ -0,0 +1,86 @@
+"""
+Role -> group membership, kept in sync only when a role actually changes.
+
+Each role maps to one Django group (ROLE_TO_GROUP). Their ids are cached
+(shared cache, dropped whenever a Group is saved or deleted), and a user's
+membership is fixed with one DELETE of their role-group rows plus one
+INSERT of the right one, for any number of users at once. Groups that are
+not role groups are left alone.
+"""
+from typing import Dict, Iterable, Mapping
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from users import perm_cache
+from users.models import Roles
+
+ROLE_TO_GROUP = {Roles.ADMIN: "admin", Roles.MANAGER: "manager", Roles.VIEWER: "viewer"}
+ROLE_GROUP_IDS_KEY = 'users:rolegroups'
+
+
+class RoleAssignmentError(Exception):
+    pass
+
+
+def role_group_ids() -> Dict[str, int]:
+    """{role: group id} for the role groups that exist."""
+    ids = cache.get(ROLE_GROUP_IDS_KEY)
+    if ids is None:
+        by_name = dict(Group.objects.filter(name__in=ROLE_TO_GROUP.values()).values_list('name', 'id'))
+        ids = {role: by_name[name] for role, name in ROLE_TO_GROUP.items() if name in by_name}
+        cache.set(ROLE_GROUP_IDS_KEY, ids, None)
+    return ids
+
+
+def forget_role_groups() -> None:
+    cache.delete(ROLE_GROUP_IDS_KEY)
+
+
+def sync_role_groups(roles: Mapping[int, str]) -> None:
+    """Put each user id in `roles` into exactly the group for its role."""
+    if not roles:
+        return
+    group_ids = role_group_ids()
+    missing = {role for role in roles.values() if role not in group_ids}
+    if missing:
+        raise Group.DoesNotExist(f"No group for role(s): {', '.join(sorted(missing))}")
+
+    Membership = get_user_model().groups.through
+    with transaction.atomic():
+        Membership.objects.filter(user_id__in=roles, group_id__in=group_ids.values()).delete()
+        Membership.objects.bulk_create(
+            [Membership(user_id=user_id, group_id=group_ids[role]) for user_id, role in roles.items()]
+        )
+
+
+def assign_roles(assignments: Iterable[Mapping]) -> Dict[str, int]:
+    """
+    Set the role of many users in one pass.
+
+    `assignments` is [{'user': id, 'role': role}, ...]. Users already in
+    the requested role are not touched. Role, group membership and
+    permission versions of the others are updated with a fixed number of
+    queries. Returns {'updated': n, 'unchanged': n}.
+    """
+    User = get_user_model()
+    requested = {entry['user']: entry['role'] for entry in assignments}
+    current = dict(User.objects.filter(pk__in=requested).values_list('pk', 'role'))
+    unknown = set(requested) - set(current)
+    if unknown:
+        raise RoleAssignmentError(f"Unknown user id(s): {', '.join(map(str, sorted(unknown)))}")
+
+    changed = {user_id: role for user_id, role in requested.items() if current[user_id] != role}
+    if changed:
+        with transaction.atomic():
+            User.objects.filter(pk__in=changed).update(
+                role=Case(*(When(pk=user_id, then=Value(role)) for user_id, role in changed.items())),
+                modified_at=timezone.now(),
+            )
+            sync_role_groups(changed)
+            perm_cache.bump_permission_version(*changed)
+    return {'updated': len(changed), 'unchanged': len(requested) - len(changed)}
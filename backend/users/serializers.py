@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
+from .models import Roles
+
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,3 +18,11 @@ class UserSerializer(serializers.ModelSerializer):
             # Add any custom fields here
         ]
         read_only_fields = ["id", "date_joined"]
+
+
+class RoleAssignmentSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    role = serializers.ChoiceField(choices=Roles.choices)
+
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    assignments = RoleAssignmentSerializer(many=True, allow_empty=False)
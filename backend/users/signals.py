@@ -1,16 +1,46 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
-from .models import User, Roles
-
-ROLE_TO_GROUP = {Roles.ADMIN: "admin", Roles.MANAGER: "manager", Roles.VIEWER: "viewer"}
+from .models import User
+from . import perm_cache, roles
 
 @receiver(post_save, sender=User)
-def sync_user_group(sender, instance: User, **kwargs):
-    # remove from all role groups
-    for name in ROLE_TO_GROUP.values():
-        try: instance.groups.remove(Group.objects.get(name=name))
-        except Group.DoesNotExist: pass
-    # add to current role group
-    grp = Group.objects.get(name=ROLE_TO_GROUP[instance.role])
-    instance.groups.add(grp)
+def sync_user_group(sender, instance: User, created: bool, **kwargs):
+    # Only act on what changed since the row was loaded; a save without
+    # loaded values (new or hand-built instance) is treated as a full change.
+    # Plain saves such as update_last_login cost nothing here.
+    loaded = getattr(instance, "_loaded_values", None)
+    current = {name: instance.__dict__[name] for name in User.TRACKED_FIELDS if name in instance.__dict__}
+    instance._loaded_values = current
+    if created or loaded is None or loaded.get("role") != instance.role:
+        roles.sync_role_groups({instance.pk: instance.role})
+    elif all(loaded.get(name) == value for name, value in current.items()):
+        return
+    perm_cache.bump_permission_version(instance.pk)
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance: User, **kwargs):
+    # Outstanding tokens must stop resolving to a principal
+    perm_cache.bump_permission_version(instance.pk)
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_perms(sender, instance, action, reverse, pk_set, **kwargs):
+    # Edits made outside users.roles (admin, shell)
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        perm_cache.bump_permission_version(instance.pk)
+    elif pk_set:
+        perm_cache.bump_permission_version(*pk_set)
+    else:  # group.user_set.clear() / permission.user_set.clear(): members unknown
+        perm_cache.bump_permission_version()
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_perms(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        perm_cache.bump_permission_version()
+
+@receiver([post_save, post_delete], sender=Group)
+def forget_role_group_ids(sender, **kwargs):
+    roles.forget_role_groups()
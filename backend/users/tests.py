@@ -1,3 +1,182 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from users import perm_cache
+from users.checks import check_shared_cache
+from users.authentication import PrincipalJWTAuthentication, PrincipalTokenObtainPairSerializer, build_principal, snapshots
+from users.models import Roles
+
+User = get_user_model()
+
+
+class PermissionCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user(username="manager", password="testpass", role=Roles.MANAGER)
+        self.admin = User.objects.create_user(username="admin", password="testpass", role=Roles.ADMIN, is_staff=True)
+
+    def fresh(self, user):
+        # What JWT auth hands each request: a new instance, no per-instance perm cache
+        return User.objects.get(pk=user.pk)
+
+    def test_warm_lookups_cost_no_queries(self):
+        self.assertTrue(perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"]))
+        user = self.fresh(self.manager)
+        with self.assertNumQueries(0):
+            self.assertTrue(perm_cache.has_perms(user, ["inventory.change_item"]))
+            self.assertFalse(perm_cache.has_perms(user, ["inventory.delete_item"]))
+
+        self.client.force_authenticate(user=self.fresh(self.manager))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("me"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["perms"], ["inventory.change_item", "inventory.view_category", "inventory.view_item"])
+
+    def test_role_and_group_changes_invalidate(self):
+        self.assertTrue(perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"]))
+
+        self.client.force_authenticate(user=self.admin)
+        resp = self.client.post(reverse("user-set-role", args=[self.manager.pk]), {"role": Roles.VIEWER})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"]))
+
+        viewer = Group.objects.get(name="viewer")
+        viewer.permissions.add(Permission.objects.get(codename="change_item"))
+        self.assertTrue(perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"]))
+
+        self.manager.refresh_from_db()
+        self.manager.is_active = False
+        self.manager.save()
+        self.assertFalse(perm_cache.has_perms(self.fresh(self.manager), ["inventory.view_item"]))
+
+    @override_settings(ALLOW_PROCESS_LOCAL_CACHE=False)
+    def test_process_local_cache_is_not_trusted(self):
+        self.assertFalse(perm_cache.cache_is_shared())
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ["users.W001"])
+        perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(perm_cache.has_perms(self.fresh(self.manager), ["inventory.change_item"]))
+        self.assertGreater(len(queries), 1)  # loaded again, not served from the per-process cache
+
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                                                   "LOCATION": "cache"}}):
+            self.assertTrue(perm_cache.cache_is_shared())
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class PrincipalJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        snapshots.clear()
+        self.manager = User.objects.create_user(
+            username="scanner", password="testpass", email="scanner@example.com", role=Roles.MANAGER,
+        )
+        resp = self.client.post(reverse("token_obtain_pair"), {"username": "scanner", "password": "testpass"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+
+    def test_principal_from_claims_needs_no_user_lookup(self):
+        self.client.get(reverse("me"))  # warm the permission cache
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("me"))
+        self.assertEqual(resp.data["role"], Roles.MANAGER)
+        self.assertIn("inventory.change_item", resp.data["perms"])
+
+        # Endpoints that serialize the full row still load it
+        resp = self.client.get(reverse("user-me"))
+        self.assertEqual(resp.data["email"], "scanner@example.com")
+
+    def test_stale_claims_fall_back_to_the_database(self):
+        self.manager.role = Roles.VIEWER
+        self.manager.save()
+        resp = self.client.get(reverse("me"))
+        self.assertEqual(resp.data["role"], Roles.VIEWER)
+        self.assertNotIn("inventory.change_item", resp.data["perms"])
+        with self.assertNumQueries(0):  # snapshot for the new version
+            self.client.get(reverse("me"))
+
+        self.manager.is_active = False
+        self.manager.save()
+        self.assertEqual(self.client.get(reverse("me")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_users_token_is_rejected_without_a_shared_cache(self):
+        self.client.get(reverse("me"))
+        # No signal and no version bump, like a change made by a worker whose cache this one cannot see
+        User.objects.filter(pk=self.manager.pk).update(is_active=False)
+        with override_settings(ALLOW_PROCESS_LOCAL_CACHE=False):
+            self.assertEqual(self.client.get(reverse("me")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_principal_pk_has_the_model_type(self):
+        auth = PrincipalJWTAuthentication()
+        auth.requires_full_user = False
+        token = auth.get_validated_token(str(PrincipalTokenObtainPairSerializer.get_token(self.manager).access_token))
+        principal = auth.get_user(token)
+        self.assertTrue(principal.is_token_principal)
+        self.assertEqual(principal.pk, self.manager.pk)
+        self.assertIsInstance(principal.pk, int)
+
+        self.manager.role = Roles.VIEWER
+        self.manager.save()
+        auth.get_user(token)  # stale claims: loads the row and stores a snapshot
+        principal = auth.get_user(token)
+        self.assertTrue(principal.is_token_principal)
+        self.assertIsInstance(principal.pk, int)
+
+    def test_principal_cannot_be_saved(self):
+        principal = build_principal(self.manager.pk, {"username": "scanner", "role": Roles.MANAGER,
+                                                      "is_staff": False, "is_superuser": False})
+        with self.assertRaises(RuntimeError):
+            principal.save()
+
+
+class RoleGroupSyncTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="root", password="testpass", role=Roles.ADMIN, is_staff=True)
+        self.users = [User.objects.create_user(username=f"user{n}", password="testpass") for n in range(3)]
+        self.extra = Group.objects.create(name="auditors")
+
+    def group_names(self, user):
+        return sorted(user.groups.values_list("name", flat=True))
+
+    def test_membership_only_rewritten_when_role_changes(self):
+        user = User.objects.get(pk=self.users[0].pk)
+        user.groups.add(self.extra)
+        with self.assertNumQueries(1):  # the UPDATE itself
+            update_last_login(None, user)
+
+        user.role = Roles.MANAGER
+        user.save()
+        self.assertEqual(self.group_names(user), ["auditors", "manager"])
+
+    def test_bulk_role_assignment(self):
+        url = reverse("user-bulk-set-role")
+        assignments = [
+            {"user": self.users[0].pk, "role": Roles.MANAGER},
+            {"user": self.users[1].pk, "role": Roles.ADMIN},
+            {"user": self.users[2].pk, "role": Roles.VIEWER},  # unchanged
+        ]
+        self.assertTrue(perm_cache.has_perms(User.objects.get(pk=self.users[0].pk), ["inventory.view_item"]))
+        self.client.force_authenticate(user=self.admin)
+        resp = self.client.post(url, {"assignments": assignments}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, {"updated": 2, "unchanged": 1})
+
+        roles_now = dict(User.objects.filter(pk__in=[u.pk for u in self.users]).values_list("username", "role"))
+        self.assertEqual(roles_now, {"user0": Roles.MANAGER, "user1": Roles.ADMIN, "user2": Roles.VIEWER})
+        self.assertEqual([self.group_names(u) for u in self.users], [["manager"], ["admin"], ["viewer"]])
+        self.assertTrue(perm_cache.has_perms(User.objects.get(pk=self.users[0].pk), ["inventory.change_item"]))
+
+        resp = self.client.post(url, {"assignments": [{"user": 999999, "role": Roles.ADMIN}]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.users[0])
+        self.assertEqual(self.client.post(url, {"assignments": assignments}, format="json").status_code,
+                         status.HTTP_403_FORBIDDEN)
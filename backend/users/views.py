@@ -8,15 +8,17 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-from .serializers import UserSerializer
+from .serializers import UserSerializer, BulkRoleAssignmentSerializer
 from .models import Roles
+from . import roles
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all().order_by("id")
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]  # change to IsAuthenticated if you want all users to see
+    requires_full_user = False  # see users.authentication
 
-    @decorators.action(detail=False, methods=["get"], url_path="me", permission_classes=[permissions.IsAuthenticated])
+    @decorators.action(detail=False, methods=["get"], url_path="me", permission_classes=[permissions.IsAuthenticated], requires_full_user=True)
     def me(self, request):
         return response.Response(self.get_serializer(request.user).data)
 
@@ -29,3 +31,15 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         user.role = role
         user.save()
         return response.Response({"status": "role updated", "role": user.role})
+
+    @decorators.action(detail=False, methods=["post"], url_path="bulk-set-role", permission_classes=[permissions.IsAdminUser],
+                       serializer_class=BulkRoleAssignmentSerializer)
+    def bulk_set_role(self, request):
+        """Assign roles to many users at once: {"assignments": [{"user": id, "role": role}, ...]}"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = roles.assign_roles(serializer.validated_data["assignments"])
+        except roles.RoleAssignmentError as e:
+            return response.Response({"error": str(e)}, status=400)
+        return response.Response(result)